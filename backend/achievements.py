@@ -0,0 +1,366 @@
+"""
+Member achievement accounting.
+
+MemberAchievement counters, per member (the task's legacy assignee_id):
+    - total_completed_tasks / critical_tasks_completed: their COMPLETED tasks,
+      and of those the HIGH criticality ones
+    - deadline_tasks_completed / on_time_tasks_completed: completed tasks with
+      a deadline, and of those the ones completed by it; on_time_completion_rate
+      is the latter as a percentage of the former
+    - current_no_blocker_streak: completions since one of their tasks last
+      became BLOCKED
+
+`achievement_credits` records the counted state of every assigned task (its
+member, whether it is completed, critical, on time, blocked). sync_tasks()
+compares that with the task rows and applies only the difference: counters
+move by upserts of count + delta, and the streak advances on a transition into
+COMPLETED and resets on a transition into BLOCKED. Applying the same change
+twice, or syncing a task that did not change, is a no-op. task_events calls it
+for every task write, so this is the single place transitions are counted.
+
+reconcile() recounts the counters from the task rows and repairs drift (e.g.
+tasks changed outside the API); the app runs it periodically
+(ACHIEVEMENT_RECONCILE_INTERVAL) and scripts/reconcile_achievements.py on
+demand. The streak depends on history rather than current rows, so it is
+recomputed by replay_history() (scripts/reconcile_achievements.py --history).
+"""
+
+import asyncio
+import heapq
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, bindparam, case, delete, func, insert, select, update, union_all
+from sqlalchemy.orm import Session
+
+from . import database, etags, models
+from .database import upsert_increment
+
+RECONCILE_INTERVAL = float(os.getenv("ACHIEVEMENT_RECONCILE_INTERVAL", "3600"))
+REPLAY_BATCH_SIZE = 1000
+
+MA = models.MemberAchievement
+COUNTERS = ["total_completed_tasks", "critical_tasks_completed", "deadline_tasks_completed", "on_time_tasks_completed"]
+
+
+class Credit(NamedTuple):
+    user_id: int
+    completed: bool
+    critical: bool
+    on_time: Optional[bool]  # None unless completed with a deadline and completed_at
+    blocked: bool
+
+    def counters(self):
+        if not self.completed:
+            return (0, 0, 0, 0)
+        return (1, int(self.critical), int(self.on_time is not None), int(self.on_time is True))
+
+
+def _credit_columns():
+    """(task_id, user_id, completed, critical, on_time, blocked) computed from a task row, in SQL."""
+    task = models.Task
+    completed = task.status == models.TaskStatus.COMPLETED
+    return (
+        task.id,
+        task.assignee_id,
+        case((completed, True), else_=False),
+        case((task.criticality == models.TaskCriticality.HIGH, True), else_=False),
+        case(
+            (and_(completed, task.deadline != None, task.completed_at != None), task.completed_at <= task.deadline),
+            else_=None,
+        ),
+        case((task.status == models.TaskStatus.BLOCKED, True), else_=False),
+    )
+
+
+def _credits(db: Session, task_ids) -> Dict[int, Credit]:
+    """Credits last applied for the given tasks, locking them until commit."""
+    AC = models.AchievementCredit
+    rows = db.execute(
+        select(AC.task_id, AC.user_id, AC.completed, AC.critical, AC.on_time, AC.blocked)
+        .where(AC.task_id.in_(task_ids)).with_for_update()
+    )
+    return {row[0]: Credit(*row[1:]) for row in rows}
+
+
+def _expected_credits(db: Session, task_ids) -> Dict[int, Credit]:
+    rows = db.execute(
+        select(*_credit_columns()).where(models.Task.id.in_(task_ids), models.Task.assignee_id != None)
+    )
+    return {
+        task_id: Credit(user_id, bool(completed), bool(critical), None if on_time is None else bool(on_time), bool(blocked))
+        for task_id, user_id, completed, critical, on_time, blocked in rows
+    }
+
+
+def _update_rates(db: Session, user_ids):
+    db.execute(
+        update(MA).where(MA.user_id.in_(user_ids)).values(on_time_completion_rate=case(
+            (MA.deadline_tasks_completed > 0, MA.on_time_tasks_completed * 100 // MA.deadline_tasks_completed),
+            else_=0,
+        ))
+    )
+
+
+def _sync(db: Session, task_ids, exists: bool):
+    old = _credits(db, task_ids)
+    new = _expected_credits(db, task_ids) if exists else {}
+    if old == new:
+        return
+
+    deltas = defaultdict(lambda: [0, 0, 0, 0, 0])  # COUNTERS + streak
+    resets = set()
+    for task_id in old.keys() | new.keys():
+        before, after = old.get(task_id), new.get(task_id)
+        if before:
+            for i, value in enumerate(before.counters()):
+                deltas[before.user_id][i] -= value
+        if after:
+            for i, value in enumerate(after.counters()):
+                deltas[after.user_id][i] += value
+            moved = before is None or before.user_id != after.user_id
+            if after.completed and (moved or not before.completed):
+                deltas[after.user_id][4] += 1
+            if after.blocked and (moved or not before.blocked):
+                resets.add(after.user_id)
+
+    now = datetime.utcnow()
+    rows = [
+        {**dict(zip(COUNTERS, values[:4])), "current_no_blocker_streak": values[4], "user_id": user_id}
+        for user_id, values in sorted(deltas.items()) if any(values) or user_id in resets
+    ]
+    if rows:
+        upsert_increment(db, MA.__table__, ["user_id"], COUNTERS + ["current_no_blocker_streak"], rows, last_updated=now)
+        _update_rates(db, [row["user_id"] for row in rows])
+    if resets:
+        db.execute(update(MA).where(MA.user_id.in_(resets)).values(current_no_blocker_streak=0, last_updated=now))
+
+    AC = models.AchievementCredit
+    db.execute(delete(AC).where(AC.task_id.in_(task_ids)))
+    if new:
+        db.execute(insert(AC), [
+            {"task_id": task_id, **credit._asdict()}
+            for task_id, credit in new.items()
+        ])
+
+
+def sync_tasks(db: Session, task_ids: Iterable[int]):
+    """Bring the counters in line with the given tasks' rows (flushes pending changes first)."""
+    task_ids = sorted(set(task_ids))
+    if not task_ids:
+        return
+    db.flush()
+    _sync(db, task_ids, exists=True)
+
+
+def forget_task(db: Session, task_id: int):
+    """Un-credit a task about to be deleted."""
+    _sync(db, [task_id], exists=False)
+
+
+def get_stats(db: Session, user_id: int) -> models.MemberAchievement:
+    """The member's counters in one query; an unsaved zero row for members with none yet."""
+    stats = db.query(MA).filter(MA.user_id == user_id).first()
+    if stats is None:
+        stats = MA(
+            user_id=user_id,
+            on_time_completion_rate=0,
+            total_completed_tasks=0,
+            critical_tasks_completed=0,
+            current_no_blocker_streak=0,
+            last_updated=datetime.utcnow(),
+        )
+    return stats
+
+
+def reconcile(db: Session) -> int:
+    """
+    Recount every member's counters from the task rows and repair any that differ,
+    rewriting the credits to match. Returns the number of members corrected. Caller commits.
+
+    The check runs unlocked; a repair takes database.TASK_WRITE_LOCK, held by every
+    task write until it commits, and checks again under it, so no sync_tasks() can
+    change tasks or credits between the recount and the rewrite.
+    """
+    if _drift(db) is None:
+        return 0
+    database.advisory_xact_lock(db, database.TASK_WRITE_LOCK)
+    found = _drift(db)
+    if found is None:
+        return 0
+    drifted, actual = found
+
+    now = datetime.utcnow()
+    for user, counts in sorted(drifted.items()):
+        values = {**dict(zip(COUNTERS, counts)), "last_updated": now}
+        if user in actual:
+            db.execute(update(MA).where(MA.user_id == user).values(**values))
+        else:
+            db.execute(insert(MA).values(user_id=user, on_time_completion_rate=0, current_no_blocker_streak=0, **values))
+    if drifted:
+        _update_rates(db, list(drifted))
+
+    AC = models.AchievementCredit
+    db.execute(delete(AC))
+    db.execute(insert(AC).from_select(
+        ["task_id", "user_id", "completed", "critical", "on_time", "blocked"],
+        select(*_credit_columns()).where(models.Task.assignee_id != None),
+    ))
+    etags.bump_version(db, etags.ANALYTICS)
+    return len(drifted)
+
+
+def _drift(db: Session):
+    """({member: expected counters} for members whose counters differ, {member: current counters}), or None if consistent."""
+    _, user_id, completed, critical, on_time, _ = _credit_columns()
+    as_int = lambda condition: func.sum(case((condition, 1), else_=0))
+    expected = {
+        row[0]: tuple(value or 0 for value in row[1:])
+        for row in db.execute(
+            select(user_id, func.count(), as_int(critical == True), as_int(on_time != None), as_int(on_time == True))
+            .where(completed == True, user_id != None)
+            .group_by(user_id)
+        )
+    }
+    actual = {
+        row[0]: tuple(value or 0 for value in row[1:])
+        for row in db.execute(select(MA.user_id, *(MA.__table__.c[column] for column in COUNTERS)))
+    }
+    credited = db.execute(select(func.count()).select_from(models.AchievementCredit)).scalar()
+    assigned = db.execute(select(func.count()).where(models.Task.assignee_id != None)).scalar()
+
+    zero = (0, 0, 0, 0)
+    drifted = {
+        user: expected.get(user, zero)
+        for user in expected.keys() | actual.keys()
+        if expected.get(user, zero) != actual.get(user, zero)
+    }
+    if not drifted and credited == assigned:
+        return None
+    return drifted, actual
+
+
+def _completions(db: Session):
+    """(completed_at, 1, assignee, on_time) for completed tasks, oldest first, streamed."""
+    task = models.Task
+    rows = db.execute(
+        select(task.completed_at, task.assignee_id, task.deadline)
+        .where(task.status == models.TaskStatus.COMPLETED, task.assignee_id != None, task.completed_at != None)
+        .order_by(task.completed_at, task.id)
+        .execution_options(yield_per=REPLAY_BATCH_SIZE)
+    )
+    for completed_at, user_id, deadline in rows:
+        yield completed_at, 1, user_id, None if deadline is None else completed_at <= deadline
+
+
+def _blockers(db: Session):
+    """(created_at, 0, assignee, None) whenever a task was set to BLOCKED, oldest first, streamed."""
+    task = models.Task
+    updates = select(models.TaskUpdate.created_at, task.assignee_id)\
+        .join(task, task.id == models.TaskUpdate.task_id)\
+        .where(models.TaskUpdate.status == models.TaskStatus.BLOCKED.value, task.assignee_id != None)
+    # Status changes made through PUT /tasks/{id} are only recorded as activities
+    activities = select(models.TaskActivity.created_at, task.assignee_id)\
+        .join(task, task.id == models.TaskActivity.task_id)\
+        .where(
+            models.TaskActivity.activity_type == models.ActivityType.STATUS_CHANGE,
+            models.TaskActivity.description == "Status changed to Blocked",
+            task.assignee_id != None,
+        )
+    events = union_all(updates, activities).subquery()
+    rows = db.execute(
+        select(events.c.created_at, events.c.assignee_id)
+        .where(events.c.created_at != None)
+        .order_by(events.c.created_at)
+        .execution_options(yield_per=REPLAY_BATCH_SIZE)
+    )
+    for created_at, user_id in rows:
+        yield created_at, 0, user_id, None
+
+
+def replay_history(db: Session) -> int:
+    """
+    Recompute the streaks and on-time counters of every member by replaying task
+    history in one pass: completions and blocker entries are streamed in time
+    order (blockers first on ties) and merged, keeping O(members) state.
+    Returns the number of members written. Caller commits.
+
+    Holds database.TASK_WRITE_LOCK throughout, so no completion or blocker is
+    counted by sync_tasks() while the replay overwrites its counters.
+    """
+    database.advisory_xact_lock(db, database.TASK_WRITE_LOCK)
+    streak = defaultdict(int)
+    deadline = defaultdict(int)
+    on_time = defaultdict(int)
+    for _, kind, user_id, was_on_time in heapq.merge(_blockers(db), _completions(db)):
+        if kind == 0:
+            streak[user_id] = 0
+            continue
+        streak[user_id] += 1
+        if was_on_time is not None:
+            deadline[user_id] += 1
+            on_time[user_id] += int(was_on_time)
+
+    existing = set(db.execute(select(MA.user_id)).scalars())
+    users = existing | streak.keys()
+    now = datetime.utcnow()
+    rows = [
+        {
+            "uid": user_id,
+            "current_no_blocker_streak": streak[user_id],
+            "deadline_tasks_completed": deadline[user_id],
+            "on_time_tasks_completed": on_time[user_id],
+            "on_time_completion_rate": on_time[user_id] * 100 // deadline[user_id] if deadline[user_id] else 0,
+            "last_updated": now,
+        }
+        for user_id in sorted(users)
+    ]
+    table = MA.__table__
+    updates = [row for row in rows if row["uid"] in existing]
+    if updates:
+        db.execute(
+            update(table).where(table.c.user_id == bindparam("uid"))
+            .values({column: bindparam(column) for column in rows[0] if column != "uid"}),
+            updates,
+        )
+    inserts = [
+        {**{key: value for key, value in row.items() if key != "uid"}, "user_id": row["uid"],
+         "total_completed_tasks": 0, "critical_tasks_completed": 0}
+        for row in rows if row["uid"] not in existing
+    ]
+    if inserts:
+        db.execute(insert(table), inserts)
+        # New rows still need their completion counts
+        reconcile(db)
+    etags.bump_version(db, etags.ANALYTICS)
+    return len(rows)
+
+
+def is_empty(db: Session) -> bool:
+    return db.query(models.AchievementCredit.task_id).first() is None
+
+
+def _reconcile_once() -> int:
+    db = database.SessionLocal()
+    try:
+        corrected = reconcile(db)
+        db.commit()
+        return corrected
+    finally:
+        db.close()
+
+
+async def reconcile_periodically(interval: Optional[float] = None):
+    """Run reconcile() every `interval` seconds until cancelled (started by main on startup)."""
+    interval = RECONCILE_INTERVAL if interval is None else interval
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            corrected = await run_in_threadpool(_reconcile_once)
+            if corrected:
+                print(f"Achievements: corrected counters of {corrected} member(s)")
+        except Exception as e:
+            print(f"Achievements: reconcile failed: {e}")
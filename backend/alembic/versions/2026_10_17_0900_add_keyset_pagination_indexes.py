@@ -0,0 +1,31 @@
+"""add_keyset_pagination_indexes
+
+Revision ID: 3c8e1f5a7b20
+Revises: a9f3c2e1d4b7
+Create Date: 2026-10-17 09:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c8e1f5a7b20'
+down_revision: Union[str, None] = 'a9f3c2e1d4b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Composite indexes matching the (created_at, id) keyset ordering
+    op.create_index('ix_tasks_created_at_id', 'tasks', ['created_at', 'id'], unique=False)
+    op.create_index('ix_comments_task_id_created_at_id', 'comments', ['task_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_task_activities_task_id_created_at_id', 'task_activities', ['task_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_task_activities_task_id_created_at_id', table_name='task_activities')
+    op.drop_index('ix_comments_task_id_created_at_id', table_name='comments')
+    op.drop_index('ix_tasks_created_at_id', table_name='tasks')
@@ -0,0 +1,57 @@
+"""add_task_visibility_table
+
+Revision ID: 7d2b9e4c1a63
+Revises: 3c8e1f5a7b20
+Create Date: 2026-10-17 09:30
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2b9e4c1a63'
+down_revision: Union[str, None] = '3c8e1f5a7b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'task_visibility',
+        sa.Column('task_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('relation', sa.String(), nullable=False),
+        sa.Column('team_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['task_id'], ['tasks.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('task_id', 'user_id', 'relation')
+    )
+    op.create_index('ix_task_visibility_user_relation', 'task_visibility', ['user_id', 'relation', 'task_id'], unique=False)
+    op.create_index('ix_task_visibility_team_relation', 'task_visibility', ['team_id', 'relation', 'task_id'], unique=False)
+
+    # Backfill from existing assignments (same rules as backend.visibility).
+    # task_assignees is created by migrate_multi_assignee.py, so it may be missing here.
+    pairs = "SELECT id AS task_id, assignee_id AS user_id FROM tasks WHERE assignee_id IS NOT NULL"
+    if sa.inspect(op.get_bind()).has_table('task_assignees'):
+        pairs += " UNION SELECT task_id, user_id FROM task_assignees"
+    op.execute(f"""
+        INSERT INTO task_visibility (task_id, user_id, relation, team_id)
+        SELECT pairs.task_id, pairs.user_id, 'assignee', users.team_id
+        FROM ({pairs}) AS pairs
+        JOIN users ON users.id = pairs.user_id
+    """)
+    op.execute("""
+        INSERT INTO task_visibility (task_id, user_id, relation, team_id)
+        SELECT tasks.id, tasks.assigner_id, 'assigner', users.team_id
+        FROM tasks
+        JOIN users ON users.id = tasks.assigner_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_task_visibility_team_relation', table_name='task_visibility')
+    op.drop_index('ix_task_visibility_user_relation', table_name='task_visibility')
+    op.drop_table('task_visibility')
@@ -0,0 +1,45 @@
+"""add_task_filter_indexes
+
+Revision ID: b41f7a09c2d8
+Revises: 7d2b9e4c1a63
+Create Date: 2026-10-17 10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41f7a09c2d8'
+down_revision: Union[str, None] = '7d2b9e4c1a63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TASK_INDEXES = [
+    ('ix_tasks_status_created_at', ['status', 'created_at']),
+    ('ix_tasks_criticality_deadline', ['criticality', 'deadline']),
+    ('ix_tasks_deadline_status', ['deadline', 'status']),
+    ('ix_tasks_assigner_id_created_at', ['assigner_id', 'created_at']),
+    ('ix_tasks_is_internal_created_at', ['is_internal', 'created_at']),
+    ('ix_tasks_completed_at', ['completed_at']),
+    ('ix_tasks_assignee_id_status', ['assignee_id', 'status']),
+]
+
+
+def upgrade() -> None:
+    # Composite indexes backing the GET /tasks/ filters
+    for name, columns in TASK_INDEXES:
+        op.create_index(name, 'tasks', columns, unique=False)
+    # task_assignees is created by migrate_multi_assignee.py, so it may be missing here
+    if sa.inspect(op.get_bind()).has_table('task_assignees'):
+        op.create_index('ix_task_assignees_user_id_task_id', 'task_assignees', ['user_id', 'task_id'], unique=False)
+
+
+def downgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table('task_assignees'):
+        op.drop_index('ix_task_assignees_user_id_task_id', table_name='task_assignees')
+    for name, _ in reversed(TASK_INDEXES):
+        op.drop_index(name, table_name='tasks')
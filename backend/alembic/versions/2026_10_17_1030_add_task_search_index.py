@@ -0,0 +1,53 @@
+"""add_task_search_index
+
+Revision ID: e5a0c3d6f918
+Revises: b41f7a09c2d8
+Create Date: 2026-10-17 10:30
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a0c3d6f918'
+down_revision: Union[str, None] = 'b41f7a09c2d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        # FTS5 document per task, rowid = tasks.id
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS task_search "
+            "USING fts5(title, description, comments, tokenize='porter unicode61')"
+        )
+        op.execute(
+            "INSERT INTO task_search (rowid, title, description, comments) "
+            "SELECT id, coalesce(title, ''), coalesce(description, ''), "
+            "coalesce((SELECT group_concat(content, ' ') FROM comments WHERE comments.task_id = tasks.id), '') "
+            "FROM tasks"
+        )
+    elif dialect == 'postgresql':
+        op.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_tasks_search_vector ON tasks USING GIN (search_vector)")
+        op.execute(
+            "UPDATE tasks SET search_vector = "
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce("
+            "(SELECT string_agg(content, ' ') FROM comments WHERE comments.task_id = tasks.id), '')), 'C')"
+        )
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS task_search")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_tasks_search_vector")
+        op.execute("ALTER TABLE tasks DROP COLUMN IF EXISTS search_vector")
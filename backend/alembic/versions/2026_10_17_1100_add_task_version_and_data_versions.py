@@ -0,0 +1,40 @@
+"""add_task_version_and_data_versions
+
+Revision ID: 1f6d8b3a5e47
+Revises: e5a0c3d6f918
+Create Date: 2026-10-17 11:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1f6d8b3a5e47'
+down_revision: Union[str, None] = 'e5a0c3d6f918'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Per-row version counter backing task ETags
+    with op.batch_alter_table('tasks') as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE tasks SET updated_at = created_at")
+
+    op.create_table(
+        'data_versions',
+        sa.Column('scope', sa.String(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('scope')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('data_versions')
+    with op.batch_alter_table('tasks') as batch_op:
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('version')
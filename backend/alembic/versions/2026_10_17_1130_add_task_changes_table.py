@@ -0,0 +1,33 @@
+"""add_task_changes_table
+
+Revision ID: 9b5e2d7c4f01
+Revises: 1f6d8b3a5e47
+Create Date: 2026-10-17 11:30
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b5e2d7c4f01'
+down_revision: Union[str, None] = '1f6d8b3a5e47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'task_changes',
+        sa.Column('seq', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('task_id', sa.Integer(), nullable=False),
+        sa.Column('op', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('seq')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('task_changes')
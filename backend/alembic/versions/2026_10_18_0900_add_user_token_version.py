@@ -0,0 +1,29 @@
+"""add_user_token_version
+
+Revision ID: 4a7c1e9d2b36
+Revises: 9b5e2d7c4f01
+Create Date: 2026-10-18 09:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a7c1e9d2b36'
+down_revision: Union[str, None] = '9b5e2d7c4f01'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Bumped whenever the claims embedded in a user's access tokens go stale
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('token_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('token_version')
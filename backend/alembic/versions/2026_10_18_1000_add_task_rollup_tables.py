@@ -0,0 +1,63 @@
+"""add_task_rollup_tables
+
+Revision ID: 6e1b4d8a2c57
+Revises: 4a7c1e9d2b36
+Create Date: 2026-10-18 10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e1b4d8a2c57'
+down_revision: Union[str, None] = '4a7c1e9d2b36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Filled on startup (or with scripts/rebuild_rollups.py) by backend.rollups
+    op.create_table(
+        'task_rollups',
+        sa.Column('dimension', sa.String(), nullable=False),
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('dimension', 'key', 'status')
+    )
+    op.create_table(
+        'task_daily_counts',
+        sa.Column('dimension', sa.String(), nullable=False),
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('created', sa.Integer(), nullable=False),
+        sa.Column('completed', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('dimension', 'key', 'day')
+    )
+    op.create_table(
+        'task_rollup_state',
+        sa.Column('task_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('created_on', sa.Date(), nullable=True),
+        sa.Column('completed_on', sa.Date(), nullable=True),
+        sa.PrimaryKeyConstraint('task_id')
+    )
+    op.create_table(
+        'task_rollup_keys',
+        sa.Column('task_id', sa.Integer(), nullable=False),
+        sa.Column('dimension', sa.String(), nullable=False),
+        sa.Column('key', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('task_id', 'dimension', 'key')
+    )
+    op.create_index('ix_task_rollup_keys_dimension_key', 'task_rollup_keys', ['dimension', 'key', 'task_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_task_rollup_keys_dimension_key', table_name='task_rollup_keys')
+    op.drop_table('task_rollup_keys')
+    op.drop_table('task_rollup_state')
+    op.drop_table('task_daily_counts')
+    op.drop_table('task_rollups')
@@ -0,0 +1,43 @@
+"""add_achievement_credits
+
+Revision ID: 8c3f5a1e7d90
+Revises: 6e1b4d8a2c57
+Create Date: 2026-10-18 11:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c3f5a1e7d90'
+down_revision: Union[str, None] = '6e1b4d8a2c57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Filled on startup (or with scripts/reconcile_achievements.py) by backend.achievements
+    op.create_table(
+        'achievement_credits',
+        sa.Column('task_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('critical', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('task_id')
+    )
+    op.create_index('ix_achievement_credits_user_id', 'achievement_credits', ['user_id'], unique=False)
+
+    # Counters are upserted per member from now on; the recount fixes the kept row's values
+    op.execute("""
+        DELETE FROM member_achievements
+        WHERE id NOT IN (SELECT min(id) FROM member_achievements GROUP BY user_id)
+    """)
+    op.create_index('ux_member_achievements_user_id', 'member_achievements', ['user_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ux_member_achievements_user_id', table_name='member_achievements')
+    op.drop_index('ix_achievement_credits_user_id', table_name='achievement_credits')
+    op.drop_table('achievement_credits')
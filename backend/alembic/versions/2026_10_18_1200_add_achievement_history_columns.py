@@ -0,0 +1,43 @@
+"""add_achievement_history_columns
+
+Revision ID: 3d9a6f2b8e14
+Revises: 8c3f5a1e7d90
+Create Date: 2026-10-18 12:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d9a6f2b8e14'
+down_revision: Union[str, None] = '8c3f5a1e7d90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('member_achievements') as batch_op:
+        batch_op.add_column(sa.Column('deadline_tasks_completed', sa.Integer(), server_default='0', nullable=True))
+        batch_op.add_column(sa.Column('on_time_tasks_completed', sa.Integer(), server_default='0', nullable=True))
+
+    # Credits now cover every assigned task; emptying the ledger makes the next
+    # startup recount it and replay history for the rates and streaks
+    op.execute("DELETE FROM achievement_credits")
+    with op.batch_alter_table('achievement_credits') as batch_op:
+        batch_op.add_column(sa.Column('completed', sa.Boolean(), server_default=sa.false(), nullable=False))
+        batch_op.add_column(sa.Column('on_time', sa.Boolean(), nullable=True))
+        batch_op.add_column(sa.Column('blocked', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM achievement_credits")
+    with op.batch_alter_table('achievement_credits') as batch_op:
+        batch_op.drop_column('blocked')
+        batch_op.drop_column('on_time')
+        batch_op.drop_column('completed')
+    with op.batch_alter_table('member_achievements') as batch_op:
+        batch_op.drop_column('on_time_tasks_completed')
+        batch_op.drop_column('deadline_tasks_completed')
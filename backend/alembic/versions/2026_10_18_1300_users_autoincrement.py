@@ -0,0 +1,31 @@
+"""users_autoincrement
+
+Revision ID: 5f2c8b1d9a47
+Revises: 3d9a6f2b8e14
+Create Date: 2026-10-18 13:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f2c8b1d9a47'
+down_revision: Union[str, None] = '3d9a6f2b8e14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Access tokens identify their account by id, so ids must never be reused.
+    # PostgreSQL sequences never reuse values; SQLite needs AUTOINCREMENT.
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table('users', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+            pass
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table('users', recreate='always', table_kwargs={'sqlite_autoincrement': False}):
+            pass
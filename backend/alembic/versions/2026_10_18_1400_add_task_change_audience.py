@@ -0,0 +1,35 @@
+"""add_task_change_audience
+
+Revision ID: 9b4e1d7c3f25
+Revises: 5f2c8b1d9a47
+Create Date: 2026-10-18 14:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b4e1d7c3f25'
+down_revision: Union[str, None] = '5f2c8b1d9a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Tombstones written before this table existed have no audience and are no
+    # longer sent to anyone; clients holding such tasks drop them on a full reload.
+    op.create_table(
+        'task_change_audience',
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('relation', sa.String(), nullable=False),
+        sa.Column('team_id', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('seq', 'user_id', 'relation')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('task_change_audience')
@@ -1,12 +1,22 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 import pyotp
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from passlib.hash import pbkdf2_sha256
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from . import models, schemas, database
+from . import models, schemas, database, metrics
+from . import cache
+from .cache import TTLCache
 
 import os
 
@@ -14,14 +24,73 @@ SECRET_KEY = os.getenv("SECRET_KEY", "YOUR_SUPER_SECRET_KEY_CHANGE_THIS") # In p
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# Pick PASSWORD_HASH_ROUNDS for the host with scripts/calibrate_password_hash.py. Hashes
+# with any other round count are re-hashed on the user's next successful login.
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", str(pbkdf2_sha256.default_rounds)))
+
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=PASSWORD_HASH_ROUNDS,
+    pbkdf2_sha256__min_rounds=PASSWORD_HASH_ROUNDS,
+    pbkdf2_sha256__max_rounds=PASSWORD_HASH_ROUNDS,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Password hashing is CPU-bound (tens of ms per call), so it runs on a small dedicated
+# pool: never on the event loop, and never more than PASSWORD_HASH_CONCURRENCY at once
+# per worker. Beyond PASSWORD_HASH_QUEUE waiting calls, requests are shed with a 503.
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "64"))
+
+metrics.summary("password_verify_seconds", "Time spent verifying passwords, excluding time queued for the hash pool")
+
+_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_CONCURRENCY, thread_name_prefix="password-hash")
+_hash_pending = 0
+_hash_lock = threading.Lock()
+
+def _submit_hash_job(fn, *args) -> Future:
+    global _hash_pending
+    with _hash_lock:
+        if _hash_pending >= PASSWORD_HASH_CONCURRENCY + PASSWORD_HASH_QUEUE:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent sign-ins, please retry",
+                headers={"Retry-After": "1"},
+            )
+        _hash_pending += 1
+    future = _hash_pool.submit(fn, *args)
+    future.add_done_callback(_hash_job_done)
+    return future
+
+def _hash_job_done(future: Future):
+    global _hash_pending
+    with _hash_lock:
+        _hash_pending -= 1
+
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return _submit_hash_job(pwd_context.verify, plain_password, hashed_password).result()
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return _submit_hash_job(pwd_context.hash, password).result()
+
+async def get_password_hash_async(password):
+    return await asyncio.wrap_future(_submit_hash_job(pwd_context.hash, password))
+
+def _timed_verify_and_update(plain_password, hashed_password):
+    started = time.perf_counter()
+    try:
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+    finally:
+        metrics.observe("password_verify_seconds", time.perf_counter() - started)
+
+async def verify_and_update_password_async(plain_password, hashed_password):
+    """
+    verify_password for async handlers (waits on the pool without holding a threadpool
+    slot) that also re-hashes passwords stored with outdated settings, in the same pool
+    job. Returns (verified, new_hash); new_hash is None when no update is needed.
+    """
+    return await asyncio.wrap_future(_submit_hash_job(_timed_verify_and_update, plain_password, hashed_password))
 
 def generate_totp_secret():
     return pyotp.random_base32()
@@ -40,24 +109,237 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
-    credentials_exception = HTTPException(
+def access_token_for(user: models.User, expires_delta: Optional[timedelta] = None):
+    """Access token carrying the claims get_current_user authorizes from (see TokenVersions)."""
+    version = user.token_version or 0
+    # Users created since the last reload are not in the table yet
+    _token_versions.note(user.id, user.username, version)
+    return create_access_token(
+        data={
+            "sub": user.username,
+            "uid": user.id,
+            "role": user.role.value,
+            "team": user.team_id,
+            "tv": version,
+        },
+        expires_delta=expires_delta,
+    )
+
+def revoke_token_claims(user: models.User):
+    """Mark claims in the user's outstanding tokens stale; call before committing a change to their username, role or team."""
+    user.token_version = (user.token_version or 0) + 1
+
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "4096"))
+
+@dataclass(frozen=True)
+class Principal:
+    """Detached snapshot of the authenticated user: the fields authorization checks read."""
+    id: int
+    username: str
+    role: models.UserRole
+    team_id: Optional[int] = None
+
+# Token subject (username) -> Principal. Entries are dropped by invalidate_principal()
+# when the row changes in this worker; other workers pick it up within the TTL.
+_principals = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+metrics.counter("principal_cache_hits_total", "Authenticated requests served from the principal cache")
+metrics.counter("principal_cache_misses_total", "Authenticated requests that loaded the user row")
+metrics.gauge("principal_cache_entries", "Principals currently cached", lambda: len(_principals))
+
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+TOKEN_VERSION_REFRESH = float(os.getenv("TOKEN_VERSION_REFRESH", "2"))
+
+class TokenVersions:
+    """
+    user id -> (username, token_version), loaded from that user's row when first
+    needed and again once older than `refresh` seconds, or after a change in this
+    worker (see invalidate_principal). Token claims are only trusted while their
+    "sub" and "tv" match, so other workers see a role change within `refresh`
+    seconds; deleted users are held as (None, None) and never match. User ids are
+    never reused (AUTOINCREMENT), so a token cannot match an account created after
+    its own was deleted.
+
+    Only users presenting tokens are loaded, one primary-key lookup each, so the
+    cost follows active users rather than the size of the users table.
+    """
+
+    def __init__(self, refresh: float, maxsize: int):
+        self._entries = TTLCache(maxsize=maxsize, ttl=refresh)
+
+    def get(self, user_id: int) -> Optional[tuple]:
+        """The user's (username, token_version), or None when not loaded (or expired)."""
+        return self._entries.get(user_id)
+
+    def remember(self, user_id: int, row) -> tuple:
+        entry = (row.username, row.token_version) if row is not None else (None, None)
+        self._entries.set(user_id, entry)
+        return entry
+
+    def note(self, user_id: int, username: str, version: int):
+        self._entries.set(user_id, (username, version))
+
+    def clear(self):
+        self._entries.clear()
+
+_token_versions = TokenVersions(TOKEN_VERSION_REFRESH, PRINCIPAL_CACHE_SIZE)
+metrics.counter("token_claims_authorized_total", "Authenticated requests authorized from token claims alone")
+metrics.counter("token_claims_stale_total", "Tokens whose claims were outdated, authorized from the user row instead")
+
+def _token_version_query(user_id: int):
+    return select(models.User.username, models.User.token_version).where(models.User.id == user_id)
+
+def _decode_token(token: str, scope: Optional[str] = None) -> dict:
+    """Verified payload of a token issued for `scope` (None: access tokens)."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = schemas.TokenData(username=username)
+        if username is None or payload.get("scope") != scope:
+            raise _credentials_exception()
+        schemas.TokenData(username=username)
     except JWTError:
-        raise credentials_exception
-    user = db.query(models.User).filter(models.User.username == token_data.username).first()
-    if user is None:
-        raise credentials_exception
-    return user
+        raise _credentials_exception()
+    return payload
+
+def _has_claims(payload: dict) -> bool:
+    return "uid" in payload and "tv" in payload
+
+def _claims_principal(payload: dict) -> Optional[Principal]:
+    """Principal from the token's own claims, or None when it has none or they are stale."""
+    if not _has_claims(payload):
+        return None
+    if _token_versions.get(payload["uid"]) != (payload["sub"], payload["tv"]):
+        metrics.inc("token_claims_stale_total")
+        return None
+    try:
+        role = models.UserRole(payload["role"])
+    except (KeyError, ValueError):
+        return None
+    metrics.inc("token_claims_authorized_total")
+    return Principal(id=payload["uid"], username=payload["sub"], role=role, team_id=payload.get("team"))
+
+def _cached_principal(username: str) -> Optional[Principal]:
+    principal = _principals.get(username)
+    metrics.inc("principal_cache_hits_total" if principal is not None else "principal_cache_misses_total")
+    return principal
+
+def _principal_query(username: str):
+    return select(models.User.id, models.User.username, models.User.role, models.User.team_id)\
+        .where(models.User.username == username)
+
+def _remember_principal(username: str, row) -> Principal:
+    if row is None:
+        raise _credentials_exception()
+    principal = Principal(id=row.id, username=row.username, role=row.role, team_id=row.team_id)
+    _principals.set(username, principal)
+    return principal
+
+def _check_account(payload: dict, principal: Principal) -> Principal:
+    """Tokens with claims only authorize the account they were issued for, never a later one with its username."""
+    if _has_claims(payload) and principal.id != payload["uid"]:
+        raise _credentials_exception()
+    return principal
+
+def principal_from_token(token: str, db: Session) -> Principal:
+    """Resolve a bearer token to a Principal, raising 401 if it is invalid."""
+    payload = _decode_token(token)
+    if _has_claims(payload) and _token_versions.get(payload["uid"]) is None:
+        _token_versions.remember(payload["uid"], db.execute(_token_version_query(payload["uid"])).first())
+    principal = _claims_principal(payload)
+    if principal is not None:
+        return principal
+    username = payload["sub"]
+    principal = _cached_principal(username)
+    if principal is None:
+        principal = _remember_principal(username, db.execute(_principal_query(username)).first())
+    return _check_account(payload, principal)
+
+STREAM_SCOPE = "stream"
+STREAM_TICKET_EXPIRE_SECONDS = int(os.getenv("STREAM_TICKET_EXPIRE_SECONDS", "60"))
 
-async def get_current_active_user(current_user: models.User = Depends(get_current_user)):
+@dataclass(frozen=True)
+class StreamGrant:
+    """What an event stream was opened as; stream_grant_valid() re-checks it on every poll."""
+    user_id: int
+    username: str
+    token_version: int
+    expires_at: int  # exp of the access token behind the stream
+
+def _stream_grant(token: str, db: Session) -> StreamGrant:
+    principal = principal_from_token(token, db)
+    row = db.execute(_token_version_query(principal.id)).first()
+    if row is None:
+        raise _credentials_exception()
+    return StreamGrant(principal.id, row.username, row.token_version or 0, _decode_token(token)["exp"])
+
+def create_stream_ticket(token: str, db: Session) -> str:
+    """
+    Short-lived credential for opening an event stream from EventSource, which
+    cannot send headers: unlike the access token it may go in a URL, since it
+    expires within STREAM_TICKET_EXPIRE_SECONDS and authorizes nothing else.
+    """
+    grant = _stream_grant(token, db)
+    return create_access_token(
+        data={
+            "sub": grant.username,
+            "uid": grant.user_id,
+            "tv": grant.token_version,
+            "grant_exp": grant.expires_at,
+            "scope": STREAM_SCOPE,
+        },
+        expires_delta=timedelta(seconds=STREAM_TICKET_EXPIRE_SECONDS),
+    )
+
+def stream_grant_valid(grant: StreamGrant, user: Optional[models.User]) -> bool:
+    """False once the access token behind the stream expired or the user changed (deleted, renamed, claims revoked)."""
+    return (
+        user is not None
+        and time.time() < grant.expires_at
+        and user.username == grant.username
+        and (user.token_version or 0) == grant.token_version
+    )
+
+def stream_grant(db: Session, ticket: Optional[str] = None, token: Optional[str] = None) -> StreamGrant:
+    """Authorize opening an event stream with a ticket from create_stream_ticket() or a bearer token."""
+    if ticket is None:
+        return _stream_grant(token, db)
+    payload = _decode_token(ticket, STREAM_SCOPE)
+    grant = StreamGrant(payload["uid"], payload["sub"], payload["tv"], payload["grant_exp"])
+    if not stream_grant_valid(grant, db.get(models.User, grant.user_id)):
+        raise _credentials_exception()
+    return grant
+
+def invalidate_principal(*usernames: str):
+    """Forget cached principals; call after committing a change to the user row."""
+    for username in usernames:
+        _principals.pop(username)
+    _token_versions.clear()
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(database.get_async_db)):
+    payload = _decode_token(token)
+    if _has_claims(payload) and _token_versions.get(payload["uid"]) is None:
+        _token_versions.remember(payload["uid"], (await db.execute(_token_version_query(payload["uid"]))).first())
+    principal = _claims_principal(payload)
+    if principal is not None:
+        return principal
+    username = payload["sub"]
+    principal = _cached_principal(username)
+    if principal is None:
+        principal = _remember_principal(username, (await db.execute(_principal_query(username))).first())
+    return _check_account(payload, principal)
+
+async def get_current_active_user(current_user: Principal = Depends(get_current_user)):
     return current_user
+
+async def get_current_db_user(current_user: Principal = Depends(get_current_active_user), db: AsyncSession = Depends(database.get_async_db)) -> models.User:
+    """The authenticated user's row (in the request's AsyncSession), for handlers that read or modify more than the Principal holds."""
+    user = await db.get(models.User, current_user.id)
+    if user is None:
+        raise _credentials_exception()
+    return user
@@ -0,0 +1,132 @@
+"""
+Small in-process caches.
+
+Each gunicorn worker has its own copy, so cached values must either be
+validated against something shared (a generation read from the database) or
+be acceptable to serve until their TTL runs out.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+from . import metrics
+
+_MISSING = object()
+_caches: List[Any] = []
+
+
+def register(cache):
+    """Include `cache` (anything with a clear() method) in clear_all()."""
+    _caches.append(cache)
+    return cache
+
+
+class TTLCache:
+    """Thread-safe LRU mapping whose entries also expire `ttl` seconds after being set."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        register(self)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class GenerationCache:
+    """
+    Results cached per key together with the generation they were computed at,
+    for the async routes of this process.
+
+    An entry is served only while the caller's generation (read from the
+    database, so every worker agrees on it) still matches. Concurrent misses for
+    the same key and generation share one computation: the first caller runs
+    it and the others await its result (or its exception).
+
+    Exports <name>_cache_hits_total, _misses_total and _coalesced_total.
+    """
+
+    def __init__(self, name: str, maxsize: int = 512, ttl: float = 300.0):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._metrics = {outcome: f"{name}_cache_{outcome}_total" for outcome in ("hits", "misses", "coalesced")}
+        for outcome, metric in self._metrics.items():
+            metrics.counter(metric, f"{name} cache lookups: {outcome}")
+        register(self)
+
+    async def get_or_compute(self, key: Hashable, generation: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        while True:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] == generation:
+                metrics.inc(self._metrics["hits"])
+                return cached[1]
+            flight = self._inflight.get((key, generation))
+            if flight is None:
+                break
+            metrics.inc(self._metrics["coalesced"])
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+                # The computing request went away; try again
+
+        metrics.inc(self._metrics["misses"])
+        flight = asyncio.get_running_loop().create_future()
+        self._inflight[(key, generation)] = flight
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as e:
+            flight.set_exception(e)
+            flight.exception()  # Retrieved: no warning when nobody was waiting
+            raise
+        else:
+            self._entries.set(key, (generation, value))
+            flight.set_result(value)
+            return value
+        finally:
+            del self._inflight[(key, generation)]
+
+    def clear(self):
+        self._entries.clear()
+
+
+def clear_all():
+    """Empty every cache in this process (tests, or after restoring a database)."""
+    for cache in _caches:
+        cache.clear()
@@ -1,4 +1,9 @@
-from sqlalchemy import create_engine
+from functools import partial
+
+import anyio
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -22,6 +27,20 @@ engine = create_engine(
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def _async_url(url: str) -> str:
+    """Same database through an asyncio driver: aiosqlite for SQLite, asyncpg for PostgreSQL."""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql:") or url.startswith("postgresql+psycopg2:"):
+        # asyncpg spells libpq's sslmode as ssl
+        return "postgresql+asyncpg:" + url.split(":", 1)[1].replace("sslmode=", "ssl=")
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_url(SQLALCHEMY_DATABASE_URL))
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool_args)
+# expire_on_commit=False: attributes are read after commit, outside the session's greenlet
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def get_db():
@@ -30,3 +49,49 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Heavy reads (row loading and serialization are CPU-bound Python) run in worker
+# threads on the request's sync Session, never on the event loop, and at most
+# READ_CONCURRENCY at a time per worker: more threads would only contend with the
+# event loop for the GIL (see scripts/bench_read_storm.py).
+READ_CONCURRENCY = int(os.getenv("READ_CONCURRENCY", str(min(2, os.cpu_count() or 1))))
+_read_limiter = anyio.CapacityLimiter(READ_CONCURRENCY)
+
+async def run_read(fn, *args):
+    """Await fn(*args) run in a worker thread, queued behind READ_CONCURRENCY other reads."""
+    return await anyio.to_thread.run_sync(partial(fn, *args), limiter=_read_limiter)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def upsert_increment(db, table, key_columns, value_columns, rows, **set_values):
+    """
+    INSERT rows into `table`; where a row with the same key columns exists, add the
+    new values to its `value_columns` instead (and set `set_values`). Atomic per
+    row, so concurrent increments are never lost. Needs a unique key on key_columns.
+    """
+    if not rows:
+        return
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={**{column: table.c[column] + statement.excluded[column] for column in value_columns}, **set_values},
+    )
+    db.execute(statement, rows)
+
+
+# advisory_xact_lock keys
+TASK_WRITE_LOCK = 0x7461736b  # task_events hooks and the achievements repair jobs
+
+
+def advisory_xact_lock(db, key: int):
+    """
+    Block until this transaction holds the lock `key`; it is released on commit or
+    rollback. Uses pg_advisory_xact_lock on PostgreSQL; SQLite already serializes
+    writers, so it is a no-op there.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(select(func.pg_advisory_xact_lock(key)))
@@ -0,0 +1,67 @@
+"""
+ETag helpers for conditional GET requests.
+
+ETags are derived from version counters rather than from response bodies, so a
+matching If-None-Match can be answered with 304 before anything is loaded or
+serialized:
+    - tasks.version, bumped by backend.task_events on every task write
+    - data_versions rows, one counter per scope, bumped by user and team writes
+      and (ANALYTICS) by analytics/achievement repair jobs; task writes are
+      tracked by max(task_changes.seq) instead of a shared counter row
+"""
+
+import hashlib
+from typing import Any
+
+from fastapi import Request, Response
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from . import models
+
+USERS = "users"
+TEAMS = "teams"
+ANALYTICS = "analytics"
+
+# Browsers must revalidate, which makes them send If-None-Match on every fetch
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+def get_version(db: Session, scope: str) -> int:
+    version = db.query(models.DataVersion.version).filter(models.DataVersion.scope == scope).scalar()
+    return version or 0
+
+
+def bump_version(db: Session, scope: str):
+    """Increment the counter for `scope` in the current transaction."""
+    result = db.execute(
+        update(models.DataVersion)
+        .where(models.DataVersion.scope == scope)
+        .values(version=models.DataVersion.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.add(models.DataVersion(scope=scope, version=1))
+        db.flush()
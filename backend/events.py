@@ -0,0 +1,193 @@
+"""
+Real-time task change events (served by GET /events/tasks).
+
+The `task_changes` log written by task_events is the source of truth: an event
+is a task_changes row and its id is the row's `seq`. Subscribers read the log
+after their last seen id, so reconnecting clients resume with Last-Event-ID and
+nothing is lost between workers. Task writes commit in seq order (see
+task_events), so no change can appear behind an id a subscriber has passed.
+
+A broker only tells waiting subscribers *when* to read the log again:
+    - "changelog" (default): wakes on local commits immediately and polls
+      max(task_changes.seq) once per interval, so commits made by other
+      gunicorn workers are picked up through the shared database
+    - "local": wakes on local commits only; enough for a single worker
+
+Select one with the EVENT_BROKER env var or install a custom Broker with
+set_broker().
+"""
+
+import asyncio
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from . import database, models, visibility
+from .task_events import DELETE, PENDING_KEY, UPSERT
+
+POLL_INTERVAL = float(os.getenv("EVENT_POLL_INTERVAL", "1.0"))
+MAX_BATCH = 500
+
+
+class Broker:
+    """In-process wake-ups: notify() may be called from any thread."""
+
+    def __init__(self, session_factory=None):
+        # Sessions used by subscribers to read the log
+        self.session_factory = session_factory or database.SessionLocal
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._event: Optional[asyncio.Event] = None
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.subscribers = 0
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._loop is not loop:
+                self._loop = loop
+                self._event = asyncio.Event()
+
+    def _wake(self):
+        self.generation += 1
+        self._event.set()
+        self._event = asyncio.Event()
+
+    def notify(self):
+        with self._lock:
+            loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wake)
+
+    def subscribe(self):
+        self._bind()
+        self.subscribers += 1
+
+    def unsubscribe(self):
+        self.subscribers = max(0, self.subscribers - 1)
+
+    async def wait(self, generation: int, timeout: float) -> bool:
+        """Wait until the generation moves past `generation`; False on timeout."""
+        self._bind()
+        if self.generation != generation:
+            return True
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+class ChangeLogBroker(Broker):
+    """Also polls the shared task_changes log while anyone is subscribed."""
+
+    def __init__(self, session_factory=None, interval: float = POLL_INTERVAL):
+        super().__init__(session_factory)
+        self.interval = interval
+        self._poller: Optional[asyncio.Task] = None
+        self._seen: Optional[int] = None
+
+    def latest_id(self) -> int:
+        db = self.session_factory()
+        try:
+            return latest_id(db)
+        finally:
+            db.close()
+
+    def subscribe(self):
+        super().subscribe()
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.get_running_loop().create_task(self._poll())
+
+    async def _poll(self):
+        loop = asyncio.get_running_loop()
+        while self.subscribers:
+            try:
+                latest = await loop.run_in_executor(None, self.latest_id)
+            except Exception as e:
+                print(f"Event poller error: {e}")
+            else:
+                if self._seen is not None and latest != self._seen:
+                    self._wake()
+                self._seen = latest
+            await asyncio.sleep(self.interval)
+
+
+BROKERS = {
+    "changelog": ChangeLogBroker,
+    "local": Broker,
+}
+
+_broker: Optional[Broker] = None
+
+
+def get_broker() -> Broker:
+    global _broker
+    if _broker is None:
+        _broker = BROKERS[os.getenv("EVENT_BROKER", "changelog")]()
+    return _broker
+
+
+def set_broker(broker: Optional[Broker]):
+    global _broker
+    _broker = broker
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    if session.info.pop(PENDING_KEY, False) and _broker is not None:
+        _broker.notify()
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop(PENDING_KEY, None)
+
+
+def latest_id(db: Session) -> int:
+    return db.query(func.max(models.TaskChange.seq)).scalar() or 0
+
+
+def fetch(db: Session, current_user: models.User, after_id: int, limit: int = MAX_BATCH) -> Tuple[List[Dict], int]:
+    """
+    Events after `after_id` as seen by `current_user`, oldest first, and the id
+    to read from next (the last change scanned, which may not be sent).
+
+    Only the latest change per task is kept. Deletes, and upserts of tasks the user
+    cannot see any more, are sent as deletes to users who could see the task
+    before, matching GET /tasks/changes; other users get nothing.
+    """
+    changes = db.query(models.TaskChange.seq, models.TaskChange.task_id, models.TaskChange.op)\
+        .filter(models.TaskChange.seq > after_id)\
+        .order_by(models.TaskChange.seq)\
+        .limit(limit)\
+        .all()
+    if not changes:
+        return [], after_id
+
+    latest = {}
+    for change in changes:
+        latest[change.task_id] = change
+    upserted = [task_id for task_id, change in latest.items() if change.op == UPSERT]
+
+    versions = {}
+    if upserted:
+        versions = dict(
+            db.query(models.Task.id, models.Task.version)
+            .filter(visibility.visibility_filter(current_user), models.Task.id.in_(upserted))
+            .all()
+        )
+
+    tombstones = {task_id: change.seq for task_id, change in latest.items() if change.op == DELETE}
+    deleted = visibility.former_audience(db, current_user, set(upserted) - set(versions), tombstones)
+
+    events = []
+    for change in sorted(latest.values(), key=lambda c: c.seq):
+        if change.op == UPSERT and change.task_id in versions:
+            events.append({"id": change.seq, "task_id": change.task_id, "op": UPSERT, "version": versions[change.task_id]})
+        elif change.task_id in deleted:
+            events.append({"id": change.seq, "task_id": change.task_id, "op": DELETE})
+    return events, changes[-1].seq
@@ -5,7 +5,7 @@ Export utilities for generating CSV and PDF reports from task achievements
 import csv
 import io
 from datetime import datetime
-from typing import List
+from typing import Iterable, Iterator, List, Optional
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
@@ -13,6 +13,46 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 
+CSV_HEADER = ['Task Name', 'Completion Date', 'Criticality', 'Assigned By', 'Description']
+CSV_CHUNK_ROWS = 500
+
+
+def _csv_row(title, completed_at: Optional[datetime], criticality: str, assigner: str, description) -> list:
+    description = description or ''
+    if len(description) > 100:
+        description = description[:97] + '...'
+    return [
+        title or '',
+        completed_at.strftime('%Y-%m-%d %H:%M') if completed_at else '',
+        (criticality or '').upper(),
+        assigner or 'N/A',
+        description
+    ]
+
+
+def stream_csv(rows: Iterable[tuple]) -> Iterator[str]:
+    """
+    Generate CSV content incrementally, in chunks of CSV_CHUNK_ROWS rows
+    
+    Args:
+        rows: (title, completed_at, criticality, assigner username, description) tuples,
+            consumed lazily (e.g. straight from a yield_per query)
+        
+    Returns:
+        Iterator of CSV text chunks; memory stays constant in the number of rows
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(_csv_row(*row))
+        if count % CSV_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
 def generate_csv(tasks: List[dict], username: str) -> str:
     """
     Generate CSV content from completed tasks
@@ -24,31 +64,17 @@ def generate_csv(tasks: List[dict], username: str) -> str:
     Returns:
         CSV content as string
     """
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow(['Task Name', 'Completion Date', 'Criticality', 'Assigned By', 'Description'])
-    
-    # Write task data
-    for task in tasks:
-        completion_date = task.get('completed_at', '')
-        if completion_date:
-            completion_date = datetime.fromisoformat(completion_date.replace('Z', '+00:00')).strftime('%Y-%m-%d %H:%M')
-        
-        description = task.get('description', '')
-        if description and len(description) > 100:
-            description = description[:97] + '...'
-        
-        writer.writerow([
+    rows = (
+        (
             task.get('title', ''),
-            completion_date,
-            task.get('criticality', '').upper(),
+            datetime.fromisoformat(task['completed_at'].replace('Z', '+00:00')) if task.get('completed_at') else None,
+            task.get('criticality', ''),
             task.get('assigner', {}).get('username', 'N/A'),
-            description
-        ])
-    
-    return output.getvalue()
+            task.get('description', '')
+        )
+        for task in tasks
+    )
+    return ''.join(stream_csv(rows))
 
 
 def generate_pdf(tasks: List[dict], username: str, period: str = "month") -> bytes:
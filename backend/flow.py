@@ -0,0 +1,225 @@
+"""
+Flow analytics: how long tasks spend in each status.
+
+A task's status history is reconstructed from the rows that record it:
+    - task_updates.status (POST /tasks/{id}/update)
+    - task_activities of type STATUS_CHANGE: "Status changed to ..." (PUT
+      /tasks/{id}) and the approval messages (POST /tasks/{id}/approve)
+Tasks start in ONGOING (the TaskCreate default) at created_at; each recorded
+status closes the interval of the previous one. Intervals still open are not
+counted.
+
+build_flow() makes one ordered pass over three streams sorted by task id
+(tasks, their status events, their assignees from task_visibility), merged
+in Python with memory bounded by one task's history. Every closed interval is
+appended to flat arrays as (metric, group, hours); the median/p90/p99 per
+(metric, group) are then computed for all groups at once with NumPy.
+"""
+
+from array import array
+from datetime import datetime
+from itertools import groupby
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import literal, select, union_all
+from sqlalchemy.orm import Session
+
+from . import models, visibility
+
+BATCH_SIZE = 5000
+
+TRACKED_STATES = [
+    models.TaskStatus.ONGOING,
+    models.TaskStatus.BLOCKED,
+    models.TaskStatus.NEEDS_REVIEW,
+    models.TaskStatus.PENDING_APPROVAL,
+    models.TaskStatus.PENDING_GROUP_HEAD_APPROVAL,
+]
+LEAD_TIME = "lead_time"  # created_at -> completed_at of COMPLETED tasks
+METRICS = [state.value for state in TRACKED_STATES] + [LEAD_TIME]
+PERCENTILES = {"median": 0.5, "p90": 0.9, "p99": 0.99}
+
+ALL = ("all", None)
+
+# Title-cased labels written by tasks._apply_task_update
+_STATUS_LABELS = {status.value.replace("_", " ").title(): status.value for status in models.TaskStatus}
+_STATUS_CHANGED = "Status changed to "
+
+
+def _activity_status(description: Optional[str]) -> Optional[str]:
+    """The status a STATUS_CHANGE activity moved its task to, or None if it is not a transition."""
+    if not description:
+        return None
+    if description.startswith(_STATUS_CHANGED):
+        return _STATUS_LABELS.get(description[len(_STATUS_CHANGED):])
+    if description.startswith("Task approved and marked as completed"):
+        return models.TaskStatus.COMPLETED.value
+    if "forwarded to Group Head" in description:
+        return models.TaskStatus.PENDING_GROUP_HEAD_APPROVAL.value
+    return None
+
+
+def _stream(db: Session, statement):
+    return db.execute(statement.execution_options(yield_per=BATCH_SIZE))
+
+
+def _tasks(db: Session):
+    task = models.Task
+    return _stream(db, select(task.id, task.created_at, task.status, task.completed_at).order_by(task.id))
+
+
+def _events(db: Session) -> Iterator[Tuple[int, datetime, str]]:
+    """(task_id, at, status) for every recorded transition, by task then time."""
+    updates = select(
+        models.TaskUpdate.task_id, models.TaskUpdate.created_at, models.TaskUpdate.id,
+        literal(True).label("is_update"), models.TaskUpdate.status,
+    )
+    activities = select(
+        models.TaskActivity.task_id, models.TaskActivity.created_at, models.TaskActivity.id,
+        literal(False).label("is_update"), models.TaskActivity.description,
+    ).where(models.TaskActivity.activity_type == models.ActivityType.STATUS_CHANGE)
+    events = union_all(updates, activities).subquery()
+    rows = _stream(db, select(events).where(events.c.created_at != None).order_by(
+        events.c.task_id, events.c.created_at, events.c.is_update, events.c.id,
+    ))
+    for task_id, at, _, is_update, text in rows:
+        status = text if is_update else _activity_status(text)
+        if status:
+            yield task_id, at, status
+
+
+def _assignees(db: Session):
+    TV = models.TaskVisibility
+    return _stream(db, select(TV.task_id, TV.user_id, TV.team_id).where(TV.relation == visibility.ASSIGNEE).order_by(TV.task_id))
+
+
+def _by_task(rows) -> Iterator[Tuple[int, list]]:
+    for task_id, group in groupby(rows, key=lambda row: row[0]):
+        yield task_id, list(group)
+
+
+def _next(iterator):
+    return next(iterator, (None, []))
+
+
+class _Samples:
+    """Flat (metric, group, hours) columns; groups are interned to small ints."""
+
+    def __init__(self):
+        self.metrics = array("l")
+        self.groups = array("l")
+        self.hours = array("d")
+        self.group_keys: List[tuple] = []
+        self._group_index: Dict[tuple, int] = {}
+
+    def group_codes(self, keys) -> List[int]:
+        codes = []
+        for key in keys:
+            code = self._group_index.get(key)
+            if code is None:
+                code = self._group_index[key] = len(self.group_keys)
+                self.group_keys.append(key)
+            codes.append(code)
+        return codes
+
+    def add(self, metric: int, codes: List[int], hours: float):
+        for code in codes:
+            self.metrics.append(metric)
+            self.groups.append(code)
+            self.hours.append(hours)
+
+
+def _hours(start: datetime, end: datetime) -> float:
+    return (end - start).total_seconds() / 3600
+
+
+def collect(db: Session, since: Optional[datetime] = None) -> _Samples:
+    """Reconstruct every task's closed status intervals (ending at or after `since`) in one pass."""
+    samples = _Samples()
+    metric_index = {metric: i for i, metric in enumerate(METRICS)}
+    events, assignees = _by_task(_events(db)), _by_task(_assignees(db))
+    event_task, task_events = _next(events)
+    assignee_task, task_assignees = _next(assignees)
+
+    for task_id, created_at, status, completed_at in _tasks(db):
+        # Both streams are ordered by task id; skip rows of deleted tasks
+        while event_task is not None and event_task < task_id:
+            event_task, task_events = _next(events)
+        while assignee_task is not None and assignee_task < task_id:
+            assignee_task, task_assignees = _next(assignees)
+        history = task_events if event_task == task_id else []
+        keys = [ALL]
+        if assignee_task == task_id:
+            keys += sorted({("team", team_id) for _, _, team_id in task_assignees if team_id is not None})
+            keys += sorted({("user", user_id) for _, user_id, _ in task_assignees})
+        codes = None
+
+        state, entered = models.TaskStatus.ONGOING.value, created_at
+        for _, at, new_state in history:
+            if new_state == state:
+                continue
+            if entered is not None and state in metric_index and (since is None or at >= since):
+                codes = codes or samples.group_codes(keys)
+                samples.add(metric_index[state], codes, _hours(entered, at))
+            state, entered = new_state, at
+
+        if (status == models.TaskStatus.COMPLETED and created_at and completed_at
+                and (since is None or completed_at >= since)):
+            codes = codes or samples.group_codes(keys)
+            samples.add(metric_index[LEAD_TIME], codes, _hours(created_at, completed_at))
+    return samples
+
+
+def summarize(samples: _Samples) -> Dict[tuple, Dict[str, dict]]:
+    """{group key: {metric: {count, median, p90, p99}}}, with all (metric, group) pairs computed together."""
+    if not samples.hours:
+        return {}
+    metrics = np.frombuffer(samples.metrics, dtype=np.dtype("l"))
+    groups = np.frombuffer(samples.groups, dtype=np.dtype("l"))
+    hours = np.frombuffer(samples.hours, dtype=np.float64)
+
+    # Sort by (metric, group, hours): each (metric, group) pair becomes a sorted segment
+    order = np.lexsort((hours, groups, metrics))
+    metrics, groups, hours = metrics[order], groups[order], hours[order]
+    starts = np.flatnonzero(np.r_[True, (metrics[1:] != metrics[:-1]) | (groups[1:] != groups[:-1])])
+    counts = np.diff(np.r_[starts, len(hours)])
+
+    values = {}
+    for name, q in PERCENTILES.items():
+        # Linear interpolation between closest ranks, as numpy.percentile does by default
+        position = starts + q * (counts - 1)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, starts + counts - 1)
+        values[name] = hours[lower] + (hours[upper] - hours[lower]) * (position - lower)
+
+    summary: Dict[tuple, Dict[str, dict]] = {}
+    for i, start in enumerate(starts):
+        key = samples.group_keys[groups[start]]
+        summary.setdefault(key, {})[METRICS[metrics[start]]] = {
+            "count": int(counts[i]),
+            **{name: round(float(values[name][i]), 2) for name in PERCENTILES},
+        }
+    return summary
+
+
+def build_flow(db: Session, since: Optional[datetime] = None) -> dict:
+    """Time-in-status and lead-time distributions (hours) overall, per team and per user."""
+    summary = summarize(collect(db, since))
+    teams = db.query(models.Team.id, models.Team.name).order_by(models.Team.id).all()
+    team_ids = {team_id for kind, team_id in summary if kind == "team"}
+    user_ids = sorted(user_id for kind, user_id in summary if kind == "user")
+    usernames = dict(db.query(models.User.id, models.User.username).filter(models.User.id.in_(user_ids)).all()) if user_ids else {}
+    return {
+        "unit": "hours",
+        "metrics": METRICS,
+        "all": summary.get(ALL, {}),
+        "team_data": [
+            {"team_id": team_id, "name": name, "metrics": summary[("team", team_id)]}
+            for team_id, name in teams if team_id in team_ids
+        ],
+        "user_data": [
+            {"user_id": user_id, "username": usernames.get(user_id), "metrics": summary[("user", user_id)]}
+            for user_id in user_ids
+        ],
+    }
@@ -1,10 +1,13 @@
+import asyncio
 from fastapi import FastAPI, Depends, HTTPException
 import os
 from sqlalchemy.orm import Session
 from fastapi.middleware.cors import CORSMiddleware
-from . import models, database
+from fastapi.concurrency import run_in_threadpool
+from . import models, database, visibility, search, rollups, achievements, metrics
 from . import auth as auth_utils # Import utility module with alias
-from .routers import auth, users, teams, tasks, analytics, github
+from .routers import auth, users, teams, tasks, analytics, github, events, dashboard
+from .pagination import NEXT_CURSOR_HEADER
 
 # Create database tables only in development
 if os.getenv("APP_ENV", "development") == "development":
@@ -14,7 +17,7 @@ import logging
 # logging.basicConfig(level=logging.INFO)
 
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 
 app = FastAPI(title="SyncDeck API")
 
@@ -37,8 +40,8 @@ def debug_file(filename: str):
         "cwd": os.getcwd()
     }
 
-@app.on_event("startup")
-async def startup_event():
+def _prepare_database():
+    """Create tables, seed testadmin and backfill derived indexes (blocking; runs off the event loop)."""
     try:
         models.Base.metadata.create_all(bind=database.engine)
         print("Startup: Tables created (or already existed).")
@@ -68,12 +71,48 @@ async def startup_event():
                     print("Startup: Password reset.")
                 else:
                     print("Startup: Password verified.")
+
+            # Backfill the task visibility index for databases created before it existed
+            if visibility.is_empty(db) and db.query(models.Task.id).first() is not None:
+                print("Startup: Building task visibility index...")
+                visibility.rebuild(db)
+                db.commit()
+
+            if search.is_empty(db) and db.query(models.Task.id).first() is not None:
+                print("Startup: Building task search index...")
+                search.rebuild(db)
+                db.commit()
+
+            if rollups.is_empty(db) and db.query(models.Task.id).first() is not None:
+                print("Startup: Building analytics rollups...")
+                rollups.rebuild(db)
+                db.commit()
+
+            if achievements.is_empty(db) and db.query(models.Task.id).filter(models.Task.status == models.TaskStatus.COMPLETED).first() is not None:
+                print("Startup: Recounting member achievements...")
+                achievements.reconcile(db)
+                achievements.replay_history(db)
+                db.commit()
         finally:
             db.close()
             
     except Exception as e:
         print(f"Startup Error: {e}")
 
+_background_jobs = []
+
+@app.on_event("startup")
+async def startup_event():
+    await run_in_threadpool(_prepare_database)
+    if achievements.RECONCILE_INTERVAL > 0:
+        _background_jobs.append(asyncio.create_task(achievements.reconcile_periodically()))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for job in _background_jobs:
+        job.cancel()
+    _background_jobs.clear()
+
 @app.get("/debug/config")
 def debug_config():
     import os
@@ -100,6 +139,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
 
@@ -112,6 +152,15 @@ app.include_router(teams.router)
 app.include_router(tasks.router)
 app.include_router(analytics.router)
 app.include_router(github.router)
+app.include_router(events.router)
+app.include_router(dashboard.router)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics(current_user: models.User = Depends(auth_utils.get_current_active_user)):
+    """Per-worker counters (principal cache hit rate, ...) in the Prometheus text format. Group head only."""
+    if current_user.role != models.UserRole.GROUP_HEAD:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return metrics.render()
 
 # Health Check
 @app.get("/")
@@ -0,0 +1,86 @@
+"""
+Process-local counters exposed at GET /metrics in the Prometheus text format.
+
+Every gunicorn worker keeps its own values; scrape each worker or sum them
+on the monitoring side.
+"""
+
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = defaultdict(float)
+_gauges: Dict[str, Callable[[], float]] = {}
+_summaries: Dict[str, List[float]] = {}
+_help: Dict[str, str] = {}
+
+
+def counter(name: str, help_text: str):
+    """Declare a counter so it is exported (as 0) before it is first incremented."""
+    _help[name] = help_text
+    with _lock:
+        _counters[name] += 0
+
+
+def gauge(name: str, help_text: str, read: Callable[[], float]):
+    """Declare a gauge whose value is read from `read()` at scrape time."""
+    _help[name] = help_text
+    _gauges[name] = read
+
+
+def summary(name: str, help_text: str):
+    """Declare a summary: observe() adds to its _sum and _count, e.g. to export mean latency."""
+    _help[name] = help_text
+    with _lock:
+        _summaries.setdefault(name, [0, 0])
+
+
+def inc(name: str, amount: float = 1):
+    with _lock:
+        _counters[name] += amount
+
+
+def observe(name: str, amount: float):
+    with _lock:
+        totals = _summaries.setdefault(name, [0, 0])
+        totals[0] += amount
+        totals[1] += 1
+
+
+def value(name: str) -> float:
+    """A counter's value, or for a summary the number of observations."""
+    with _lock:
+        if name in _summaries:
+            return _summaries[name][1]
+        return _counters.get(name, 0)
+
+
+def reset():
+    with _lock:
+        for name in _counters:
+            _counters[name] = 0
+        for name in _summaries:
+            _summaries[name] = [0, 0]
+
+
+def render() -> str:
+    lines = []
+    with _lock:
+        counters = dict(_counters)
+        summaries = {name: list(totals) for name, totals in _summaries.items()}
+    for name in sorted(counters):
+        if name in _help:
+            lines.append(f"# HELP {name} {_help[name]}")
+        lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name} {counters[name]:g}")
+    for name in sorted(summaries):
+        lines.append(f"# HELP {name} {_help[name]}")
+        lines.append(f"# TYPE {name} summary")
+        lines.append(f"{name}_sum {summaries[name][0]:g}")
+        lines.append(f"{name}_count {summaries[name][1]:g}")
+    for name in sorted(_gauges):
+        lines.append(f"# HELP {name} {_help[name]}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {_gauges[name]():g}")
+    return "\n".join(lines) + "\n"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Text, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime, Enum, Text, Boolean, Index
 from sqlalchemy.orm import relationship
 from .database import Base
 import enum
@@ -29,6 +29,8 @@ class TaskStatus(str, enum.Enum):
 
 class User(Base):
     __tablename__ = "users"
+    # Ids are never reused: access tokens identify their account by id (see auth.TokenVersions)
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, index=True)
@@ -38,6 +40,7 @@ class User(Base):
     team_id = Column(Integer, ForeignKey("teams.id"), nullable=True)
     mfa_secret = Column(String, nullable=True)
     github_token = Column(String, nullable=True)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")  # Bumped when token claims go stale
 
     # Relationships
     team = relationship("Team", back_populates="members")
@@ -56,6 +59,10 @@ class Team(Base):
 class TaskAssignee(Base):
     """Junction table for many-to-many relationship between tasks and assignees"""
     __tablename__ = "task_assignees"
+    __table_args__ = (
+        # The primary key covers task -> users; this covers user -> tasks
+        Index("ix_task_assignees_user_id_task_id", "user_id", "task_id"),
+    )
     
     task_id = Column(Integer, ForeignKey("tasks.id"), primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
@@ -68,6 +75,18 @@ class TaskAssignee(Base):
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Keyset pagination order for task listings
+        Index("ix_tasks_created_at_id", "created_at", "id"),
+        # Server-side filters on GET /tasks/
+        Index("ix_tasks_status_created_at", "status", "created_at"),
+        Index("ix_tasks_criticality_deadline", "criticality", "deadline"),
+        Index("ix_tasks_deadline_status", "deadline", "status"),
+        Index("ix_tasks_assigner_id_created_at", "assigner_id", "created_at"),
+        Index("ix_tasks_is_internal_created_at", "is_internal", "created_at"),
+        Index("ix_tasks_completed_at", "completed_at"),
+        Index("ix_tasks_assignee_id_status", "assignee_id", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
@@ -82,6 +101,8 @@ class Task(Base):
     assigner_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     is_internal = Column(Boolean, default=False)
     evidence_url = Column(String, nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Bumped on every write, used for ETags
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=True)
 
     assignee = relationship("User", foreign_keys=[assignee_id], back_populates="assigned_tasks")
     assigner = relationship("User", foreign_keys=[assigner_id], back_populates="created_tasks")
@@ -92,6 +113,20 @@ class Task(Base):
     task_assignees = relationship("TaskAssignee", back_populates="task", cascade="all, delete-orphan")
 
 
+class TaskVisibility(Base):
+    """Precomputed task scopes used to filter task listings by role (maintained by backend.visibility)"""
+    __tablename__ = "task_visibility"
+    __table_args__ = (
+        Index("ix_task_visibility_user_relation", "user_id", "relation", "task_id"),
+        Index("ix_task_visibility_team_relation", "team_id", "relation", "task_id"),
+    )
+
+    task_id = Column(Integer, ForeignKey("tasks.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    relation = Column(String, primary_key=True)  # "assignee" or "assigner"
+    team_id = Column(Integer, nullable=True)  # Team of user_id, denormalized
+
+
 class TaskUpdate(Base):
     __tablename__ = "task_updates"
 
@@ -108,6 +143,9 @@ class TaskUpdate(Base):
 
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (
+        Index("ix_comments_task_id_created_at_id", "task_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text)
@@ -128,6 +166,9 @@ class ActivityType(str, enum.Enum):
 
 class TaskActivity(Base):
     __tablename__ = "task_activities"
+    __table_args__ = (
+        Index("ix_task_activities_task_id_created_at_id", "task_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     task_id = Column(Integer, ForeignKey("tasks.id"))
@@ -203,15 +244,107 @@ class PromotionRequest(Base):
 
 
 
+class TaskChange(Base):
+    """Append-only change sequence for task rows, written in the same transaction as the change"""
+    __tablename__ = "task_changes"
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    task_id = Column(Integer, nullable=False)  # No FK: tombstones outlive the task
+    op = Column(String, nullable=False)  # "upsert" or "delete"
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class TaskChangeAudience(Base):
+    """task_visibility rows of a deleted task, copied with its tombstone so only its former audience gets the delete"""
+    __tablename__ = "task_change_audience"
+
+    seq = Column(Integer, primary_key=True)  # task_changes.seq of the tombstone
+    user_id = Column(Integer, primary_key=True)
+    relation = Column(String, primary_key=True)
+    team_id = Column(Integer, nullable=True)
+
+
+class DataVersion(Base):
+    """Change counter per data scope (e.g. "users", "teams"), used to derive ETags"""
+    __tablename__ = "data_versions"
+
+    scope = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class TaskRollup(Base):
+    """Task counts per dimension and status (maintained by backend.rollups)"""
+    __tablename__ = "task_rollups"
+
+    dimension = Column(String, primary_key=True)  # "all", "team", "user" or "criticality"
+    key = Column(String, primary_key=True)  # "" for "all", else the team id, user id or criticality
+    status = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class TaskDailyCount(Base):
+    """Tasks created and completed per day (UTC), overall and per team (maintained by backend.rollups)"""
+    __tablename__ = "task_daily_counts"
+
+    dimension = Column(String, primary_key=True)  # "all" or "team"
+    key = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    created = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+
+
+class TaskRollupState(Base):
+    """What a task currently contributes to the rollups, so its next change can be retracted exactly"""
+    __tablename__ = "task_rollup_state"
+
+    task_id = Column(Integer, primary_key=True)  # No FK: retracted after the task is gone
+    status = Column(String, nullable=False)
+    created_on = Column(Date, nullable=True)
+    completed_on = Column(Date, nullable=True)
+
+
+class TaskRollupKey(Base):
+    """The (dimension, key) rollup rows a task is counted in"""
+    __tablename__ = "task_rollup_keys"
+    __table_args__ = (
+        Index("ix_task_rollup_keys_dimension_key", "dimension", "key", "task_id"),
+    )
+
+    task_id = Column(Integer, primary_key=True)
+    dimension = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+
+
 class MemberAchievement(Base):
     __tablename__ = "member_achievements"
+    __table_args__ = (
+        # One row per member: counters are upserted by backend.achievements
+        Index("ux_member_achievements_user_id", "user_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     on_time_completion_rate = Column(Integer, default=0) # Stored as percentage 0-100
     total_completed_tasks = Column(Integer, default=0)
     critical_tasks_completed = Column(Integer, default=0)
+    deadline_tasks_completed = Column(Integer, default=0, server_default="0")
+    on_time_tasks_completed = Column(Integer, default=0, server_default="0")
     current_no_blocker_streak = Column(Integer, default=0)
     last_updated = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User")
+
+
+class AchievementCredit(Base):
+    """Assigned task -> the state it is counted with in member_achievements (maintained by backend.achievements)"""
+    __tablename__ = "achievement_credits"
+    __table_args__ = (
+        Index("ix_achievement_credits_user_id", "user_id"),
+    )
+
+    task_id = Column(Integer, primary_key=True)  # No FK: un-credited after the task is gone
+    user_id = Column(Integer, nullable=False)
+    completed = Column(Boolean, nullable=False, default=False)
+    critical = Column(Boolean, nullable=False, default=False)
+    on_time = Column(Boolean, nullable=True)  # Null unless completed with a deadline
+    blocked = Column(Boolean, nullable=False, default=False)
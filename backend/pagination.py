@@ -0,0 +1,104 @@
+"""
+Keyset (cursor) pagination helpers for list endpoints.
+
+Cursors are opaque url-safe strings encoding the ordering key of the last row
+of a page. The next page is fetched with a range predicate on that key instead
+of OFFSET, so deep pages cost the same as the first one.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+DEFAULT_PAGE_SIZE = 100
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if hasattr(value, "value"):  # Enum members
+        return value.value
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        return [_decode_value(v) for v in values]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _after(columns: Sequence[Any], values: Sequence[Any], descending: bool):
+    """Row-value comparison `(c1, c2, ...) < (v1, v2, ...)` spelled out for portability."""
+    clauses = []
+    for i, column in enumerate(columns):
+        equal_prefix = [columns[j] == values[j] for j in range(i)]
+        step = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal_prefix, step))
+    return or_(*clauses)
+
+
+def paginate(
+    query,
+    columns: Sequence[Any],
+    key: Callable[[Any], Tuple],
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    skip: int = 0,
+    descending: bool = True,
+):
+    """
+    Order `query` by `columns` and return one page of rows plus the next cursor.
+
+    Args:
+        query: SQLAlchemy query to paginate
+        columns: Ordering expressions; the last one must be unique (usually the id)
+        key: Extracts the ordering values from a returned row
+        cursor: Cursor returned with the previous page; takes precedence over skip
+        limit: Page size. None returns every remaining row
+        skip: Legacy offset, only used when no cursor is given
+        descending: Sort direction applied to every column
+
+    Returns:
+        (rows, next_cursor) where next_cursor is None on the last page
+    """
+    if cursor:
+        query = query.filter(_after(columns, decode_cursor(cursor, len(columns)), descending))
+        if limit is None:
+            limit = DEFAULT_PAGE_SIZE
+
+    query = query.order_by(*[c.desc() if descending else c.asc() for c in columns])
+    if skip and not cursor:
+        query = query.offset(skip)
+
+    if limit is None:
+        return query.all(), None
+
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(key(rows[-1]))
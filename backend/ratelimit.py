@@ -0,0 +1,222 @@
+"""
+Sliding-window throttling of login attempts (POST /token).
+
+Failed attempts are counted per username and per client IP. An attempt is
+rejected with 429 when either key already has `limit` attempts in the last
+`window` seconds; rejected attempts are not counted, so a client that backs
+off gets back in as its old attempts age out. The check runs before the user
+row is loaded or the password hashed, so it counts every attempt up front;
+succeeded() takes a successful login back out, which keeps a morning login
+rush behind one NAT or proxy from locking out valid credentials.
+
+Attempts are kept by a store:
+    - "memory": per worker, so each gunicorn worker allows the full limit on
+      its own
+    - "sqlite": a SQLite file shared by all workers on the host
+      (LOGIN_RATE_LIMIT_DB)
+
+Select one with the LOGIN_RATE_LIMIT_STORE env var or install a custom
+LoginLimiter with set_limiter(). The default is "sqlite" when WEB_CONCURRENCY
+(the worker count read by gunicorn and uvicorn) is above 1, else "memory".
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+
+from . import cache, metrics
+
+# Per host with a shared store; with the "memory" store every worker applies them
+# separately, so N workers allow N times these limits
+USERNAME_LIMIT = int(os.getenv("LOGIN_RATE_LIMIT_USERNAME", "10"))
+IP_LIMIT = int(os.getenv("LOGIN_RATE_LIMIT_IP", "30"))
+WINDOW_SECONDS = float(os.getenv("LOGIN_RATE_LIMIT_WINDOW", "60"))
+# Behind the bundled nginx every request comes from the proxy; trust its X-Real-IP
+TRUST_PROXY_HEADERS = os.getenv("TRUST_PROXY_HEADERS", "false").lower() == "true"
+
+metrics.counter("login_rate_limited_username_total", "Login attempts rejected by the per-username limit")
+metrics.counter("login_rate_limited_ip_total", "Login attempts rejected by the per-IP limit")
+
+
+class MemoryStore:
+    """Attempt timestamps per key, in this process."""
+
+    blocking = False
+
+    def __init__(self):
+        self._attempts: Dict[str, Deque[float]] = defaultdict(deque)
+        self._lock = threading.Lock()
+        cache.register(self)
+
+    def hit(self, keys: Sequence[str], limits: Sequence[int], window: float, now: float) -> Optional[Tuple[int, float]]:
+        """
+        Record an attempt on every key unless one of them is at its limit.
+        Returns None if recorded, else (index of that key, seconds until it frees up).
+        """
+        with self._lock:
+            for index, (key, limit) in enumerate(zip(keys, limits)):
+                attempts = self._attempts[key]
+                while attempts and attempts[0] <= now - window:
+                    attempts.popleft()
+                if len(attempts) >= limit:
+                    return index, attempts[0] + window - now
+            for key in keys:
+                self._attempts[key].append(now)
+            # Drop idle keys so scanned usernames do not accumulate
+            if len(self._attempts) > 10000:
+                for key in [key for key, attempts in self._attempts.items() if not attempts or attempts[-1] <= now - window]:
+                    del self._attempts[key]
+            return None
+
+    def release(self, keys: Sequence[str], at: float):
+        """Take back one attempt recorded by hit() at `at` on every key."""
+        with self._lock:
+            for key in keys:
+                attempts = self._attempts.get(key)
+                if attempts and at in attempts:
+                    attempts.remove(at)
+
+    def clear(self):
+        with self._lock:
+            self._attempts.clear()
+
+
+class SQLiteStore:
+    """Attempt timestamps in a SQLite file, shared by every worker that opens it."""
+
+    blocking = True
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("LOGIN_RATE_LIMIT_DB", "login_attempts.db")
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS login_attempts (key TEXT NOT NULL, at REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_login_attempts_key_at ON login_attempts (key, at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_login_attempts_at ON login_attempts (at)")
+        cache.register(self)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def hit(self, keys: Sequence[str], limits: Sequence[int], window: float, now: float) -> Optional[Tuple[int, float]]:
+        conn = self._connect()
+        # IMMEDIATE: take the write lock up front so concurrent workers serialize on check-and-insert
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM login_attempts WHERE at <= ?", (now - window,))
+            for index, (key, limit) in enumerate(zip(keys, limits)):
+                count, oldest = conn.execute(
+                    "SELECT count(*), min(at) FROM login_attempts WHERE key = ?", (key,)
+                ).fetchone()
+                if count >= limit:
+                    conn.execute("COMMIT")
+                    return index, oldest + window - now
+            conn.executemany("INSERT INTO login_attempts (key, at) VALUES (?, ?)", [(key, now) for key in keys])
+            conn.execute("COMMIT")
+            return None
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def release(self, keys: Sequence[str], at: float):
+        conn = self._connect()
+        for key in keys:
+            conn.execute(
+                "DELETE FROM login_attempts WHERE rowid IN "
+                "(SELECT rowid FROM login_attempts WHERE key = ? AND at = ? LIMIT 1)",
+                (key, at),
+            )
+
+    def clear(self):
+        self._connect().execute("DELETE FROM login_attempts")
+
+
+class LoginLimiter:
+    REJECTED_METRICS = ["login_rate_limited_username_total", "login_rate_limited_ip_total"]
+
+    def __init__(self, store=None, username_limit: int = USERNAME_LIMIT, ip_limit: int = IP_LIMIT, window: float = WINDOW_SECONDS):
+        self.store = store or MemoryStore()
+        self.username_limit = username_limit
+        self.ip_limit = ip_limit
+        self.window = window
+
+    def check(self, username: str, ip: str) -> Tuple[Sequence[str], float]:
+        """
+        Count an attempt, raising 429 if the username or IP is over its limit.
+        Returns the attempt, to pass to succeeded() if the login works.
+        """
+        keys = [f"user:{username.lower()}", f"ip:{ip}"]
+        limits = [self.username_limit, self.ip_limit]
+        now = time.time()
+        rejected = self.store.hit(keys, limits, self.window, now)
+        if rejected is None:
+            return keys, now
+        index, retry_after = rejected
+        metrics.inc(self.REJECTED_METRICS[index])
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, please retry later",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
+
+
+    def succeeded(self, attempt: Tuple[Sequence[str], float]):
+        """Stop counting an attempt that logged in: only failures use up the limits."""
+        self.store.release(*attempt)
+
+
+STORES = {
+    "memory": MemoryStore,
+    "sqlite": SQLiteStore,
+}
+
+_limiter: Optional[LoginLimiter] = None
+
+
+def get_limiter() -> LoginLimiter:
+    global _limiter
+    if _limiter is None:
+        default = "sqlite" if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 else "memory"
+        _limiter = LoginLimiter(STORES[os.getenv("LOGIN_RATE_LIMIT_STORE", default)]())
+    return _limiter
+
+
+def set_limiter(limiter: Optional[LoginLimiter]):
+    global _limiter
+    _limiter = limiter
+
+
+def client_ip(request: Request) -> str:
+    if TRUST_PROXY_HEADERS:
+        real_ip = request.headers.get("X-Real-IP")
+        if real_ip:
+            return real_ip.strip()
+    return request.client.host if request.client else "unknown"
+
+
+async def check_login(request: Request, username: str):
+    """Count a login attempt (429 when over a limit); returns it for login_succeeded()."""
+    limiter = get_limiter()
+    if limiter.store.blocking:
+        return await run_in_threadpool(limiter.check, username, client_ip(request))
+    return limiter.check(username, client_ip(request))
+
+
+async def login_succeeded(attempt):
+    limiter = get_limiter()
+    if limiter.store.blocking:
+        await run_in_threadpool(limiter.succeeded, attempt)
+    else:
+        limiter.succeeded(attempt)
@@ -0,0 +1,345 @@
+"""
+Analytics rollups.
+
+Task counts kept current by the task write paths, so analytics read a few rows
+per team instead of scanning tasks:
+    - task_rollups: tasks per status, overall ("all") and per team, assignee
+      and criticality. A task counts once for each team with at least one of
+      its assignees (legacy assignee_id or task_assignees).
+    - task_daily_counts: tasks created and completed per UTC day, overall and
+      per team. Completions count while the task is COMPLETED, on the day of
+      its completed_at.
+
+What each task currently contributes is remembered in task_rollup_state and
+task_rollup_keys. sync_tasks() retracts that, recomputes it from the task's
+rows and applies the difference as increments, so callers need not know what
+changed. Increments are upserts (count = count + delta), so concurrent writes
+to different tasks never overwrite each other.
+
+task_events calls sync_tasks()/forget_task() for every task write. Routers
+additionally call sync_users() after a user's team_id changes or the user is
+deleted. rebuild() and check() back scripts/rebuild_rollups.py; timeseries()
+serves /analytics/timeseries from task_daily_counts.
+"""
+
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import Date, String, and_, cast, delete, func, insert, literal, literal_column, select, union, union_all
+from sqlalchemy.orm import Session
+
+from . import etags, models
+from .database import upsert_increment
+
+ALL = "all"
+TEAM = "team"
+USER = "user"
+CRITICALITY = "criticality"
+DAILY_DIMENSIONS = (ALL, TEAM)
+
+BATCH_SIZE = 1000
+
+# Bucket sizes for timeseries(): SQLite date() modifier and PostgreSQL interval
+INTERVALS = {
+    "day": ("+1 day", "1 day"),
+    "week": ("+7 days", "7 days"),
+    "month": ("+1 month", "1 month"),
+}
+
+RollupKey = Tuple[str, str, str]  # (dimension, key, status)
+DailyKey = Tuple[str, str, date]  # (dimension, key, day)
+
+
+class Contribution(NamedTuple):
+    status: str
+    created_on: Optional[date]
+    completed_on: Optional[date]
+    keys: FrozenSet[Tuple[str, str]]  # (dimension, key) pairs the task is counted in
+
+
+def _value(enum_value) -> str:
+    return enum_value.value if enum_value is not None else ""
+
+
+def _current(db: Session, task_ids: Iterable[int]) -> Dict[int, Contribution]:
+    """Contributions implied by the tasks' current rows (tasks that no longer exist are absent)."""
+    task_ids = list(task_ids)
+    legacy = select(models.Task.id.label("task_id"), models.Task.assignee_id.label("user_id"))\
+        .where(models.Task.assignee_id != None, models.Task.id.in_(task_ids))
+    multi = select(models.TaskAssignee.task_id, models.TaskAssignee.user_id)\
+        .where(models.TaskAssignee.task_id.in_(task_ids))
+    pairs = union(legacy, multi).subquery()
+    assignees = defaultdict(set)
+    for task_id, user_id, team_id in db.execute(
+        select(pairs.c.task_id, pairs.c.user_id, models.User.team_id)
+        .outerjoin(models.User, models.User.id == pairs.c.user_id)
+    ):
+        assignees[task_id].add((USER, str(user_id)))
+        if team_id is not None:
+            assignees[task_id].add((TEAM, str(team_id)))
+
+    contributions = {}
+    for row in db.execute(
+        select(models.Task.id, models.Task.status, models.Task.criticality, models.Task.created_at, models.Task.completed_at)
+        .where(models.Task.id.in_(task_ids))
+    ):
+        keys = {(ALL, "")} | assignees[row.id]
+        if row.criticality is not None:
+            keys.add((CRITICALITY, row.criticality.value))
+        completed = row.status == models.TaskStatus.COMPLETED and row.completed_at is not None
+        contributions[row.id] = Contribution(
+            status=_value(row.status),
+            created_on=row.created_at.date() if row.created_at else None,
+            completed_on=row.completed_at.date() if completed else None,
+            keys=frozenset(keys),
+        )
+    return contributions
+
+
+def _stored(db: Session, task_ids: Iterable[int]) -> Dict[int, Contribution]:
+    """Contributions last applied for the given tasks, locking them until commit."""
+    task_ids = list(task_ids)
+    State = models.TaskRollupState
+    states = db.execute(
+        select(State.task_id, State.status, State.created_on, State.completed_on)
+        .where(State.task_id.in_(task_ids)).with_for_update()
+    ).all()
+    keys = defaultdict(set)
+    for task_id, dimension, key in db.execute(
+        select(models.TaskRollupKey.task_id, models.TaskRollupKey.dimension, models.TaskRollupKey.key)
+        .where(models.TaskRollupKey.task_id.in_(task_ids))
+    ):
+        keys[task_id].add((dimension, key))
+    return {
+        state.task_id: Contribution(state.status, state.created_on, state.completed_on, frozenset(keys[state.task_id]))
+        for state in states
+    }
+
+
+def _add(counts: Dict[RollupKey, int], daily: Dict[DailyKey, list], contribution: Contribution, sign: int):
+    for dimension, key in contribution.keys:
+        counts[(dimension, key, contribution.status)] += sign
+        if dimension in DAILY_DIMENSIONS:
+            if contribution.created_on:
+                daily[(dimension, key, contribution.created_on)][0] += sign
+            if contribution.completed_on:
+                daily[(dimension, key, contribution.completed_on)][1] += sign
+
+
+def _apply(db: Session, counts: Dict[RollupKey, int], daily: Dict[DailyKey, list]):
+    # Sorted so concurrent transactions lock rollup rows in the same order
+    rollup_rows = [
+        {"dimension": dimension, "key": key, "status": status, "count": delta}
+        for (dimension, key, status), delta in sorted(counts.items()) if delta
+    ]
+    daily_rows = [
+        {"dimension": dimension, "key": key, "day": day, "created": created, "completed": completed}
+        for (dimension, key, day), (created, completed) in sorted(daily.items()) if created or completed
+    ]
+    upsert_increment(db, models.TaskRollup.__table__, ["dimension", "key", "status"], ["count"], rollup_rows)
+    upsert_increment(db, models.TaskDailyCount.__table__, ["dimension", "key", "day"], ["created", "completed"], daily_rows)
+
+
+def _store(db: Session, contributions: Dict[int, Contribution]):
+    if not contributions:
+        return
+    db.execute(insert(models.TaskRollupState), [
+        {"task_id": task_id, "status": c.status, "created_on": c.created_on, "completed_on": c.completed_on}
+        for task_id, c in contributions.items()
+    ])
+    key_rows = [
+        {"task_id": task_id, "dimension": dimension, "key": key}
+        for task_id, c in contributions.items() for dimension, key in c.keys
+    ]
+    db.execute(insert(models.TaskRollupKey), key_rows)
+
+
+def _forget(db: Session, task_ids):
+    db.execute(delete(models.TaskRollupKey).where(models.TaskRollupKey.task_id.in_(task_ids)))
+    db.execute(delete(models.TaskRollupState).where(models.TaskRollupState.task_id.in_(task_ids)))
+
+
+def _sync(db: Session, task_ids, exists: bool):
+    stored = _stored(db, task_ids)
+    current = _current(db, task_ids) if exists else {}
+    counts, daily = Counter(), defaultdict(lambda: [0, 0])
+    for contribution in stored.values():
+        _add(counts, daily, contribution, -1)
+    for contribution in current.values():
+        _add(counts, daily, contribution, 1)
+    _apply(db, counts, daily)
+    _forget(db, task_ids)
+    _store(db, current)
+
+
+def sync_tasks(db: Session, task_ids: Iterable[int]):
+    """Bring the rollups in line with the given tasks' rows (flushes pending changes first)."""
+    task_ids = sorted(set(task_ids))
+    if not task_ids:
+        return
+    db.flush()
+    for start in range(0, len(task_ids), BATCH_SIZE):
+        _sync(db, task_ids[start:start + BATCH_SIZE], exists=True)
+
+
+def forget_task(db: Session, task_id: int):
+    """Retract a task about to be deleted."""
+    _sync(db, [task_id], exists=False)
+
+
+def sync_users(db: Session, user_ids: Iterable[int]):
+    """Re-count the tasks assigned to the given users, after a team change or deletion (flushes first)."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    db.flush()
+    counted = select(models.TaskRollupKey.task_id).where(
+        models.TaskRollupKey.dimension == USER,
+        models.TaskRollupKey.key.in_([str(user_id) for user_id in user_ids]),
+    )
+    legacy = select(models.Task.id).where(models.Task.assignee_id.in_(user_ids))
+    multi = select(models.TaskAssignee.task_id).where(models.TaskAssignee.user_id.in_(user_ids))
+    sync_tasks(db, db.execute(union(counted, legacy, multi)).scalars())
+
+
+def _all_task_ids(db: Session):
+    """Every task id, in batches (keyset pagination keeps memory flat)."""
+    last_id = 0
+    while True:
+        batch = db.execute(
+            select(models.Task.id).where(models.Task.id > last_id).order_by(models.Task.id).limit(BATCH_SIZE)
+        ).scalars().all()
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]
+
+
+def _expected(db: Session, store: bool = False):
+    counts, daily = Counter(), defaultdict(lambda: [0, 0])
+    for batch in _all_task_ids(db):
+        contributions = _current(db, batch)
+        for contribution in contributions.values():
+            _add(counts, daily, contribution, 1)
+        if store:
+            _store(db, contributions)
+    return counts, daily
+
+
+def rebuild(db: Session):
+    """Recompute every rollup from tasks, task_assignees and users. Caller commits."""
+    for model in (models.TaskRollup, models.TaskDailyCount, models.TaskRollupState, models.TaskRollupKey):
+        db.execute(delete(model))
+    counts, daily = _expected(db, store=True)
+    _apply(db, counts, daily)
+    etags.bump_version(db, etags.ANALYTICS)
+
+
+def is_empty(db: Session) -> bool:
+    return db.query(models.TaskRollupState.task_id).first() is None
+
+
+def check(db: Session) -> Dict[tuple, Tuple[int, int]]:
+    """
+    Compare the rollups with counts taken from the raw task rows.
+
+    Returns:
+        {("rollup", dimension, key, status) or ("created"/"completed", dimension, key, day):
+        (expected, actual)} for every count that differs; empty when consistent
+    """
+    counts, daily = _expected(db)
+    expected = {("rollup",) + key: value for key, value in counts.items()}
+    for key, (created, completed) in daily.items():
+        expected[("created",) + key] = created
+        expected[("completed",) + key] = completed
+
+    actual = {}
+    for row in db.execute(select(models.TaskRollup)).scalars():
+        actual[("rollup", row.dimension, row.key, row.status)] = row.count
+    for row in db.execute(select(models.TaskDailyCount)).scalars():
+        actual[("created", row.dimension, row.key, row.day)] = row.created
+        actual[("completed", row.dimension, row.key, row.day)] = row.completed
+
+    drift = {}
+    for key in expected.keys() | actual.keys():
+        pair = (expected.get(key, 0), actual.get(key, 0))
+        if pair[0] != pair[1]:
+            drift[key] = pair
+    return drift
+
+
+def bucket_start(day: date, interval: str) -> date:
+    """Start of the day/week (Monday)/month bucket containing `day`."""
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    if interval == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(db: Session, column, interval: str):
+    sqlite_step, postgres_step = INTERVALS[interval]
+    if db.get_bind().dialect.name == "sqlite":
+        return func.date(column, sqlite_step, type_=Date)
+    return cast(column + literal_column(f"interval '{postgres_step}'"), Date)
+
+
+def timeseries(db: Session, interval: str, start: date, end: date, team_id: Optional[int] = None) -> List[dict]:
+    """
+    Tasks created and completed per bucket from `start` to `end` (inclusive), overall
+    and per team, with backlog = created - completed up to the end of each bucket.
+
+    A recursive CTE generates every bucket, so buckets without activity come back
+    as zeros; each bucket sums its days from task_daily_counts.
+    """
+    start = bucket_start(start, interval)
+    buckets = select(literal(start, Date).label("bucket"), _next_bucket(db, literal(start, Date), interval).label("next"))\
+        .cte("buckets", recursive=True)
+    buckets = buckets.union_all(
+        select(buckets.c.next, _next_bucket(db, buckets.c.next, interval)).where(buckets.c.next <= end)
+    )
+
+    teams = select(literal(TEAM).label("dimension"), cast(models.Team.id, String).label("key"),
+                   models.Team.id.label("team_id"), models.Team.name.label("name"))
+    if team_id is not None:
+        teams = teams.where(models.Team.id == team_id)
+        series = teams.subquery()
+    else:
+        overall = select(literal(ALL).label("dimension"), literal("").label("key"),
+                         literal(None).label("team_id"), literal(None).label("name"))
+        series = union_all(overall, teams).subquery()
+
+    Daily = models.TaskDailyCount
+    in_bucket = and_(
+        Daily.dimension == series.c.dimension, Daily.key == series.c.key,
+        Daily.day >= buckets.c.bucket, Daily.day < buckets.c.next,
+    )
+    rows = db.execute(
+        select(
+            series.c.dimension, series.c.key, series.c.team_id, series.c.name, buckets.c.bucket,
+            func.coalesce(func.sum(Daily.created), 0), func.coalesce(func.sum(Daily.completed), 0),
+        )
+        .select_from(series.join(buckets, literal(True)).outerjoin(Daily, in_bucket))
+        .group_by(series.c.dimension, series.c.key, series.c.team_id, series.c.name, buckets.c.bucket)
+        .order_by(series.c.dimension, series.c.team_id, buckets.c.bucket)
+    ).all()
+
+    # Backlog carried in from before the first bucket
+    opening = dict(
+        ((dimension, key), created - completed) for dimension, key, created, completed in db.execute(
+            select(Daily.dimension, Daily.key, func.sum(Daily.created), func.sum(Daily.completed))
+            .where(Daily.day < start, Daily.dimension.in_(DAILY_DIMENSIONS))
+            .group_by(Daily.dimension, Daily.key)
+        )
+    )
+
+    result = {}
+    for dimension, key, series_team_id, name, bucket, created, completed in rows:
+        entry = result.get((dimension, key))
+        if entry is None:
+            entry = result[(dimension, key)] = {"team_id": series_team_id, "name": name, "points": []}
+            backlog = opening.get((dimension, key), 0)
+        backlog += created - completed
+        entry["points"].append({"bucket": bucket, "created": created, "completed": completed, "backlog": backlog})
+    return list(result.values())
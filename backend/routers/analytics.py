@@ -1,57 +1,64 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
+from collections import defaultdict
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import io
-from .. import models, schemas, auth, database
-from ..export_utils import generate_csv, generate_pdf
+import os
+from .. import models, schemas, auth, database, etags, rollups, achievements, flow
+from ..cache import GenerationCache
+from ..export_utils import stream_csv, generate_pdf
 
 router = APIRouter(
     tags=["analytics"]
 )
 
+# Results of the analytics and achievement reads, keyed by endpoint and parameters.
+# They are served while no task, user or team write (or repair job) has happened
+# since; the TTL only bounds how long the relative "week"/"month" windows can lag.
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "300"))
+GENERATION_SCOPES = [etags.ANALYTICS, etags.USERS, etags.TEAMS]
+_results = GenerationCache("analytics", maxsize=1024, ttl=ANALYTICS_CACHE_TTL)
+
+EXPORT_BATCH_SIZE = 1000
+
+
+def _generation(db: Session):
+    """Last task change plus the repair, user and team versions, read in one round trip."""
+    def scope_version(scope):
+        return select(models.DataVersion.version).where(models.DataVersion.scope == scope).scalar_subquery()
+
+    row = db.query(
+        select(func.max(models.TaskChange.seq)).scalar_subquery(),
+        *(scope_version(scope) for scope in GENERATION_SCOPES),
+    ).one()
+    return tuple(value or 0 for value in row)
+
+
+async def _cached(db: Session, key: tuple, build, *args):
+    """
+    build(db, *args), computed once per generation and shared by concurrent identical requests.
+
+    The builds are Python passes over many rows (flow.collect reads every status
+    event), so they run through database.run_read, never on the event loop.
+    """
+    generation = await database.run_read(_generation, db)
+    return await _results.get_or_compute(key, generation, lambda: database.run_read(build, db, *args))
+
+
+def _achievement_stats(db: Session, user_id: int) -> schemas.MemberAchievement:
+    return schemas.MemberAchievement.model_validate(achievements.get_stats(db, user_id), from_attributes=True)
+
 @router.get("/users/{user_id}/achievement-stats", response_model=schemas.MemberAchievement)
-def get_achievement_stats(user_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    stats = db.query(models.MemberAchievement).filter(models.MemberAchievement.user_id == user_id).first()
-    
-    # Self-healing: Recalculate counts to ensure consistency
-    actual_completed = db.query(models.Task).filter(
-        models.Task.assignee_id == user_id, 
-        models.Task.status == models.TaskStatus.COMPLETED
-    ).count()
-    
-    actual_critical = db.query(models.Task).filter(
-        models.Task.assignee_id == user_id, 
-        models.Task.status == models.TaskStatus.COMPLETED,
-        models.Task.criticality == models.TaskCriticality.HIGH
-    ).count()
-    
-    if not stats:
-        stats = models.MemberAchievement(
-            user_id=user_id, 
-            on_time_completion_rate=0,
-            total_completed_tasks=actual_completed,
-            critical_tasks_completed=actual_critical,
-            current_no_blocker_streak=0,
-            last_updated=datetime.utcnow()
-        )
-        db.add(stats)
-        db.commit()
-        db.refresh(stats)
-    else:
-        # Update if mismatch found
-        if stats.total_completed_tasks != actual_completed or stats.critical_tasks_completed != actual_critical:
-            stats.total_completed_tasks = actual_completed
-            stats.critical_tasks_completed = actual_critical
-            db.commit()
-            db.refresh(stats)
-            
-    return stats
+async def get_achievement_stats(user_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    """Counters maintained by backend.achievements (read-only; drift is repaired by its reconcile job)."""
+    return await _cached(db, ("achievement-stats", user_id), _achievement_stats, user_id)
 
 @router.get("/achievements/{user_id}")
-def get_achievements(
+async def get_achievements(
     user_id: int,
     period: str = "month",
     start_date: Optional[str] = None,
@@ -60,6 +67,10 @@ def get_achievements(
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     """Get completed tasks (achievements) for a user with optional filtering"""
+    await database.run_read(_authorize_achievements, db, user_id, current_user)
+    return await _cached(db, ("achievements", user_id, period, start_date, end_date), _achievements, user_id, period, start_date, end_date)
+
+def _authorize_achievements(db: Session, user_id: int, current_user: models.User):
     # Authorization: users can view their own achievements, unit heads can view team members, group heads can view all
     if current_user.id != user_id:
         if current_user.role == models.UserRole.UNIT_HEAD:
@@ -69,33 +80,35 @@ def get_achievements(
                 raise HTTPException(status_code=403, detail="Not authorized to view this user's achievements")
         elif current_user.role != models.UserRole.GROUP_HEAD:
             raise HTTPException(status_code=403, detail="Not authorized")
-    
+
+def _achievements(db: Session, user_id: int, period: str, start_date: Optional[str], end_date: Optional[str]):
     # Base query for completed tasks with eager loading
     query = db.query(models.Task).options(
         joinedload(models.Task.assigner),
         joinedload(models.Task.updates)
-    ).filter(
+    ).filter(*_completed_filters(user_id, period, start_date, end_date))
+    
+    tasks = query.order_by(models.Task.completed_at.desc()).all()
+    return jsonable_encoder(tasks)
+
+def _completed_filters(user_id: int, period: str, start_date: Optional[str], end_date: Optional[str]) -> list:
+    """Conditions selecting the user's COMPLETED tasks in the requested period"""
+    filters = [
         models.Task.assignee_id == user_id,
         models.Task.status == models.TaskStatus.COMPLETED
-    )
-    
-    # Apply date filtering
+    ]
     if period == "week":
-        start = datetime.now() - timedelta(days=7)
-        query = query.filter(models.Task.completed_at >= start)
+        filters.append(models.Task.completed_at >= datetime.now() - timedelta(days=7))
     elif period == "month":
-        start = datetime.now() - timedelta(days=30)
-        query = query.filter(models.Task.completed_at >= start)
+        filters.append(models.Task.completed_at >= datetime.now() - timedelta(days=30))
     elif start_date and end_date:
         try:
             start = datetime.fromisoformat(start_date)
             end = datetime.fromisoformat(end_date)
-            query = query.filter(models.Task.completed_at >= start, models.Task.completed_at <= end)
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid date format")
-    
-    tasks = query.order_by(models.Task.completed_at.desc()).all()
-    return tasks
+        filters += [models.Task.completed_at >= start, models.Task.completed_at <= end]
+    return filters
 
 @router.get("/achievements/{user_id}/export")
 def export_achievements(
@@ -107,107 +120,125 @@ def export_achievements(
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
-    """Export achievements as CSV or PDF"""
-    # Same authorization as get_achievements
-    if current_user.id != user_id:
-        if current_user.role == models.UserRole.UNIT_HEAD:
-            target_user = db.query(models.User).filter(models.User.id == user_id).first()
-            if not target_user or target_user.team_id != current_user.team_id:
-                raise HTTPException(status_code=403, detail="Not authorized")
-        elif current_user.role != models.UserRole.GROUP_HEAD:
-            raise HTTPException(status_code=403, detail="Not authorized")
+    """
+    Export achievements as CSV or PDF.
+
+    CSV is streamed: rows are read with yield_per from a column-only query and
+    written in chunks as the client consumes them, so memory does not grow with
+    the number of tasks. The session stays open until the response is sent.
+    """
+    if format not in ("csv", "pdf"):
+        raise HTTPException(status_code=400, detail="Invalid format. Use 'csv' or 'pdf'")
+    _authorize_achievements(db, user_id, current_user)
     
     # Get user info
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Base query
-    query = db.query(models.Task).filter(
-        models.Task.assignee_id == user_id,
-        models.Task.status == models.TaskStatus.COMPLETED
+    # Validated here: nothing can be reported as an error once streaming has started
+    filters = _completed_filters(user_id, period, start_date, end_date)
+    rows = db.execute(
+        select(models.Task.title, models.Task.completed_at, models.Task.criticality, models.User.username, models.Task.description)
+        .outerjoin(models.User, models.User.id == models.Task.assigner_id)
+        .where(*filters)
+        .order_by(models.Task.completed_at.desc(), models.Task.id.desc())
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
     )
-    
-    # Apply date filtering
-    if period == "week":
-        start = datetime.now() - timedelta(days=7)
-        query = query.filter(models.Task.completed_at >= start)
-    elif period == "month":
-        start = datetime.now() - timedelta(days=30)
-        query = query.filter(models.Task.completed_at >= start)
-    elif start_date and end_date:
-        try:
-            start = datetime.fromisoformat(start_date)
-            end = datetime.fromisoformat(end_date)
-            query = query.filter(models.Task.completed_at >= start, models.Task.completed_at <= end)
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid date format")
-    
-    tasks = query.order_by(models.Task.completed_at.desc()).all()
-    
-    # Convert to dict for export functions
-    tasks_data = []
-    for task in tasks:
-        tasks_data.append({
-            'title': task.title,
-            'description': task.description,
-            'completed_at': task.completed_at.isoformat() if task.completed_at else None,
-            'criticality': task.criticality.value if task.criticality else 'medium',
-            'assigner': {'username': task.assigner.username if task.assigner else 'N/A'}
-        })
-    
+    # The CSV columns: (title, completed_at, criticality, assigner, description)
+    rows = ((title, completed_at, criticality.value if criticality else 'medium', assigner, description)
+            for title, completed_at, criticality, assigner, description in rows)
+
     if format == "csv":
-        csv_content = generate_csv(tasks_data, user.username)
         return StreamingResponse(
-            io.StringIO(csv_content),
+            stream_csv(rows),
             media_type="text/csv",
             headers={"Content-Disposition": f"attachment; filename=achievements_{user.username}_{period}.csv"}
         )
-    elif format == "pdf":
-        pdf_content = generate_pdf(tasks_data, user.username, period)
-        return StreamingResponse(
-            io.BytesIO(pdf_content),
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=achievements_{user.username}_{period}.pdf"}
-        )
-    else:
-        raise HTTPException(status_code=400, detail="Invalid format. Use 'csv' or 'pdf'")
+
+    # The PDF layout needs every row up front
+    tasks_data = [
+        {
+            'title': title,
+            'description': description,
+            'completed_at': completed_at.isoformat() if completed_at else None,
+            'criticality': criticality,
+            'assigner': {'username': assigner or 'N/A'}
+        }
+        for title, completed_at, criticality, assigner, description in rows
+    ]
+    pdf_content = generate_pdf(tasks_data, user.username, period)
+    return StreamingResponse(
+        io.BytesIO(pdf_content),
+        media_type="application/pdf",
+        headers={"Content-Disposition": f"attachment; filename=achievements_{user.username}_{period}.pdf"}
+    )
 
 @router.get("/analytics/")
-def get_analytics(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+async def get_analytics(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
     if current_user.role != models.UserRole.GROUP_HEAD:
         raise HTTPException(status_code=403, detail="Not authorized")
-    
-    # Global Stats
-    total_tasks = db.query(models.Task).count()
-    completed_tasks = db.query(models.Task).filter(models.Task.status == models.TaskStatus.COMPLETED).count()
+    return await _cached(db, ("analytics",), build_analytics)
+
+@router.get("/analytics/flow")
+async def get_flow_analytics(
+    since: Optional[datetime] = None,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Hours spent per status and lead time (count, median, p90, p99), overall, per team and per user"""
+    if current_user.role != models.UserRole.GROUP_HEAD:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return await _cached(db, ("flow", since), flow.build_flow, since)
+
+MAX_TIMESERIES_BUCKETS = 1000
+
+@router.get("/analytics/timeseries")
+async def get_analytics_timeseries(
+    interval: str = "week",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    team_id: Optional[int] = None,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Tasks created/completed and backlog per day, week or month, overall and per team (default: the last year)"""
+    if current_user.role != models.UserRole.GROUP_HEAD:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if interval not in rollups.INTERVALS:
+        raise HTTPException(status_code=400, detail=f"Invalid interval. Use one of: {', '.join(rollups.INTERVALS)}")
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=365)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    days_per_bucket = {"day": 1, "week": 7, "month": 28}[interval]
+    if (end - start).days // days_per_bucket >= MAX_TIMESERIES_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Too many buckets (max {MAX_TIMESERIES_BUCKETS}); use a longer interval or a shorter range")
+    series = await _cached(db, ("timeseries", interval, start, end, team_id), rollups.timeseries, interval, start, end, team_id)
+    return {"interval": interval, "start": rollups.bucket_start(start, interval), "end": end, "series": series}
+
+def build_analytics(db: Session) -> dict:
+    """Group-wide task statistics shown on the Group Head dashboard, read from the rollups"""
+    rows = db.query(models.TaskRollup.dimension, models.TaskRollup.key, models.TaskRollup.status, models.TaskRollup.count)\
+        .filter(models.TaskRollup.dimension.in_([rollups.ALL, rollups.TEAM]), models.TaskRollup.count != 0)\
+        .order_by(models.TaskRollup.status).all()
+
+    # Status Data (also gives the global totals)
+    status_data = [{"name": status, "value": count} for dimension, _, status, count in rows if dimension == rollups.ALL]
+    total_tasks = sum(item["value"] for item in status_data)
+    completed_tasks = sum(item["value"] for item in status_data if item["name"] == models.TaskStatus.COMPLETED.value)
     pending_tasks = total_tasks - completed_tasks
-    
-    # Team Data
-    teams = db.query(models.Team).all()
-    team_data = []
-    
-    for team in teams:
-        members = db.query(models.User).filter(models.User.team_id == team.id).all()
-        member_ids = [m.id for m in members]
-        
-        if not member_ids:
-            team_tasks_count = 0
-            team_completed_count = 0
-        else:
-            team_tasks_count = db.query(models.Task).filter(models.Task.assignee_id.in_(member_ids)).count()
-            team_completed_count = db.query(models.Task).filter(models.Task.assignee_id.in_(member_ids), models.Task.status == models.TaskStatus.COMPLETED).count()
-        
-        team_data.append({
-            "name": team.name,
-            "tasks": team_tasks_count,
-            "completed": team_completed_count
-        })
-
-    # Status Data
-    status_counts = db.query(models.Task.status, func.count(models.Task.status)).group_by(models.Task.status).all()
-    status_data = [{"name": status.value, "value": count} for status, count in status_counts]
-    
+
+    # Team Data: a task counts once for every team with at least one of its assignees
+    team_counts = defaultdict(lambda: {"tasks": 0, "completed": 0})
+    for dimension, key, status, count in rows:
+        if dimension == rollups.TEAM:
+            team_counts[key]["tasks"] += count
+            if status == models.TaskStatus.COMPLETED.value:
+                team_counts[key]["completed"] += count
+    teams = db.query(models.Team.id, models.Team.name).order_by(models.Team.id).all()
+    team_data = [{"name": name, **team_counts[str(team_id)]} for team_id, name in teams]
+
     return {
         "total_tasks": total_tasks,
         "completed_tasks": completed_tasks,
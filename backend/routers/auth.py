@@ -1,21 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Form
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Form
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from .. import models, schemas, auth, database
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models, schemas, auth, database, etags, ratelimit
 import pyotp
 
 router = APIRouter(tags=["auth"])
 
 @router.post("/token", response_model=schemas.Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), mfa_code: str = Form(None), db: Session = Depends(database.get_db)):
+async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), mfa_code: str = Form(None), db: AsyncSession = Depends(database.get_async_db)):
     import traceback
+    # Before the user lookup and password hashing this is meant to protect
+    attempt = await ratelimit.check_login(request, form_data.username)
     try:
-        user = db.query(models.User).filter(models.User.username == form_data.username).first()
+        user = (await db.execute(select(models.User).where(models.User.username == form_data.username))).scalars().first()
     except Exception as e:
         print(f"LOGIN ERROR: {e}")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+    verified, new_hash = False, None
+    if user:
+        verified, new_hash = await auth.verify_and_update_password_async(form_data.password, user.hashed_password)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -36,7 +42,13 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
-    access_token = auth.create_access_token(data={"sub": user.username})
+    if new_hash:
+        # Stored with other rounds than PASSWORD_HASH_ROUNDS; upgrade while we have the plaintext
+        user.hashed_password = new_hash
+        await db.commit()
+
+    access_token = auth.access_token_for(user)
+    await ratelimit.login_succeeded(attempt)
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/auth/mfa/setup")
@@ -47,10 +59,12 @@ def mfa_setup(current_user: models.User = Depends(auth.get_current_active_user))
     return {"secret": secret, "uri": pyotp.TOTP(secret).provisioning_uri(name=current_user.username, issuer_name="SyncDeck")}
 
 @router.post("/auth/mfa/enable")
-def mfa_enable(secret: str = Form(...), code: str = Form(...), db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+async def mfa_enable(secret: str = Form(...), code: str = Form(...), db: AsyncSession = Depends(database.get_async_db), current_user: models.User = Depends(auth.get_current_db_user)):
     if not auth.verify_totp(secret, code):
         raise HTTPException(status_code=400, detail="Invalid code")
     
     current_user.mfa_secret = secret
-    db.commit()
+    await db.run_sync(etags.bump_version, etags.USERS)
+    await db.commit()
+    auth.invalidate_principal(current_user.username)
     return {"message": "MFA enabled"}
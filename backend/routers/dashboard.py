@@ -0,0 +1,90 @@
+from fastapi import APIRouter, Depends, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from .. import models, schemas, auth, database, etags
+from ..cache import TTLCache
+from ..pagination import paginate
+from .analytics import build_analytics
+from .tasks import _visible_tasks_query, _summary_columns, _build_task_summaries
+
+router = APIRouter(
+    tags=["dashboard"]
+)
+
+DASHBOARD_TASKS = 100
+
+# user id -> (generation, encoded bundle); entries are only served for the current generation
+_cache = TTLCache(maxsize=2048, ttl=600)
+
+
+def _generation(db: Session):
+    """Write generation of everything the bundle depends on, read in one round trip."""
+    def scope_version(scope):
+        return select(models.DataVersion.version).where(models.DataVersion.scope == scope).scalar_subquery()
+
+    row = db.query(
+        select(func.max(models.TaskChange.seq)).scalar_subquery(),
+        scope_version(etags.USERS),
+        scope_version(etags.TEAMS),
+        scope_version(etags.ANALYTICS),
+    ).one()
+    return tuple(value or 0 for value in row)
+
+
+def _members(db: Session, current_user: models.User):
+    if current_user.role in [models.UserRole.UNIT_HEAD, models.UserRole.BACKUP_UNIT_HEAD]:
+        return db.query(models.User).filter(
+            models.User.team_id == current_user.team_id,
+            models.User.role == models.UserRole.MEMBER,
+        ).order_by(models.User.id).all()
+    if current_user.role == models.UserRole.GROUP_HEAD:
+        return db.query(models.User).filter(models.User.id != current_user.id).order_by(models.User.id).all()
+    return []
+
+
+def _build_dashboard(db: Session, current_user: auth.Principal) -> schemas.Dashboard:
+    rows, next_cursor = paginate(
+        _visible_tasks_query(db, current_user, *_summary_columns()),
+        (models.Task.created_at, models.Task.id),
+        key=lambda row: (row.created_at, row.id),
+        limit=DASHBOARD_TASKS,
+    )
+    return schemas.Dashboard(
+        user=schemas.User.model_validate(db.get(models.User, current_user.id), from_attributes=True),
+        tasks=_build_task_summaries(db, rows, current_user),
+        next_cursor=next_cursor,
+        members=[schemas.User.model_validate(user, from_attributes=True) for user in _members(db, current_user)],
+        analytics=build_analytics(db) if current_user.role == models.UserRole.GROUP_HEAD else None,
+    )
+
+
+@router.get("/dashboard", response_model=schemas.Dashboard)
+async def get_dashboard(request: Request, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    """
+    The current user, their newest visible tasks (summary view), the members they
+    manage and, for Group Heads, the analytics summary.
+
+    Bundles are cached per user and per worker. They are rebuilt when any task,
+    user or team write, or analytics repair job, has happened since, which also
+    drives the ETag.
+    """
+    return await database.run_read(_dashboard_response, db, request, current_user)
+
+
+def _dashboard_response(db: Session, request: Request, current_user: models.User):
+    generation = _generation(db)
+    etag = etags.make_etag("dashboard", current_user.id, generation)
+    if etags.is_not_modified(request, etag):
+        return etags.not_modified(etag)
+
+    cached = _cache.get(current_user.id)
+    if cached is None or cached[0] != generation:
+        cached = (generation, jsonable_encoder(_build_dashboard(db, current_user)))
+        _cache.set(current_user.id, cached)
+
+    # Returned directly: the cached content is already encoded
+    response = JSONResponse(content=cached[1])
+    etags.set_etag(response, etag)
+    return response
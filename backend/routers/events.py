@@ -0,0 +1,133 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from typing import Optional
+import json
+from .. import models, auth, database, events
+
+router = APIRouter(
+    prefix="/events",
+    tags=["events"]
+)
+
+KEEPALIVE_SECONDS = 15
+RETRY_MS = 3000
+
+
+def _bearer_token(request: Request) -> Optional[str]:
+    header = request.headers.get("Authorization", "")
+    scheme, _, value = header.partition(" ")
+    if scheme.lower() != "bearer" or not value:
+        return None
+    return value
+
+
+def _not_authenticated():
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Not authenticated",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _resume_id(request: Request, last_event_id: Optional[int], latest: int) -> int:
+    header = request.headers.get("Last-Event-ID")
+    if header is not None:
+        try:
+            last_event_id = int(header)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+    if last_event_id is None or last_event_id > latest:
+        # New subscription, or an id from a different database: start from now
+        return latest
+    return max(last_event_id, 0)
+
+
+def _subscription(db: Session, ticket: Optional[str], token: Optional[str], request: Request, last_event_id: Optional[int]):
+    """(grant, id to resume after) for a new stream."""
+    grant = auth.stream_grant(db, ticket=ticket, token=token)
+    return grant, _resume_id(request, last_event_id, events.latest_id(db))
+
+
+def _fetch(broker: events.Broker, grant: auth.StreamGrant, after_id: int):
+    """The next batch and cursor, or None once the stream's credentials are no longer valid."""
+    db = broker.session_factory()
+    try:
+        user = db.query(models.User).filter(models.User.id == grant.user_id).first()
+        if not auth.stream_grant_valid(grant, user):
+            return None
+        return events.fetch(db, user, after_id)
+    finally:
+        db.close()
+
+
+@router.post("/tickets")
+def create_stream_ticket(token: str = Depends(auth.oauth2_scheme), db: Session = Depends(database.get_db)):
+    """
+    A ticket for opening GET /events/tasks?ticket= from EventSource, which cannot
+    send an Authorization header. Tickets expire after STREAM_TICKET_EXPIRE_SECONDS;
+    request a new one for every (re)connection.
+    """
+    return {"ticket": auth.create_stream_ticket(token, db), "expires_in": auth.STREAM_TICKET_EXPIRE_SECONDS}
+
+
+@router.get("/tasks")
+async def stream_task_events(
+    request: Request,
+    ticket: Optional[str] = None,
+    last_event_id: Optional[int] = None,
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """
+    Server-Sent Events stream of task changes visible to the caller.
+
+    Each event carries `id` (resume point), `task_id`, `op` ("upsert" or "delete")
+    and, for upserts, the task `version`. Reconnecting clients send Last-Event-ID
+    (EventSource does this automatically) or ?last_event_id= to receive what they
+    missed; refetch changed tasks with GET /tasks/{id} or GET /tasks/changes.
+
+    Authenticate with an Authorization header or, from EventSource, with
+    ?ticket= from POST /events/tickets (never put the access token in the URL).
+    The credentials are re-checked on every poll: the stream ends when the access
+    token behind it expires or the user is deleted, renamed or has their claims
+    revoked (role or team change); reconnect with a new ticket.
+    """
+    token = _bearer_token(request)
+    if ticket is None and token is None:
+        raise _not_authenticated()
+    grant, after_id = await db.run_sync(_subscription, ticket, token, request, last_event_id)
+    # Release the connection now: the dependency only exits after the stream ends
+    await db.close()
+
+    broker = events.get_broker()
+
+    async def stream():
+        nonlocal after_id
+        broker.subscribe()
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            while not await request.is_disconnected():
+                generation = broker.generation
+                result = await run_in_threadpool(_fetch, broker, grant, after_id)
+                if result is None:
+                    return
+                batch, next_id = result
+                for item in batch:
+                    payload = {key: value for key, value in item.items() if key != "id"}
+                    yield f"id: {item['id']}\nevent: task\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n"
+                if next_id != after_id:
+                    # Changes the caller may not see still move the cursor
+                    after_id = next_id
+                    continue
+                if not await broker.wait(generation, KEEPALIVE_SECONDS):
+                    yield ": keep-alive\n\n"
+        finally:
+            broker.unsubscribe()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from .. import models, auth, database
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models, auth, database, etags
 import httpx
 import os
 
@@ -21,7 +21,7 @@ def github_login():
     }
 
 @router.post("/callback")
-async def github_callback(code: str, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+async def github_callback(code: str, db: AsyncSession = Depends(database.get_async_db), current_user: models.User = Depends(auth.get_current_db_user)):
     async with httpx.AsyncClient() as client:
         response = await client.post(
             "https://github.com/login/oauth/access_token",
@@ -44,7 +44,8 @@ async def github_callback(code: str, db: Session = Depends(database.get_db), cur
         
     # Store token
     current_user.github_token = access_token
-    db.commit()
+    await db.run_sync(etags.bump_version, etags.USERS)
+    await db.commit()
     
     return {"message": "GitHub connected successfully"}
 
@@ -54,8 +55,7 @@ async def github_push(
     commit_message: str, 
     file_path: str, 
     content: str, 
-    db: Session = Depends(database.get_db), 
-    current_user: models.User = Depends(auth.get_current_active_user)
+    current_user: models.User = Depends(auth.get_current_db_user)
 ):
     if not current_user.github_token:
         raise HTTPException(status_code=400, detail="GitHub not connected")
@@ -1,167 +1,631 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session, aliased
-from sqlalchemy import or_, and_
-from typing import List
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, UploadFile, File, Request, Response, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, insert, select, or_
+from typing import List, Optional
 from datetime import datetime
 import shutil
 import os
 from pathlib import Path
-from .. import models, schemas, auth, database, email_service
+from .. import models, schemas, auth, database, email_service, visibility, search, etags, task_events
+from ..pagination import paginate, encode_cursor, decode_cursor, NEXT_CURSOR_HEADER
 
 router = APIRouter(
     prefix="/tasks",
     tags=["tasks"]
 )
 
+def _task_load_options():
+    """Eager-load every relationship serialized by schemas.Task.
+
+    Each selectinload issues one extra query for the whole page, so the number of
+    statements stays fixed no matter how many tasks are returned.
+    """
+    return (
+        selectinload(models.Task.assigner),
+        selectinload(models.Task.assignee),
+        selectinload(models.Task.task_assignees).selectinload(models.TaskAssignee.user),
+        selectinload(models.Task.comments).selectinload(models.Comment.author),
+        selectinload(models.Task.activities).selectinload(models.TaskActivity.user),
+        selectinload(models.Task.help_requests).selectinload(models.HelpRequest.requester),
+        selectinload(models.Task.updates),
+    )
+
+def _populate_assignees(tasks, current_user):
+    """Fill the `assignees` list and per-user `is_new` flag from the preloaded task_assignees."""
+    for task in tasks:
+        task_assignees = task.task_assignees
+        task.assignees = sorted((ta.user for ta in task_assignees if ta.user is not None), key=lambda u: u.id)
+
+        # Check if task is new for current user
+        current_user_assignment = next((ta for ta in task_assignees if ta.user_id == current_user.id), None)
+        task.is_new = current_user_assignment.viewed_at is None if current_user_assignment else False
+    return tasks
+
+def _task_schemas(tasks, current_user) -> List[schemas.Task]:
+    """Serialize loaded tasks while still inside the session (async handlers cannot lazy-load later)."""
+    return [schemas.Task.model_validate(task, from_attributes=True) for task in _populate_assignees(tasks, current_user)]
+
+MAX_BULK_ITEMS = 500
+
+def _assignee_ids(task: schemas.TaskCreate) -> List[int]:
+    # Unique, in request order: the first one is the legacy assignee_id
+    return list(dict.fromkeys(task.assigned_to or []))
+
+def _insert_tasks(db: Session, items: List[schemas.TaskCreate], current_user: models.User) -> List[int]:
+    """Insert tasks and their assignees with one statement each; returns ids in item order."""
+    rows = []
+    for task in items:
+        row = task.dict(exclude={'assigned_to'})
+        assigned_to_ids = _assignee_ids(task)
+        # Set legacy assignee_id to first assignee for backward compatibility
+        row['assignee_id'] = assigned_to_ids[0] if assigned_to_ids else None
+        row['assigner_id'] = current_user.id
+        rows.append(row)
+    task_ids = db.scalars(
+        insert(models.Task).returning(models.Task.id, sort_by_parameter_order=True),
+        rows
+    ).all()
+
+    assignee_rows = [
+        {"task_id": task_id, "user_id": user_id, "assigned_at": datetime.utcnow()}
+        for task_id, task in zip(task_ids, items)
+        for user_id in _assignee_ids(task)
+    ]
+    if assignee_rows:
+        db.execute(insert(models.TaskAssignee), assignee_rows)
+
+    visibility.sync_tasks(db, task_ids)
+    search.index_tasks(db, task_ids)
+    task_events.task_created(db, task_ids)
+    return task_ids
+
+def _assignment_emails(db: Session, items: List[schemas.TaskCreate], current_user: models.User) -> List[dict]:
+    """Email payloads for every assignee of the given tasks, built while the session is open."""
+    user_ids = {user_id for task in items for user_id in _assignee_ids(task)}
+    if not user_ids:
+        return []
+    recipients = {
+        user.id: user
+        for user in db.query(models.User.id, models.User.username, models.User.email)
+            .filter(models.User.id.in_(user_ids), models.User.email.isnot(None))
+    }
+    payloads = []
+    for task in items:
+        for user_id in _assignee_ids(task):
+            recipient = recipients.get(user_id)
+            if recipient is None or not recipient.email:
+                continue
+            payloads.append(dict(
+                recipient_email=recipient.email,
+                recipient_name=recipient.username,
+                task_title=task.title,
+                task_description=task.description or "No description provided",
+                assigner_name=current_user.username,
+                deadline=task.deadline.strftime("%Y-%m-%d %H:%M") if task.deadline else None,
+                criticality=task.criticality.value if task.criticality else "medium"
+            ))
+    return payloads
+
+def _send_assignment_emails(payloads: List[dict]):
+    """Runs as a background task after the response is sent."""
+    for payload in payloads:
+        try:
+            email_service.send_task_assignment_email(**payload)
+        except Exception as e:
+            # Log error but don't fail task creation
+            print(f"Failed to send email notification: {str(e)}")
+
 @router.post("/", response_model=schemas.Task)
-def create_task(task: schemas.TaskCreate, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+def create_task(task: schemas.TaskCreate, background_tasks: BackgroundTasks, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
     if current_user.role == models.UserRole.MEMBER:
          raise HTTPException(status_code=403, detail="Members cannot create tasks")
     
     if task.is_internal and current_user.role not in [models.UserRole.UNIT_HEAD, models.UserRole.BACKUP_UNIT_HEAD]:
          raise HTTPException(status_code=403, detail="Only Unit Heads (or Backups) can create internal tasks")
 
-    # Extract assigned_to list and remove from dict
-    task_dict = task.dict(exclude={'assigned_to'})
-    assigned_to_ids = task.assigned_to or []
-    
-    # Set legacy assignee_id to first assignee for backward compatibility
-    task_dict['assignee_id'] = assigned_to_ids[0] if assigned_to_ids else None
-    task_dict['assigner_id'] = current_user.id
-    
-    db_task = models.Task(**task_dict)
-    db.add(db_task)
-    db.flush()  # Get task ID without committing
-    
-    # Create TaskAssignee entries for each assignee
-    for user_id in assigned_to_ids:
-        task_assignee = models.TaskAssignee(
-            task_id=db_task.id,
-            user_id=user_id
-        )
-        db.add(task_assignee)
-    
+    [task_id] = _insert_tasks(db, [task], current_user)
+    emails = _assignment_emails(db, [task], current_user)
     db.commit()
-    db.refresh(db_task)
-    
+
     # Send email notifications to all assignees
-    try:
-        assignee_users = db.query(models.User).filter(models.User.id.in_(assigned_to_ids)).all()
-        for assignee in assignee_users:
-            if assignee.email:
-                email_service.send_task_assignment_email(
-                    recipient_email=assignee.email,
-                    recipient_name=assignee.username,
-                    task_title=db_task.title,
-                    task_description=db_task.description or "No description provided",
-                    assigner_name=current_user.username,
-                    deadline=db_task.deadline.strftime("%Y-%m-%d %H:%M") if db_task.deadline else None,
-                    criticality=db_task.criticality.value if db_task.criticality else "medium"
-                )
-    except Exception as e:
-        # Log error but don't fail task creation
-        print(f"Failed to send email notification: {str(e)}")
+    background_tasks.add_task(_send_assignment_emails, emails)
+    return db.query(models.Task).filter(models.Task.id == task_id).first()
+
+@router.post("/bulk", response_model=schemas.TaskBulkResult)
+def create_tasks_bulk(
+    tasks: List[schemas.TaskCreate],
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """
+    Create many tasks in one transaction.
+
+    Every item is validated before anything is written; if any item is invalid nothing
+    is created and the 400 detail lists the per-item results.
+    """
+    if current_user.role == models.UserRole.MEMBER:
+         raise HTTPException(status_code=403, detail="Members cannot create tasks")
+    _check_bulk_size(tasks)
+
+    assigned = {user_id for task in tasks for user_id in _assignee_ids(task)}
+    known_users = {
+        user_id for (user_id,) in db.query(models.User.id).filter(models.User.id.in_(assigned))
+    } if assigned else set()
+
+    results = []
+    for index, task in enumerate(tasks):
+        error = None
+        if task.is_internal and current_user.role not in [models.UserRole.UNIT_HEAD, models.UserRole.BACKUP_UNIT_HEAD]:
+            error = "Only Unit Heads (or Backups) can create internal tasks"
+        elif set(_assignee_ids(task)) - known_users:
+            error = f"Unknown assignees: {sorted(set(_assignee_ids(task)) - known_users)}"
+        results.append(schemas.BulkItemResult(index=index, ok=error is None, error=error))
+    _raise_for_bulk_errors(results)
+
+    task_ids = _insert_tasks(db, tasks, current_user)
+    emails = _assignment_emails(db, tasks, current_user)
+    db.commit()
+
+    background_tasks.add_task(_send_assignment_emails, emails)
+    for result, task_id in zip(results, task_ids):
+        result.id = task_id
+    return {"results": results}
+
+@router.patch("/bulk", response_model=schemas.TaskBulkResult)
+def update_tasks_bulk(
+    tasks: List[schemas.TaskBulkUpdate],
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """
+    Apply PUT /tasks/{id} semantics to many tasks in one transaction.
+
+    Only the fields sent for an item are changed. As with bulk creation, nothing is
+    written unless every item is valid.
+    """
+    _check_bulk_size(tasks)
+    ids = [task.id for task in tasks]
+    db_tasks = {task.id: task for task in db.query(models.Task).filter(models.Task.id.in_(ids))}
+
+    results = []
+    seen = set()
+    for index, task in enumerate(tasks):
+        error = None
+        if task.id not in db_tasks:
+            error = "Task not found"
+        elif task.id in seen:
+            error = "Duplicate task id"
+        seen.add(task.id)
+        results.append(schemas.BulkItemResult(index=index, id=task.id, ok=error is None, error=error))
+    _raise_for_bulk_errors(results)
+
+    activities = []
+    reindex = []
+    for task in tasks:
+        task_data = task.dict(exclude_unset=True, exclude={'id'})
+        activities += _apply_task_update(db, db_tasks[task.id], task_data, current_user)
+        if 'title' in task_data or 'description' in task_data:
+            reindex.append(task.id)
+
+    if activities:
+        db.execute(insert(models.TaskActivity), activities)
+    db.flush()
+    search.index_tasks(db, reindex)
+    task_events.task_changed(db, ids)
+    db.commit()
+    return {"results": results}
+
+def _check_bulk_size(items):
+    if not items:
+        raise HTTPException(status_code=400, detail="No tasks given")
+    if len(items) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ITEMS} tasks per request")
+
+def _raise_for_bulk_errors(results: List[schemas.BulkItemResult]):
+    if not all(result.ok for result in results):
+        raise HTTPException(status_code=400, detail=jsonable_encoder(results))
+
+def _apply_task_update(db: Session, db_task: models.Task, task_data: dict, current_user: models.User) -> List[dict]:
+    """
+    Apply a TaskUpdate payload to `db_task` and return the activity rows to insert.
+    Achievement counters follow through task_events.task_changed().
+    """
+    activities = []
+    now = datetime.utcnow()
+    if 'status' in task_data and task_data['status'] != db_task.status:
+        activities.append(dict(
+            task_id=db_task.id,
+            user_id=current_user.id,
+            activity_type=models.ActivityType.STATUS_CHANGE,
+            description=f"Status changed to {task_data['status'].replace('_', ' ').title()}",
+            created_at=now
+        ))
+
+    if 'progress_percentage' in task_data and task_data['progress_percentage'] != db_task.progress_percentage:
+        activities.append(dict(
+            task_id=db_task.id,
+            user_id=current_user.id,
+            activity_type=models.ActivityType.PROGRESS_UPDATE,
+            description=f"Progress updated to {task_data['progress_percentage']}%",
+            created_at=now
+        ))
+
+    for key, value in task_data.items():
+        setattr(db_task, key, value)
     
-    return db_task
+    # Auto-set completed_at timestamp when status changes to COMPLETED
+    if 'status' in task_data and task_data['status'] == models.TaskStatus.COMPLETED:
+        if not db_task.completed_at:
+            db_task.completed_at = now
+    return activities
 
 
-@router.get("/", response_model=List[schemas.Task])
-def read_tasks(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    # Query tasks based on user role
-    if current_user.role == models.UserRole.GROUP_HEAD:
-        # See all tasks EXCEPT internal ones (via task_assignees OR legacy assignee_id)
-        Assignee = aliased(models.User)
-        Assigner = aliased(models.User)
-
-        tasks = db.query(models.Task)\
-            .outerjoin(Assignee, models.Task.assignee_id == Assignee.id)\
-            .outerjoin(Assigner, models.Task.assigner_id == Assigner.id)\
-            .filter(
-                models.Task.is_internal == False,
-                or_(
-                    Assignee.team_id != None,
-                    and_(models.Task.assignee_id == None, Assigner.team_id != None),
-                    models.Task.assigner_id == current_user.id,
-                    # Also include tasks where current user is in task_assignees
-                    models.Task.id.in_(
-                        db.query(models.TaskAssignee.task_id).filter(
-                            models.TaskAssignee.user_id.in_(
-                                db.query(models.User.id).filter(models.User.team_id != None)
-                            )
-                        )
-                    )
-                )
-            ).offset(skip).limit(limit).all()
-    elif current_user.role in [models.UserRole.UNIT_HEAD, models.UserRole.BACKUP_UNIT_HEAD]:
-        # See tasks assigned to members of their team (via task_assignees OR legacy assignee_id)
-        if current_user.team_id:
-            # Tasks where assignee is in their team OR task_assignees contains team member
-            tasks = db.query(models.Task).filter(
-                or_(
-                    models.Task.assignee_id.in_(
-                        db.query(models.User.id).filter(models.User.team_id == current_user.team_id)
-                    ),
-                    models.Task.id.in_(
-                        db.query(models.TaskAssignee.task_id).filter(
-                            models.TaskAssignee.user_id.in_(
-                                db.query(models.User.id).filter(models.User.team_id == current_user.team_id)
-                            )
-                        )
-                    )
-                )
-            ).offset(skip).limit(limit).all()
-        else:
-            # Fallback: tasks assigned to current user
-            tasks = db.query(models.Task).filter(
-                or_(
-                    models.Task.assignee_id == current_user.id,
-                    models.Task.id.in_(
-                        db.query(models.TaskAssignee.task_id).filter(models.TaskAssignee.user_id == current_user.id)
-                    )
+def _visible_tasks_query(db: Session, current_user: models.User, *entities):
+    """Query `entities` (the Task model by default) restricted to the tasks `current_user` may see."""
+    return db.query(*(entities or (models.Task,))).filter(visibility.visibility_filter(current_user))
+
+def _summary_columns():
+    """Scalar task columns plus correlated comment/activity counts for the summary projection."""
+    comment_count = select(func.count(models.Comment.id))\
+        .where(models.Comment.task_id == models.Task.id)\
+        .correlate(models.Task)\
+        .scalar_subquery()
+    activity_count = select(func.count(models.TaskActivity.id))\
+        .where(models.TaskActivity.task_id == models.Task.id)\
+        .correlate(models.Task)\
+        .scalar_subquery()
+    return (
+        models.Task.id,
+        models.Task.title,
+        models.Task.status,
+        models.Task.criticality,
+        models.Task.progress_percentage,
+        models.Task.deadline,
+        models.Task.created_at,
+        models.Task.completed_at,
+        models.Task.assignee_id,
+        models.Task.assigner_id,
+        models.Task.is_internal,
+        comment_count.label("comment_count"),
+        activity_count.label("activity_count"),
+    )
+
+def _build_task_summaries(db: Session, rows, current_user: models.User) -> List[schemas.TaskSummary]:
+    """Attach assignees and the is_new flag to summary rows with a single extra query."""
+    task_ids = [row.id for row in rows]
+    assignees = {task_id: [] for task_id in task_ids}
+    is_new = {}
+    if task_ids:
+        assignment_rows = db.query(
+            models.TaskAssignee.task_id,
+            models.TaskAssignee.viewed_at,
+            models.User.id,
+            models.User.username,
+            models.User.role,
+            models.User.team_id,
+        ).join(models.User, models.User.id == models.TaskAssignee.user_id)\
+            .filter(models.TaskAssignee.task_id.in_(task_ids))\
+            .order_by(models.User.id)\
+            .all()
+        for assignment in assignment_rows:
+            assignees[assignment.task_id].append(schemas.UserSummary(
+                id=assignment.id,
+                username=assignment.username,
+                role=assignment.role,
+                team_id=assignment.team_id,
+            ))
+            if assignment.id == current_user.id:
+                is_new[assignment.task_id] = assignment.viewed_at is None
+
+    return [
+        schemas.TaskSummary(
+            **row._asdict(),
+            assignees=assignees[row.id],
+            is_new=is_new.get(row.id, False),
+        )
+        for row in rows
+    ]
+
+# Sort keys accepted by task listings: column and the value standing in for NULL,
+# so keyset cursors stay well-defined on nullable columns
+FAR_FUTURE = datetime(9999, 12, 31)
+TASK_SORT_KEYS = {
+    "created_at": (models.Task.created_at, None),
+    "deadline": (models.Task.deadline, FAR_FUTURE),
+    "completed_at": (models.Task.completed_at, FAR_FUTURE),
+    "progress_percentage": (models.Task.progress_percentage, 0),
+    "title": (models.Task.title, ""),
+}
+
+class TaskListFilters:
+    """Filter and sort query parameters for task listings, applied in SQL"""
+
+    def __init__(
+        self,
+        status: Optional[List[models.TaskStatus]] = Query(None),
+        criticality: Optional[List[models.TaskCriticality]] = Query(None),
+        deadline_from: Optional[datetime] = None,
+        deadline_to: Optional[datetime] = None,
+        overdue: Optional[bool] = None,
+        assignee_id: Optional[int] = None,
+        assigner_id: Optional[int] = None,
+        is_internal: Optional[bool] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        completed_from: Optional[datetime] = None,
+        completed_to: Optional[datetime] = None,
+        sort: str = "-created_at",
+    ):
+        descending = sort.startswith("-")
+        sort_key = sort.lstrip("-")
+        if sort_key not in TASK_SORT_KEYS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid sort. Use one of: {', '.join(TASK_SORT_KEYS)} (prefix with '-' for descending)"
+            )
+        self.status = status
+        self.criticality = criticality
+        self.deadline_from = deadline_from
+        self.deadline_to = deadline_to
+        self.overdue = overdue
+        self.assignee_id = assignee_id
+        self.assigner_id = assigner_id
+        self.is_internal = is_internal
+        self.created_from = created_from
+        self.created_to = created_to
+        self.completed_from = completed_from
+        self.completed_to = completed_to
+        self.sort_key = sort_key
+        self.descending = descending
+
+    def apply(self, query):
+        Task = models.Task
+        if self.status:
+            query = query.filter(Task.status.in_(self.status))
+        if self.criticality:
+            query = query.filter(Task.criticality.in_(self.criticality))
+        if self.deadline_from:
+            query = query.filter(Task.deadline >= self.deadline_from)
+        if self.deadline_to:
+            query = query.filter(Task.deadline <= self.deadline_to)
+        if self.overdue is not None:
+            now = datetime.utcnow()
+            if self.overdue:
+                query = query.filter(Task.deadline < now, Task.status != models.TaskStatus.COMPLETED)
+            else:
+                # Spelled out rather than negated: NOT (deadline < now) is NULL for tasks without a deadline
+                query = query.filter(or_(Task.deadline.is_(None), Task.deadline >= now, Task.status == models.TaskStatus.COMPLETED))
+        if self.assignee_id is not None:
+            # Legacy assignee_id or task_assignees, both indexed in task_visibility
+            query = query.filter(Task.id.in_(
+                select(models.TaskVisibility.task_id).where(
+                    models.TaskVisibility.user_id == self.assignee_id,
+                    models.TaskVisibility.relation == visibility.ASSIGNEE,
                 )
-            ).offset(skip).limit(limit).all()
+            ))
+        if self.assigner_id is not None:
+            query = query.filter(Task.assigner_id == self.assigner_id)
+        if self.is_internal is not None:
+            query = query.filter(Task.is_internal == self.is_internal)
+        if self.created_from:
+            query = query.filter(Task.created_at >= self.created_from)
+        if self.created_to:
+            query = query.filter(Task.created_at <= self.created_to)
+        if self.completed_from:
+            query = query.filter(Task.completed_at >= self.completed_from)
+        if self.completed_to:
+            query = query.filter(Task.completed_at <= self.completed_to)
+        return query
+
+    def order_columns(self):
+        """Keyset ordering expressions (sort column, id) and a function extracting them from a row."""
+        column, null_value = TASK_SORT_KEYS[self.sort_key]
+        name = self.sort_key
+        if null_value is None:
+            return (column, models.Task.id), lambda row: (getattr(row, name), row.id)
+
+        def key(row):
+            value = getattr(row, name)
+            return (null_value if value is None else value, row.id)
+        return (func.coalesce(column, null_value), models.Task.id), key
+
+@router.get("/", response_model=List[schemas.Task])
+async def read_tasks(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    view: str = "full",
+    filters: TaskListFilters = Depends(),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """
+    List visible tasks, newest first by default. Pass the X-Next-Cursor header value back
+    as `cursor` (with the same filters and sort) for the next page.
+
+    `view=summary` returns schemas.TaskSummary items: scalar columns, assignees and
+    comment/activity counts instead of the embedded relationship arrays.
+
+    The page is first resolved to (id, version) pairs; when they match If-None-Match
+    a 304 is returned without loading or serializing the tasks.
+    """
+    return await database.run_read(_read_tasks, db, request, response, skip, limit, cursor, view, filters, current_user)
+
+def _read_tasks(db: Session, request: Request, response: Response, skip: int, limit: int, cursor: Optional[str], view: str, filters: TaskListFilters, current_user: models.User):
+    if view not in ("full", "summary"):
+        raise HTTPException(status_code=400, detail="Invalid view. Use 'full' or 'summary'")
+
+    page_columns = [models.Task.id, models.Task.version, models.Task.created_at]
+    if filters.sort_key != "created_at":
+        page_columns.append(TASK_SORT_KEYS[filters.sort_key][0])
+    query = filters.apply(_visible_tasks_query(db, current_user, *page_columns))
+
+    columns, key = filters.order_columns()
+    page, next_cursor = paginate(
+        query,
+        columns,
+        key=key,
+        cursor=cursor,
+        limit=limit,
+        skip=skip,
+        descending=filters.descending,
+    )
+
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+    etag = etags.make_etag(
+        "tasks",
+        current_user.id,
+        str(request.query_params),
+        etags.get_version(db, etags.USERS),
+        [(row.id, row.version) for row in page],
+    )
+    if etags.is_not_modified(request, etag):
+        not_modified = etags.not_modified(etag)
+        not_modified.headers.update(headers)
+        return not_modified
+
+    task_ids = [row.id for row in page]
+    if view == "summary":
+        rows = db.query(*_summary_columns()).filter(models.Task.id.in_(task_ids)).all() if task_ids else []
     else:
-        # Member: See tasks assigned to them (via task_assignees OR legacy assignee_id)
-        tasks = db.query(models.Task).filter(
-            or_(
-                models.Task.assignee_id == current_user.id,
-                models.Task.id.in_(
-                    db.query(models.TaskAssignee.task_id).filter(models.TaskAssignee.user_id == current_user.id)
-                )
-            )
-        ).offset(skip).limit(limit).all()
-    
-    # Populate assignees list and is_new flag for each task
-    for task in tasks:
-        # Get all assignees from task_assignees table
-        task_assignees = db.query(models.TaskAssignee).filter(models.TaskAssignee.task_id == task.id).all()
-        assignee_ids = [ta.user_id for ta in task_assignees]
-        task.assignees = db.query(models.User).filter(models.User.id.in_(assignee_ids)).all() if assignee_ids else []
-        
-        # Check if task is new for current user
-        current_user_assignment = next((ta for ta in task_assignees if ta.user_id == current_user.id), None)
-        task.is_new = current_user_assignment.viewed_at is None if current_user_assignment else False
-    
-    return tasks
+        rows = db.query(models.Task).options(*_task_load_options()).filter(models.Task.id.in_(task_ids)).all() if task_ids else []
+    by_id = {row.id: row for row in rows}
+    tasks = [by_id[task_id] for task_id in task_ids if task_id in by_id]
+
+    if view == "summary":
+        # Returned directly so the full schemas.Task response_model is not applied
+        summaries = _build_task_summaries(db, tasks, current_user)
+        summary_response = JSONResponse(content=jsonable_encoder(summaries), headers=headers)
+        etags.set_etag(summary_response, etag)
+        return summary_response
+
+    response.headers.update(headers)
+    etags.set_etag(response, etag)
+    return _task_schemas(tasks, current_user)
+
+@router.get("/search", response_model=List[schemas.TaskSummary])
+async def search_tasks(
+    q: str,
+    skip: int = 0,
+    limit: int = 20,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Full-text search over task titles, descriptions and comments, best match first.
+
+    Results follow the same visibility rules as GET /tasks/.
+    """
+    return await database.run_read(_search_tasks, db, q, skip, limit, current_user)
+
+def _search_tasks(db: Session, q: str, skip: int, limit: int, current_user: models.User):
+    hits = search.matches(db, q)
+    if hits is None:
+        return []
+    rows = _visible_tasks_query(db, current_user, *_summary_columns())\
+        .join(hits, hits.c.task_id == models.Task.id)\
+        .order_by(hits.c.rank, models.Task.id.desc())\
+        .offset(skip)\
+        .limit(limit)\
+        .all()
+    return _build_task_summaries(db, rows, current_user)
+
+@router.get("/changes", response_model=schemas.TaskChangeFeed)
+async def read_task_changes(
+    since: Optional[str] = None,
+    limit: int = 500,
+    view: str = "summary",
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """
+    Tasks created, updated or deleted after the `since` cursor.
+
+    Without `since` no changes are returned, only the current cursor: take it first,
+    load GET /tasks/, then poll with it. `deleted` lists tombstones plus changed tasks
+    that are no longer visible to the caller. Keep polling while `has_more` is true.
+    """
+    return await database.run_read(_read_task_changes, db, since, limit, view, current_user)
+
+def _read_task_changes(db: Session, since: Optional[str], limit: int, view: str, current_user: models.User):
+    if view not in ("full", "summary"):
+        raise HTTPException(status_code=400, detail="Invalid view. Use 'full' or 'summary'")
+
+    if since is None:
+        latest = db.query(func.max(models.TaskChange.seq)).scalar() or 0
+        return {"tasks": [], "deleted": [], "next_cursor": encode_cursor([latest]), "has_more": False}
+
+    since_seq = decode_cursor(since, 1)[0]
+    if not isinstance(since_seq, int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    changes = db.query(models.TaskChange.seq, models.TaskChange.task_id, models.TaskChange.op)\
+        .filter(models.TaskChange.seq > since_seq)\
+        .order_by(models.TaskChange.seq)\
+        .limit(limit + 1)\
+        .all()
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    # Only the latest operation per task matters
+    latest = {}
+    for change in changes:
+        latest[change.task_id] = change
+    upserted = [task_id for task_id, change in latest.items() if change.op == task_events.UPSERT]
+    tombstones = {task_id: change.seq for task_id, change in latest.items() if change.op == task_events.DELETE}
+
+    tasks = []
+    if upserted:
+        if view == "summary":
+            rows = _visible_tasks_query(db, current_user, *_summary_columns())\
+                .filter(models.Task.id.in_(upserted)).order_by(models.Task.id).all()
+            tasks = _build_task_summaries(db, rows, current_user)
+        else:
+            rows = _visible_tasks_query(db, current_user).options(*_task_load_options())\
+                .filter(models.Task.id.in_(upserted)).order_by(models.Task.id).all()
+            tasks = _task_schemas(rows, current_user)
+    # Deleted, or changed and no longer visible (e.g. made internal), and seen before
+    hidden = set(upserted) - {task.id for task in tasks}
+    deleted = visibility.former_audience(db, current_user, hidden, tombstones)
+
+    next_seq = changes[-1].seq if changes else since_seq
+    feed = {
+        "tasks": tasks,
+        "deleted": sorted(deleted),
+        "next_cursor": encode_cursor([next_seq]),
+        "has_more": has_more,
+    }
+    if view == "full":
+        # Returned directly so the summary response_model is not applied
+        return JSONResponse(content=jsonable_encoder(feed))
+    return feed
 
 @router.get("/{task_id}", response_model=schemas.Task)
-def get_task(task_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    """Get a single task by ID"""
-    task = db.query(models.Task).filter(models.Task.id == task_id).first()
-    
+async def get_task(task_id: int, request: Request, response: Response, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    """Get a single task by ID. Supports If-None-Match, checked before any relationship is loaded."""
+    return await database.run_read(_get_task, db, task_id, request, response, current_user)
+
+def _get_task(db: Session, task_id: int, request: Request, response: Response, current_user: models.User):
+    version_row = db.query(models.Task.version).filter(models.Task.id == task_id).first()
+    if not version_row:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    etag = etags.make_etag("task", task_id, version_row.version, etags.get_version(db, etags.USERS), current_user.id)
+    if etags.is_not_modified(request, etag):
+        return etags.not_modified(etag)
+
+    task = db.query(models.Task).options(*_task_load_options()).filter(models.Task.id == task_id).first()
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    # Populate assignees list
-    task_assignees = db.query(models.TaskAssignee).filter(models.TaskAssignee.task_id == task.id).all()
-    assignee_ids = [ta.user_id for ta in task_assignees]
-    task.assignees = db.query(models.User).filter(models.User.id.in_(assignee_ids)).all() if assignee_ids else []
-    
-    # Check if task is new for current user
-    current_user_assignment = next((ta for ta in task_assignees if ta.user_id == current_user.id), None)
-    task.is_new = current_user_assignment.viewed_at is None if current_user_assignment else False
-    
-    return task
+    etags.set_etag(response, etag)
+    return _task_schemas([task], current_user)[0]
 
 @router.post("/{task_id}/mark-viewed")
 def mark_task_viewed(task_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
@@ -176,6 +640,7 @@ def mark_task_viewed(task_id: int, db: Session = Depends(database.get_db), curre
     
     if task_assignee.viewed_at is None:
         task_assignee.viewed_at = datetime.utcnow()
+        task_events.task_changed(db, [task_id])
         db.commit()
     
     return {"message": "Task marked as viewed"}
@@ -207,18 +672,11 @@ def delete_task(task_id: int, db: Session = Depends(database.get_db), current_us
     )
     db.add(activity)
     db.commit()
-    
-    # If task was completed, we need to update achievement stats
-    if db_task.status == models.TaskStatus.COMPLETED and db_task.assignee_id:
-        achievement = db.query(models.MemberAchievement).filter(models.MemberAchievement.user_id == db_task.assignee_id).first()
-        if achievement:
-            if achievement.total_completed_tasks > 0:
-                achievement.total_completed_tasks -= 1
-            if db_task.criticality == models.TaskCriticality.HIGH and achievement.critical_tasks_completed > 0:
-                achievement.critical_tasks_completed -= 1
-            db.add(achievement)
-
-    # Delete the task
+
+    # Delete the task (task_deleted also takes it out of the achievement counters)
+    task_events.task_deleted(db, task_id)
+    visibility.forget_task(db, task_id)
+    search.forget_task(db, task_id)
     db.delete(db_task)
     db.commit()
     
@@ -232,62 +690,14 @@ def update_task(task_id: int, task: schemas.TaskUpdate, db: Session = Depends(da
     
     # Update fields
     task_data = task.dict(exclude_unset=True)
-    
-    # Track changes for activity log
-    changes = []
-    if 'status' in task_data and task_data['status'] != db_task.status:
-        changes.append(f"Status changed from {db_task.status} to {task_data['status']}")
-        # Log activity
-        activity = models.TaskActivity(
-            task_id=task_id,
-            user_id=current_user.id,
-            activity_type=models.ActivityType.STATUS_CHANGE,
-            description=f"Status changed to {task_data['status'].replace('_', ' ').title()}"
-        )
-        db.add(activity)
-        
-    if 'progress_percentage' in task_data and task_data['progress_percentage'] != db_task.progress_percentage:
-        # Log activity
-        activity = models.TaskActivity(
-            task_id=task_id,
-            user_id=current_user.id,
-            activity_type=models.ActivityType.PROGRESS_UPDATE,
-            description=f"Progress updated to {task_data['progress_percentage']}%"
-        )
-        db.add(activity)
-
-    for key, value in task_data.items():
-        setattr(db_task, key, value)
-    
-    # Auto-set completed_at timestamp when status changes to COMPLETED
-    if 'status' in task_data and task_data['status'] == models.TaskStatus.COMPLETED:
-        if not db_task.completed_at:
-            db_task.completed_at = datetime.utcnow()
-            
-            # Update member achievements
-            achievement = db.query(models.MemberAchievement).filter(models.MemberAchievement.user_id == db_task.assignee_id).first()
-            if not achievement:
-                achievement = models.MemberAchievement(
-                    user_id=db_task.assignee_id,
-                    total_completed_tasks=0,
-                    critical_tasks_completed=0,
-                    on_time_completion_rate=0,
-                    current_no_blocker_streak=0
-                )
-                db.add(achievement)
-            
-            # Ensure fields are not None before incrementing
-            if achievement.total_completed_tasks is None:
-                achievement.total_completed_tasks = 0
-            if achievement.critical_tasks_completed is None:
-                achievement.critical_tasks_completed = 0
-                
-            achievement.total_completed_tasks += 1
-            if db_task.criticality == models.TaskCriticality.HIGH:
-                achievement.critical_tasks_completed += 1
-            achievement.last_updated = datetime.utcnow()
+    activities = _apply_task_update(db, db_task, task_data, current_user)
+    if activities:
+        db.execute(insert(models.TaskActivity), activities)
     
     db.add(db_task)
+    if 'title' in task_data or 'description' in task_data:
+        search.index_tasks(db, [task_id])
+    task_events.task_changed(db, [task_id])
     db.commit()
     db.refresh(db_task)
     return db_task
@@ -309,15 +719,37 @@ def create_comment(task_id: int, comment: schemas.CommentCreate, db: Session = D
         description="Added a comment"
     )
     db.add(activity)
+    search.index_tasks(db, [task_id])
+    task_events.task_changed(db, [task_id])
     
     db.commit()
     db.refresh(db_comment)
     return db_comment
 
 @router.get("/{task_id}/comments/", response_model=List[schemas.Comment])
-def read_comments(task_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    comments = db.query(models.Comment).filter(models.Comment.task_id == task_id).order_by(models.Comment.created_at.desc()).all()
-    return comments
+async def read_comments(
+    task_id: int,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """List comments newest first. Without limit or cursor every comment is returned."""
+    return await database.run_read(_read_comments, db, task_id, response, limit, cursor)
+
+def _read_comments(db: Session, task_id: int, response: Response, limit: Optional[int], cursor: Optional[str]):
+    query = db.query(models.Comment).options(selectinload(models.Comment.author)).filter(models.Comment.task_id == task_id)
+    comments, next_cursor = paginate(
+        query,
+        (models.Comment.created_at, models.Comment.id),
+        key=lambda comment: (comment.created_at, comment.id),
+        cursor=cursor,
+        limit=limit,
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return [schemas.Comment.model_validate(comment, from_attributes=True) for comment in comments]
 
 @router.put("/{task_id}/comments/{comment_id}", response_model=schemas.Comment)
 def update_comment(
@@ -351,6 +783,8 @@ def update_comment(
         description="Edited a comment"
     )
     db.add(activity)
+    search.index_tasks(db, [task_id])
+    task_events.task_changed(db, [task_id])
     
     db.commit()
     db.refresh(db_comment)
@@ -387,6 +821,8 @@ def delete_comment(
     
     # Delete the comment
     db.delete(db_comment)
+    search.index_tasks(db, [task_id])
+    task_events.task_changed(db, [task_id])
     db.commit()
     
     return {"message": "Comment deleted successfully", "comment_id": comment_id}
@@ -409,6 +845,7 @@ def create_help_request(task_id: int, request: schemas.HelpRequestCreate, db: Se
         description=f"Requested help: {request.reason}"
     )
     db.add(activity)
+    task_events.task_changed(db, [task_id])
     
     db.commit()
     db.refresh(help_req)
@@ -418,10 +855,10 @@ def create_help_request(task_id: int, request: schemas.HelpRequestCreate, db: Se
 async def upload_evidence(
     task_id: int, 
     file: UploadFile = File(...), 
-    db: Session = Depends(database.get_db), 
+    db: AsyncSession = Depends(database.get_async_db), 
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
-    db_task = db.query(models.Task).filter(models.Task.id == task_id).first()
+    db_task = await db.get(models.Task, task_id)
     if not db_task:
         raise HTTPException(status_code=404, detail="Task not found")
         
@@ -438,8 +875,7 @@ async def upload_evidence(
     filename = f"evidence_{task_id}_{datetime.utcnow().timestamp()}{file_extension}"
     file_path = UPLOAD_DIR / filename
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    await run_in_threadpool(_save_upload, file.file, file_path)
         
     # Update task evidence_url
     evidence_url = f"/uploads/{filename}"
@@ -453,14 +889,39 @@ async def upload_evidence(
         description=f"Uploaded evidence: {file.filename}"
     )
     db.add(activity)
+    await db.run_sync(task_events.task_changed, [task_id])
     
-    db.commit()
+    await db.commit()
     return {"filename": file.filename, "url": evidence_url}
 
+def _save_upload(source, file_path: Path):
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(source, buffer)
+
 @router.get("/{task_id}/timeline", response_model=List[schemas.TaskActivity])
-def read_timeline(task_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    activities = db.query(models.TaskActivity).filter(models.TaskActivity.task_id == task_id).order_by(models.TaskActivity.created_at.desc()).all()
-    return activities
+async def read_timeline(
+    task_id: int,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """List task activity newest first. Without limit or cursor the whole timeline is returned."""
+    return await database.run_read(_read_timeline, db, task_id, response, limit, cursor)
+
+def _read_timeline(db: Session, task_id: int, response: Response, limit: Optional[int], cursor: Optional[str]):
+    query = db.query(models.TaskActivity).options(selectinload(models.TaskActivity.user)).filter(models.TaskActivity.task_id == task_id)
+    activities, next_cursor = paginate(
+        query,
+        (models.TaskActivity.created_at, models.TaskActivity.id),
+        key=lambda activity: (activity.created_at, activity.id),
+        cursor=cursor,
+        limit=limit,
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return [schemas.TaskActivity.model_validate(activity, from_attributes=True) for activity in activities]
 
 @router.post("/{task_id}/update", response_model=schemas.Task)
 def update_task_progress(
@@ -496,8 +957,9 @@ def update_task_progress(
     )
     db.add(activity)
     
-    # Note: Completion and achievement updates now happen only via the approve endpoint
+    # Note: completed_at is set only via the approve endpoint; achievement counters follow the status via task_events
 
+    task_events.task_changed(db, [task_id])
     db.commit()
     db.refresh(task)
     return task
@@ -549,6 +1011,7 @@ def approve_task(
                     description=f"Task approved by {current_user.username}, forwarded to Group Head for final approval"
                 )
                 db.add(activity)
+                task_events.task_changed(db, [task_id])
                 db.commit()
                 db.refresh(task)
                 return task
@@ -564,30 +1027,7 @@ def approve_task(
     if is_final_approval:
         task.status = models.TaskStatus.COMPLETED
         task.completed_at = datetime.utcnow()
-        
-        # Update achievement stats for the assignee
-        if task.assignee_id:
-            stats = db.query(models.MemberAchievement).filter(models.MemberAchievement.user_id == task.assignee_id).first()
-            if not stats:
-                stats = models.MemberAchievement(
-                    user_id=task.assignee_id,
-                    total_completed_tasks=0,
-                    critical_tasks_completed=0,
-                    on_time_completion_rate=0,
-                    current_no_blocker_streak=0
-                )
-                db.add(stats)
-            
-            # Ensure fields are not None before incrementing
-            if stats.total_completed_tasks is None:
-                stats.total_completed_tasks = 0
-            if stats.critical_tasks_completed is None:
-                stats.critical_tasks_completed = 0
-                
-            stats.total_completed_tasks += 1
-            if task.criticality == models.TaskCriticality.HIGH:
-                stats.critical_tasks_completed += 1
-            stats.last_updated = datetime.utcnow()
+        # Achievement stats for the assignee follow through task_events.task_changed()
         
         # Log Activity
         activity = models.TaskActivity(
@@ -598,6 +1038,7 @@ def approve_task(
         )
         db.add(activity)
     
+    task_events.task_changed(db, [task_id])
     db.commit()
     db.refresh(task)
     return task
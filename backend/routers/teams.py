@@ -1,8 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError as integrity_error
 from typing import List
-from .. import models, schemas, auth, database
+from .. import models, schemas, auth, database, etags, visibility, rollups
 
 router = APIRouter(
     prefix="/teams",
@@ -17,6 +17,7 @@ def create_team(team: schemas.TeamCreate, db: Session = Depends(database.get_db)
             
         db_team = models.Team(name=team.name)
         db.add(db_team)
+        etags.bump_version(db, etags.TEAMS)
         db.commit()
         db.refresh(db_team)
         return db_team
@@ -29,8 +30,14 @@ def create_team(team: schemas.TeamCreate, db: Session = Depends(database.get_db)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 @router.get("/", response_model=List[schemas.Team])
-def read_teams(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+def read_teams(request: Request, response: Response, skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    # Teams embed their members, so user changes invalidate the list too
+    etag = etags.make_etag("teams", skip, limit, etags.get_version(db, etags.TEAMS), etags.get_version(db, etags.USERS))
+    if etags.is_not_modified(request, etag):
+        return etags.not_modified(etag)
+
     teams = db.query(models.Team).offset(skip).limit(limit).all()
+    etags.set_etag(response, etag)
     return teams
 
 @router.delete("/{team_id}")
@@ -42,6 +49,17 @@ def delete_team(team_id: int, db: Session = Depends(database.get_db), current_us
     if not team:
         raise HTTPException(status_code=404, detail="Team not found")
         
+    # Deleting the team clears its members' team_id, which their tokens carry as a claim
+    members = list(team.members)
+    member_ids = [member.id for member in members]
+    for member in members:
+        auth.revoke_token_claims(member)
     db.delete(team)
+    visibility.sync_users(db, member_ids)
+    rollups.sync_users(db, member_ids)
+    etags.bump_version(db, etags.TEAMS)
+    # Members' team_id changed: user listings and embedded users are stale too
+    etags.bump_version(db, etags.USERS)
     db.commit()
+    auth.invalidate_principal(*[member.username for member in members])
     return {"message": "Team deleted"}
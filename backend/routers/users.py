@@ -1,9 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError as integrity_error
 from typing import List, Optional
 from datetime import datetime
-from .. import models, schemas, auth, database
+from .. import models, schemas, auth, database, visibility, etags, rollups
 
 router = APIRouter(
     prefix="/users",
@@ -41,6 +41,7 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(database.get_db)
             team_id=user.team_id
         )
         db.add(db_user)
+        etags.bump_version(db, etags.USERS)
         db.commit()
         db.refresh(db_user)
         return db_user
@@ -52,12 +53,17 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(database.get_db)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/", response_model=List[schemas.User])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+def read_users(request: Request, response: Response, skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    etag = etags.make_etag("users", skip, limit, etags.get_version(db, etags.USERS))
+    if etags.is_not_modified(request, etag):
+        return etags.not_modified(etag)
+
     users = db.query(models.User).offset(skip).limit(limit).all()
+    etags.set_etag(response, etag)
     return users
 
 @router.get("/me", response_model=schemas.User)
-async def read_users_me(current_user: models.User = Depends(auth.get_current_active_user)):
+async def read_users_me(current_user: models.User = Depends(auth.get_current_db_user)):
     return current_user
 
 @router.delete("/{user_id}")
@@ -77,13 +83,17 @@ def delete_user(user_id: int, db: Session = Depends(database.get_db), current_us
     ).first()
     
     # Delete the user
+    visibility.forget_user(db, user_id)
     db.delete(db_user)
+    rollups.sync_users(db, [user_id])
     
     # If there was a deletion request, mark it as completed
     if deletion_request:
         db.delete(deletion_request)
     
+    etags.bump_version(db, etags.USERS)
     db.commit()
+    auth.invalidate_principal(db_user.username)
     return {"message": "User deleted"}
 
 @router.put("/{user_id}", response_model=schemas.User)
@@ -98,6 +108,8 @@ def update_user(user_id: int, user_update: schemas.UserUpdate, db: Session = Dep
     db_user = db.query(models.User).filter(models.User.id == user_id).first()
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
+    old_username = db_user.username
+    old_claims = (db_user.username, db_user.role, db_user.team_id)
     
     # Handle Username Update
     if user_update.username and user_update.username != db_user.username:
@@ -115,8 +127,10 @@ def update_user(user_id: int, user_update: schemas.UserUpdate, db: Session = Dep
     if is_group_head:
         update_data = user_update.dict(exclude_unset=True)
         
-        if "team_id" in update_data:
+        if "team_id" in update_data and update_data["team_id"] != db_user.team_id:
             db_user.team_id = update_data["team_id"]
+            visibility.sync_users(db, [db_user.id])
+            rollups.sync_users(db, [db_user.id])
         
         if "role" in update_data:
             new_role = update_data["role"]
@@ -143,7 +157,11 @@ def update_user(user_id: int, user_update: schemas.UserUpdate, db: Session = Dep
             
             db_user.role = new_role
     
+    if (db_user.username, db_user.role, db_user.team_id) != old_claims:
+        auth.revoke_token_claims(db_user)
+    etags.bump_version(db, etags.USERS)
     db.commit()
+    auth.invalidate_principal(old_username, db_user.username)
     db.refresh(db_user)
     return db_user
 
@@ -238,12 +256,19 @@ def review_deletion_request(
     deletion_request.reviewed_by_id = current_user.id
     
     # If approved, delete the user
+    deleted_username = None
     if approved:
         user_to_delete = db.query(models.User).filter(models.User.id == deletion_request.user_id).first()
         if user_to_delete:
+            deleted_username = user_to_delete.username
+            visibility.forget_user(db, user_to_delete.id)
             db.delete(user_to_delete)
+            rollups.sync_users(db, [user_to_delete.id])
+            etags.bump_version(db, etags.USERS)
     
     db.commit()
+    if deleted_username:
+        auth.invalidate_principal(deleted_username)
     db.refresh(deletion_request)
     
     return {
@@ -355,6 +380,7 @@ def review_promotion_request(
     promotion_request.reviewed_by_id = current_user.id
     
     # If approved, promote the user
+    user_to_promote = None
     if approved:
         user_to_promote = db.query(models.User).filter(models.User.id == promotion_request.user_id).first()
         if user_to_promote:
@@ -368,8 +394,12 @@ def review_promotion_request(
                 raise HTTPException(status_code=400, detail=f"Team already has a Backup Unit Head: {existing_backup.username}")
             
             user_to_promote.role = promotion_request.target_role
+            auth.revoke_token_claims(user_to_promote)
+            etags.bump_version(db, etags.USERS)
     
     db.commit()
+    if user_to_promote:
+        auth.invalidate_principal(user_to_promote.username)
     db.refresh(promotion_request)
     
     return {
@@ -400,7 +430,10 @@ def demote_backup_unit_head(
     
     # Demote to MEMBER
     user_to_demote.role = models.UserRole.MEMBER
+    auth.revoke_token_claims(user_to_demote)
+    etags.bump_version(db, etags.USERS)
     db.commit()
+    auth.invalidate_principal(user_to_demote.username)
     db.refresh(user_to_demote)
     
     return {
@@ -160,7 +160,7 @@ class MemberAchievementBase(BaseModel):
     current_no_blocker_streak: int
 
 class MemberAchievement(MemberAchievementBase):
-    id: int
+    id: Optional[int] = None  # None until the member's first completion is counted
     user_id: int
     last_updated: datetime
 
@@ -226,6 +226,63 @@ class Task(TaskBase):
     class Config:
         orm_mode = True
 
+class UserSummary(BaseModel):
+    id: int
+    username: str
+    role: UserRole
+    team_id: Optional[int] = None
+
+    class Config:
+        orm_mode = True
+
+class TaskSummary(BaseModel):
+    """Lightweight task list item: no description and counts instead of nested arrays"""
+    id: int
+    title: str
+    status: TaskStatus
+    criticality: TaskCriticality
+    progress_percentage: Optional[int] = 0
+    deadline: Optional[datetime] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+    assignee_id: Optional[int] = None
+    assigner_id: Optional[int] = None
+    is_internal: Optional[bool] = False
+    assignees: List[UserSummary] = []
+    is_new: Optional[bool] = False
+    comment_count: int = 0
+    activity_count: int = 0
+
+    class Config:
+        orm_mode = True
+
+class TaskChangeFeed(BaseModel):
+    tasks: List[TaskSummary] = []
+    deleted: List[int] = []
+    next_cursor: str
+    has_more: bool = False
+
+class TaskBulkUpdate(TaskUpdate):
+    id: int
+
+class BulkItemResult(BaseModel):
+    """Outcome of one item of a bulk request, by its position in the request"""
+    index: int
+    id: Optional[int] = None
+    ok: bool = True
+    error: Optional[str] = None
+
+class TaskBulkResult(BaseModel):
+    results: List[BulkItemResult]
+
+class Dashboard(BaseModel):
+    """Everything the dashboard page loads, in one response"""
+    user: User
+    tasks: List[TaskSummary] = []
+    next_cursor: Optional[str] = None  # For GET /tasks/?view=summary&cursor=...
+    members: List[User] = []
+    analytics: Optional[dict] = None  # Group Heads only
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -0,0 +1,99 @@
+"""
+Measure how a login storm affects unrelated requests.
+
+Runs `--logins` concurrent clients hammering POST /token while one client
+probes a cheap endpoint (GET /health by default) at a fixed rate, then
+prints latency percentiles for both. Run it against a single worker to see
+the effect of PASSWORD_HASH_CONCURRENCY, e.g.:
+
+    uvicorn backend.main:app --port 8000
+    python -m backend.scripts.bench_login_storm --url http://127.0.0.1:8000 \\
+        --username testadmin --password test123 --logins 50 --duration 20
+
+Compare the probe p99 with --logins 0 (baseline) to see the stall.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(samples, pct):
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(name, samples, errors):
+    if not samples:
+        print(f"{name:>7}: no successful requests ({errors} errors)")
+        return
+    print(
+        f"{name:>7}: n={len(samples)} errors={errors} "
+        f"p50={percentile(samples, 50):.1f}ms p90={percentile(samples, 90):.1f}ms "
+        f"p99={percentile(samples, 99):.1f}ms max={max(samples):.1f}ms mean={statistics.mean(samples):.1f}ms"
+    )
+
+
+async def login_loop(client, args, deadline, samples, errors):
+    data = {"username": args.username, "password": args.password}
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.post("/token", data=data)
+            if response.status_code == 200:
+                samples.append((time.perf_counter() - started) * 1000)
+            else:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+
+
+async def probe_loop(client, args, deadline, samples, errors):
+    interval = 1 / args.probe_rate
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.get(args.probe)
+            if response.status_code == 200:
+                samples.append((time.perf_counter() - started) * 1000)
+            else:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        await asyncio.sleep(max(0, interval - (time.perf_counter() - started)))
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.logins + 10)
+    async with httpx.AsyncClient(base_url=args.url, timeout=60, limits=limits) as client:
+        deadline = time.monotonic() + args.duration
+        login_samples, login_errors = [], []
+        probe_samples, probe_errors = [], []
+        await asyncio.gather(
+            probe_loop(client, args, deadline, probe_samples, probe_errors),
+            *[login_loop(client, args, deadline, login_samples, login_errors) for _ in range(args.logins)],
+        )
+
+    print(f"{args.logins} concurrent login clients for {args.duration}s against {args.url}")
+    report("login", login_samples, len(login_errors))
+    report("probe", probe_samples, len(probe_errors))
+    shed = sum(1 for e in login_errors if e == 503)
+    if shed:
+        print(f"{shed} logins shed with 503 (PASSWORD_HASH_QUEUE reached)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--username", default="testadmin")
+    parser.add_argument("--password", default="test123")
+    parser.add_argument("--logins", type=int, default=50, help="concurrent login clients")
+    parser.add_argument("--duration", type=float, default=20, help="seconds")
+    parser.add_argument("--probe", default="/health", help="unrelated endpoint to time")
+    parser.add_argument("--probe-rate", type=float, default=20, help="probe requests per second")
+    asyncio.run(main(parser.parse_args()))
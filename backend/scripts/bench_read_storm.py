@@ -0,0 +1,71 @@
+"""
+Measure how heavy reads affect unrelated requests.
+
+Runs `--readers` concurrent clients fetching `--read` (a full page of tasks by
+default) while one client probes a cheap endpoint at
+a fixed rate, then prints latency percentiles for both. Run it against a
+single worker: reads whose row loading and serialization run on the event loop
+show up as probe latency, reads served from the threadpool do not. The probe
+must be an async handler (GET /users/me by default); a sync one such as
+/health measures queueing for the threadpool instead of the loop.
+
+    uvicorn backend.main:app --port 8000
+    python -m backend.scripts.bench_read_storm --url http://127.0.0.1:8000 \\
+        --username testadmin --password test123 --readers 20 --duration 20
+
+Compare the probe p99 with --readers 0 (baseline) to see the stall.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from .bench_login_storm import report
+
+
+async def read_loop(client, path, headers, deadline, samples, errors, interval=0.0):
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.get(path, headers=headers)
+            if response.status_code == 200:
+                samples.append((time.perf_counter() - started) * 1000)
+            else:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        await asyncio.sleep(max(0, interval - (time.perf_counter() - started)))
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.readers + 10)
+    async with httpx.AsyncClient(base_url=args.url, timeout=60, limits=limits) as client:
+        login = await client.post("/token", data={"username": args.username, "password": args.password})
+        login.raise_for_status()
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        deadline = time.monotonic() + args.duration
+        read_samples, read_errors = [], []
+        probe_samples, probe_errors = [], []
+        await asyncio.gather(
+            read_loop(client, args.probe, headers, deadline, probe_samples, probe_errors, 1 / args.probe_rate),
+            *[read_loop(client, args.read, headers, deadline, read_samples, read_errors) for _ in range(args.readers)],
+        )
+
+    print(f"{args.readers} concurrent readers of {args.read} for {args.duration}s against {args.url}")
+    report("read", read_samples, len(read_errors))
+    report("probe", probe_samples, len(probe_errors))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--username", default="testadmin")
+    parser.add_argument("--password", default="test123")
+    parser.add_argument("--readers", type=int, default=20, help="concurrent reading clients")
+    parser.add_argument("--read", default="/tasks/?limit=100", help="heavy endpoint to load")
+    parser.add_argument("--duration", type=float, default=20, help="seconds")
+    parser.add_argument("--probe", default="/users/me", help="unrelated async endpoint to time")
+    parser.add_argument("--probe-rate", type=float, default=20, help="probe requests per second")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,66 @@
+"""
+Pick PASSWORD_HASH_ROUNDS for this host.
+
+Times pbkdf2_sha256 at a few round counts, fits the (linear) cost per round
+and prints the rounds that make one verification take about --target-ms.
+Run it on the deployment host, under the same CPU limits as the workers:
+
+    python -m backend.scripts.calibrate_password_hash --target-ms 100
+
+then set PASSWORD_HASH_ROUNDS to the suggested value. Existing hashes are
+upgraded (or downgraded) on each user's next successful login.
+
+The printed throughput assumes PASSWORD_HASH_CONCURRENCY hashing threads per
+worker, each on its own core; logins beyond it queue (see auth._hash_pool).
+"""
+import argparse
+import os
+import statistics
+import time
+
+from passlib.hash import pbkdf2_sha256
+
+
+def time_hash(rounds, samples):
+    hasher = pbkdf2_sha256.using(rounds=rounds)
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        hasher.hash("calibration password")
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main(args):
+    probes = [10_000, 20_000, 40_000]
+    seconds = [time_hash(rounds, args.samples) for rounds in probes]
+    per_round = statistics.mean(s / r for s, r in zip(seconds, probes))
+
+    for rounds, s in zip(probes, seconds):
+        print(f"{rounds:>9} rounds: {s * 1000:7.1f}ms")
+    print(f"~{per_round * 1e6:.2f}us per round")
+
+    rounds = max(1000, int(args.target_ms / 1000 / per_round) // 1000 * 1000)
+    measured = time_hash(rounds, args.samples)
+    concurrency = args.concurrency
+    print()
+    print(f"PASSWORD_HASH_ROUNDS={rounds}")
+    print(f"  measured {measured * 1000:.1f}ms per verification (target {args.target_ms:g}ms)")
+    print(f"  ~{concurrency / measured:.0f} logins/s per worker with PASSWORD_HASH_CONCURRENCY={concurrency}")
+    print(f"  current default: {pbkdf2_sha256.default_rounds} rounds")
+    if rounds < args.min_rounds:
+        print(f"  warning: below {args.min_rounds} rounds; raise --target-ms unless latency is critical")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target-ms", type=float, default=100, help="latency budget for one verification")
+    parser.add_argument("--samples", type=int, default=5, help="timings per round count (median is used)")
+    parser.add_argument(
+        "--concurrency", type=int,
+        default=int(os.getenv("PASSWORD_HASH_CONCURRENCY", str(min(4, os.cpu_count() or 1)))),
+        help="hashing threads per worker, for the throughput estimate",
+    )
+    parser.add_argument("--min-rounds", type=int, default=pbkdf2_sha256.default_rounds,
+                        help="warn when the suggestion is below this")
+    main(parser.parse_args())
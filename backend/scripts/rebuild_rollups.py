@@ -0,0 +1,44 @@
+"""
+Rebuild or verify the analytics rollups.
+
+Usage:
+    python -m backend.scripts.rebuild_rollups          # rebuild from source tables
+    python -m backend.scripts.rebuild_rollups --check  # report drift, exit 1 if any
+"""
+import sys
+from backend.database import SessionLocal
+from backend import models, rollups
+
+def rebuild_rollups():
+    db = SessionLocal()
+    try:
+        rollups.rebuild(db)
+        db.commit()
+        tasks = db.query(models.TaskRollupState).count()
+        rows = db.query(models.TaskRollup).count() + db.query(models.TaskDailyCount).count()
+        print(f"Analytics rollups rebuilt: {tasks} tasks, {rows} rollup rows.")
+    finally:
+        db.close()
+
+def check_rollups():
+    db = SessionLocal()
+    try:
+        drift = rollups.check(db)
+    finally:
+        db.close()
+
+    if not drift:
+        print("Analytics rollups are consistent.")
+        return True
+
+    print(f"Analytics rollup drift: {len(drift)} counts differ from the task rows.")
+    for key in sorted(drift, key=str)[:20]:
+        expected, actual = drift[key]
+        print(f"  {' '.join(str(part) for part in key)}: expected {expected}, found {actual}")
+    print("Run without --check to rebuild.")
+    return False
+
+if __name__ == "__main__":
+    if "--check" in sys.argv:
+        sys.exit(0 if check_rollups() else 1)
+    rebuild_rollups()
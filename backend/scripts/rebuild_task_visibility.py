@@ -0,0 +1,44 @@
+"""
+Rebuild or verify the task_visibility index.
+
+Usage:
+    python -m backend.scripts.rebuild_task_visibility          # rebuild from source tables
+    python -m backend.scripts.rebuild_task_visibility --check  # report drift, exit 1 if any
+"""
+import sys
+from backend.database import SessionLocal
+from backend import visibility
+
+def rebuild_task_visibility():
+    db = SessionLocal()
+    try:
+        visibility.rebuild(db)
+        db.commit()
+        count = db.query(visibility.TV).count()
+        print(f"Task visibility index rebuilt: {count} rows.")
+    finally:
+        db.close()
+
+def check_task_visibility():
+    db = SessionLocal()
+    try:
+        missing, unexpected = visibility.check(db)
+    finally:
+        db.close()
+
+    if not missing and not unexpected:
+        print("Task visibility index is consistent.")
+        return True
+
+    print(f"Task visibility index drift: {len(missing)} missing, {len(unexpected)} unexpected rows.")
+    for row in sorted(missing, key=str)[:20]:
+        print(f"  missing    task={row[0]} user={row[1]} relation={row[2]} team={row[3]}")
+    for row in sorted(unexpected, key=str)[:20]:
+        print(f"  unexpected task={row[0]} user={row[1]} relation={row[2]} team={row[3]}")
+    print("Run without --check to rebuild.")
+    return False
+
+if __name__ == "__main__":
+    if "--check" in sys.argv:
+        sys.exit(0 if check_task_visibility() else 1)
+    rebuild_task_visibility()
@@ -0,0 +1,36 @@
+"""
+Recount member achievement counters from the task rows and repair drift.
+
+The app already does this every ACHIEVEMENT_RECONCILE_INTERVAL seconds; run it
+by hand after editing tasks directly in the database. With --history it also
+replays task history (completions and BLOCKED entries, in one ordered pass) to
+recompute on-time rates and no-blocker streaks.
+
+Usage:
+    python -m backend.scripts.reconcile_achievements [--history]
+"""
+import argparse
+
+from backend.database import SessionLocal
+from backend import achievements
+
+def reconcile_achievements(history=False):
+    db = SessionLocal()
+    try:
+        corrected = achievements.reconcile(db)
+        replayed = achievements.replay_history(db) if history else 0
+        db.commit()
+    finally:
+        db.close()
+
+    if corrected:
+        print(f"Achievement counters corrected for {corrected} member(s).")
+    else:
+        print("Achievement counters are consistent.")
+    if history:
+        print(f"Streaks and on-time rates replayed for {replayed} member(s).")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", action="store_true", help="also replay history for streaks and on-time rates")
+    reconcile_achievements(parser.parse_args().history)
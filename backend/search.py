@@ -0,0 +1,132 @@
+"""
+Full-text task search.
+
+Each task is indexed as a document made of its title, description and the
+bodies of its comments:
+    - SQLite: an FTS5 virtual table `task_search` keyed by the task id (rowid)
+    - PostgreSQL: a weighted `tasks.search_vector` tsvector column with a GIN index
+
+Write paths call index_tasks() after changing a task's title/description or
+its comments, and forget_task() before deleting a task.
+"""
+
+import re
+from typing import Iterable
+
+from fastapi import HTTPException
+from sqlalchemy import DDL, Float, Integer, bindparam, event, text
+from sqlalchemy.orm import Session
+
+from .database import Base
+
+SQLITE_CREATE = DDL(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS task_search "
+    "USING fts5(title, description, comments, tokenize='porter unicode61')"
+)
+SQLITE_DROP = DDL("DROP TABLE IF EXISTS task_search")
+POSTGRES_CREATE = [
+    DDL("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector"),
+    DDL("CREATE INDEX IF NOT EXISTS ix_tasks_search_vector ON tasks USING GIN (search_vector)"),
+]
+
+# Created alongside the ORM tables by metadata.create_all (idempotent)
+event.listen(Base.metadata, "after_create", SQLITE_CREATE.execute_if(dialect="sqlite"))
+event.listen(Base.metadata, "before_drop", SQLITE_DROP.execute_if(dialect="sqlite"))
+for _ddl in POSTGRES_CREATE:
+    event.listen(Base.metadata, "after_create", _ddl.execute_if(dialect="postgresql"))
+
+_COMMENTS_SQLITE = "(SELECT group_concat(content, ' ') FROM comments WHERE comments.task_id = tasks.id)"
+_COMMENTS_POSTGRES = "(SELECT string_agg(content, ' ') FROM comments WHERE comments.task_id = tasks.id)"
+
+_SQLITE_INSERT = (
+    "INSERT INTO task_search (rowid, title, description, comments) "
+    f"SELECT id, coalesce(title, ''), coalesce(description, ''), coalesce({_COMMENTS_SQLITE}, '') FROM tasks"
+)
+_POSTGRES_UPDATE = (
+    "UPDATE tasks SET search_vector = "
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B') || "
+    f"setweight(to_tsvector('english', coalesce({_COMMENTS_POSTGRES}, '')), 'C')"
+)
+
+
+def _dialect(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def index_tasks(db: Session, task_ids: Iterable[int]):
+    """Re-index the given tasks from their current rows (flushes pending changes first)."""
+    task_ids = list(task_ids)
+    if not task_ids:
+        return
+    db.flush()
+    ids = bindparam("ids", value=task_ids, expanding=True)
+    dialect = _dialect(db)
+    if dialect == "sqlite":
+        db.execute(text("DELETE FROM task_search WHERE rowid IN :ids").bindparams(ids))
+        db.execute(text(f"{_SQLITE_INSERT} WHERE id IN :ids").bindparams(ids))
+    elif dialect == "postgresql":
+        db.execute(text(f"{_POSTGRES_UPDATE} WHERE id IN :ids").bindparams(ids))
+
+
+def forget_task(db: Session, task_id: int):
+    if _dialect(db) == "sqlite":
+        db.execute(text("DELETE FROM task_search WHERE rowid = :id"), {"id": task_id})
+    # On PostgreSQL the vector is stored on the task row itself
+
+
+def rebuild(db: Session):
+    """Re-index every task. Caller commits."""
+    dialect = _dialect(db)
+    if dialect == "sqlite":
+        db.execute(text("DELETE FROM task_search"))
+        db.execute(text(_SQLITE_INSERT))
+    elif dialect == "postgresql":
+        db.execute(text(_POSTGRES_UPDATE))
+
+
+def is_empty(db: Session) -> bool:
+    dialect = _dialect(db)
+    if dialect == "sqlite":
+        return db.execute(text("SELECT 1 FROM task_search LIMIT 1")).first() is None
+    if dialect == "postgresql":
+        return db.execute(text("SELECT 1 FROM tasks WHERE search_vector IS NOT NULL LIMIT 1")).first() is None
+    return False
+
+
+def _fts5_query(q: str) -> str:
+    """Turn free text into an FTS5 query: all terms required, last term prefix-matched."""
+    terms = re.findall(r"\w+", q)
+    if not terms:
+        return ""
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def matches(db: Session, q: str):
+    """
+    Subquery of (task_id, rank) for tasks matching `q`; lower rank is a better match.
+
+    Returns None when `q` contains no searchable terms.
+    """
+    dialect = _dialect(db)
+    if dialect == "sqlite":
+        fts_query = _fts5_query(q)
+        if not fts_query:
+            return None
+        # bm25 weights: title, description, comments
+        stmt = text(
+            "SELECT rowid AS task_id, bm25(task_search, 10.0, 4.0, 1.0) AS rank "
+            "FROM task_search WHERE task_search MATCH :q"
+        ).bindparams(q=fts_query)
+    elif dialect == "postgresql":
+        if not re.search(r"\w", q):
+            return None
+        stmt = text(
+            "SELECT id AS task_id, -ts_rank(search_vector, plainto_tsquery('english', :q)) AS rank "
+            "FROM tasks WHERE search_vector @@ plainto_tsquery('english', :q)"
+        ).bindparams(q=q)
+    else:
+        raise HTTPException(status_code=501, detail=f"Search is not supported on {dialect}")
+    return stmt.columns(task_id=Integer, rank=Float).subquery("task_matches")
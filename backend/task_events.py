@@ -0,0 +1,81 @@
+"""
+Bookkeeping shared by every task write path.
+
+Routers call these helpers in the same transaction as the write itself, before
+committing, so derived state never disagrees with the task rows:
+    - tasks.version / updated_at, used for ETags
+    - task_changes, the sequence behind GET /tasks/changes and GET /events/tasks,
+      with the audience of each tombstone (see visibility.former_audience)
+    - the analytics rollups (see rollups) and member achievement counters (see achievements)
+
+Each hook first takes database.TASK_WRITE_LOCK, held until commit, so task writes
+commit in task_changes.seq order. Without it a transaction could take seq N and
+commit after N+1 is visible; readers that had moved their cursor past N+1 (GET
+/tasks/changes, GET /events/tasks) would never see N.
+"""
+
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from . import achievements, database, models, rollups, visibility
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+# Set on the session when the log was written; events wakes subscribers after commit
+PENDING_KEY = "task_events_pending"
+
+
+def _lock(db: Session):
+    # Before any of the hook's own writes, so every writer takes its locks in the same order
+    database.advisory_xact_lock(db, database.TASK_WRITE_LOCK)
+
+
+def _record(db: Session, task_ids, op: str):
+    now = datetime.utcnow()
+    db.info[PENDING_KEY] = True
+    seqs = db.execute(
+        insert(models.TaskChange).returning(models.TaskChange.seq, sort_by_parameter_order=True),
+        [{"task_id": task_id, "op": op, "created_at": now} for task_id in task_ids],
+    ).scalars().all()
+    return seqs
+
+
+def task_created(db: Session, task_ids: Iterable[int]):
+    """Record newly inserted tasks (flushed, so they have ids)."""
+    task_ids = list(task_ids)
+    if task_ids:
+        _lock(db)
+        _record(db, task_ids, UPSERT)
+        rollups.sync_tasks(db, task_ids)
+        achievements.sync_tasks(db, task_ids)
+
+
+def task_changed(db: Session, task_ids: Iterable[int]):
+    """Record that the given tasks (or anything embedded in their responses) changed."""
+    task_ids = list(task_ids)
+    if not task_ids:
+        return
+    _lock(db)
+    db.execute(
+        update(models.Task)
+        .where(models.Task.id.in_(task_ids))
+        .values(version=models.Task.version + 1, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    _record(db, task_ids, UPSERT)
+    # After the UPDATE above, which locks the task rows until commit
+    rollups.sync_tasks(db, task_ids)
+    achievements.sync_tasks(db, task_ids)
+
+
+def task_deleted(db: Session, task_id: int):
+    """Write the tombstone for a task about to be deleted (before visibility.forget_task)."""
+    _lock(db)
+    seq, = _record(db, [task_id], DELETE)
+    visibility.snapshot(db, task_id, seq)
+    rollups.forget_task(db, task_id)
+    achievements.forget_task(db, task_id)
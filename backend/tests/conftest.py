@@ -1,21 +1,32 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 from fastapi.testclient import TestClient
+import atexit
+import os
+import shutil
+import tempfile
 import pytest
 from backend.main import app
-from backend.database import Base, get_db
+from backend.database import Base, get_db, get_async_db
 
-# Use in-memory SQLite for testing
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+# Temporary SQLite file: the sync and async engines must see the same database
+_db_dir = tempfile.mkdtemp(prefix="syncdeck-tests-")
+atexit.register(shutil.rmtree, _db_dir, ignore_errors=True)
+DB_PATH = os.path.join(_db_dir, "test.db")
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_PATH}"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# NullPool: the TestClient runs each test's app on its own event loop
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{DB_PATH}", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 def override_get_db():
     try:
         db = TestingSessionLocal()
@@ -23,14 +34,20 @@ def override_get_db():
     finally:
         db.close()
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
 
-from backend import models, auth
+from backend import models, auth, cache
 
 @pytest.fixture(scope="function")
 def client():
     # Create tables
     Base.metadata.create_all(bind=engine)
+    cache.clear_all()
     
     # Seed Admin User
     db = TestingSessionLocal()
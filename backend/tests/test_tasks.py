@@ -54,3 +54,1015 @@ def test_group_head_cannot_see_internal(client):
     # Should verify that "Internal Task" is NOT in the list
     for task in tasks:
         assert task["title"] != "Internal Task"
+
+def _create_tasks_with_relations(client, headers, count, assignee_id):
+    for i in range(count):
+        task = client.post(
+            "/tasks/",
+            json={"title": f"Batch Task {i}", "description": "Desc", "assigned_to": [assignee_id]},
+            headers=headers
+        ).json()
+        client.post(f"/tasks/{task['id']}/comments/", json={"content": "Looks good"}, headers=headers)
+        client.post(f"/tasks/{task['id']}/help-request", json={"reason": "Stuck"}, headers=headers)
+        client.post(
+            f"/tasks/{task['id']}/update",
+            json={"progress_percentage": 50, "status": "ongoing", "summary_text": "Halfway"},
+            headers=headers
+        )
+
+def _count_statements(client, url, headers, async_session=False):
+    from sqlalchemy import event
+    from .conftest import async_engine, engine
+
+    bind = async_engine.sync_engine if async_session else engine
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(bind, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get(url, headers=headers)
+    finally:
+        event.remove(bind, "before_cursor_execute", before_cursor_execute)
+    assert response.status_code == 200
+    return len(statements), response.json()
+
+def test_read_tasks_query_count_is_constant(client):
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    team = client.post("/teams/", json={"name": "Batch Team"}, headers=headers).json()
+    member = client.post(
+        "/users/",
+        json={"username": "batch_member", "password": "password", "role": "member", "team_id": team["id"]},
+        headers=headers
+    ).json()
+
+    _create_tasks_with_relations(client, headers, 2, member["id"])
+    small_count, small_page = _count_statements(client, "/tasks/", headers)
+    assert len(small_page) == 2
+
+    _create_tasks_with_relations(client, headers, 8, member["id"])
+    large_count, large_page = _count_statements(client, "/tasks/", headers)
+    assert len(large_page) == 10
+
+    assert small_count == large_count > 0
+    for task in large_page:
+        assert [u["id"] for u in task["assignees"]] == [member["id"]]
+        assert task["assigner"]["username"] == "admin"
+        assert len(task["comments"]) == 1
+        assert task["comments"][0]["author"]["username"] == "admin"
+        assert len(task["help_requests"]) == 1
+        assert len(task["updates"]) == 1
+        assert len(task["activities"]) == 3
+        assert task["is_new"] is False
+
+def test_users_me_uses_async_session(client):
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    # Served entirely through get_async_db: nothing runs on the sync engine
+    count, body = _count_statements(client, "/users/me", headers, async_session=True)
+    assert body["username"] == "admin"
+    assert count > 0
+    assert _count_statements(client, "/users/me", headers)[0] == 0
+
+def test_heavy_reads_run_off_the_event_loop(client):
+    import asyncio
+    import threading
+    import time
+    from sqlalchemy import event
+    from backend import database, models
+
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    task = client.post("/tasks/", json={"title": "Threadpool Read"}, headers=headers).json()
+    client.post(f"/tasks/{task['id']}/comments/", json={"content": "Loaded in a worker"}, headers=headers)
+    since = client.get("/tasks/changes", headers=headers).json()["next_cursor"]
+    client.put(f"/tasks/{task['id']}", json={"title": "Threadpool Read", "status": "blocked"}, headers=headers)
+
+    # Rows are hydrated in worker threads (database.run_read): AsyncSession.run_sync
+    # would run the same work on the event loop thread and stall every other request
+    loads = []
+    def on_load(target, context):
+        try:
+            loads.append(asyncio.get_running_loop() is not None)
+        except RuntimeError:
+            loads.append(False)
+
+    event.listen(models.Base, "load", on_load, propagate=True)
+    try:
+        for url in ["/tasks/", f"/tasks/{task['id']}", f"/tasks/{task['id']}/comments/",
+                    f"/tasks/{task['id']}/timeline", f"/tasks/changes?since={since}&view=full", "/dashboard"]:
+            assert client.get(url, headers=headers).status_code == 200, url
+    finally:
+        event.remove(models.Base, "load", on_load)
+    assert loads and not any(loads)
+
+    # ...and at most READ_CONCURRENCY of them at once
+    running, peak, lock = [0], [0], threading.Lock()
+    def read():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+
+    async def storm():
+        await asyncio.gather(*[database.run_read(read) for _ in range(database.READ_CONCURRENCY + 3)])
+    asyncio.run(storm())
+    assert peak[0] == database.READ_CONCURRENCY
+
+def test_task_and_timeline_cursor_pagination(client):
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    created_ids = [
+        client.post("/tasks/", json={"title": f"Paged Task {i}"}, headers=headers).json()["id"]
+        for i in range(5)
+    ]
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/tasks/", params=params, headers=headers)
+        assert response.status_code == 200
+        seen.extend(task["id"] for task in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == list(reversed(created_ids))
+
+    # Legacy skip/limit still works
+    response = client.get("/tasks/", params={"skip": 1, "limit": 2}, headers=headers)
+    assert [task["id"] for task in response.json()] == list(reversed(created_ids))[1:3]
+
+    task_id = created_ids[0]
+    for i in range(3):
+        client.post(f"/tasks/{task_id}/comments/", json={"content": f"Comment {i}"}, headers=headers)
+
+    first = client.get(f"/tasks/{task_id}/timeline", params={"limit": 2}, headers=headers)
+    assert len(first.json()) == 2
+    second = client.get(
+        f"/tasks/{task_id}/timeline",
+        params={"cursor": first.headers["X-Next-Cursor"]},
+        headers=headers
+    )
+    assert len(second.json()) == 1
+    assert "X-Next-Cursor" not in second.headers
+
+    # Without paging parameters every comment is returned
+    comments = client.get(f"/tasks/{task_id}/comments/", headers=headers).json()
+    assert [c["content"] for c in comments] == ["Comment 2", "Comment 1", "Comment 0"]
+
+    response = client.get("/tasks/", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert response.status_code == 400
+
+def test_read_tasks_summary_view(client):
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    team = client.post("/teams/", json={"name": "Summary Team"}, headers=headers).json()
+    member = client.post(
+        "/users/",
+        json={"username": "summary_member", "password": "password", "role": "member", "team_id": team["id"]},
+        headers=headers
+    ).json()
+    task = client.post(
+        "/tasks/",
+        json={"title": "Summary Task", "description": "Long text", "assigned_to": [member["id"]]},
+        headers=headers
+    ).json()
+    client.post(f"/tasks/{task['id']}/comments/", json={"content": "First"}, headers=headers)
+    client.post(f"/tasks/{task['id']}/comments/", json={"content": "Second"}, headers=headers)
+
+    response = client.get("/tasks/", params={"view": "summary"}, headers=headers)
+    assert response.status_code == 200
+    items = response.json()
+    assert len(items) == 1
+    item = items[0]
+    assert item["title"] == "Summary Task"
+    assert item["comment_count"] == 2
+    assert item["activity_count"] == 2
+    assert [a["username"] for a in item["assignees"]] == ["summary_member"]
+    for field in ("description", "comments", "activities", "help_requests", "updates"):
+        assert field not in item
+
+    # The assignee sees the task flagged as new
+    member_token = client.post("/token", data={"username": "summary_member", "password": "password"}).json()["access_token"]
+    member_items = client.get(
+        "/tasks/",
+        params={"view": "summary"},
+        headers={"Authorization": f"Bearer {member_token}"}
+    ).json()
+    assert [t["is_new"] for t in member_items] == [True]
+
+    assert client.get("/tasks/", params={"view": "bogus"}, headers=headers).status_code == 400
+
+def test_role_visibility_follows_team_changes(client):
+    from backend import visibility
+    from .conftest import TestingSessionLocal
+
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    alpha = client.post("/teams/", json={"name": "Alpha"}, headers=headers).json()
+    beta = client.post("/teams/", json={"name": "Beta"}, headers=headers).json()
+    client.post(
+        "/users/",
+        json={"username": "alpha_head", "password": "password", "role": "unit_head", "team_id": alpha["id"]},
+        headers=headers
+    )
+    member = client.post(
+        "/users/",
+        json={"username": "alpha_member", "password": "password", "role": "member", "team_id": alpha["id"]},
+        headers=headers
+    ).json()
+    other = client.post(
+        "/users/",
+        json={"username": "beta_member", "password": "password", "role": "member", "team_id": beta["id"]},
+        headers=headers
+    ).json()
+
+    client.post("/tasks/", json={"title": "Alpha Work", "assigned_to": [member["id"]]}, headers=headers)
+    client.post("/tasks/", json={"title": "Beta Work", "assigned_to": [other["id"]]}, headers=headers)
+
+    def titles(username):
+        login = client.post("/token", data={"username": username, "password": "password"}).json()
+        response = client.get("/tasks/", headers={"Authorization": f"Bearer {login['access_token']}"})
+        return sorted(task["title"] for task in response.json())
+
+    assert titles("alpha_member") == ["Alpha Work"]
+    assert titles("alpha_head") == ["Alpha Work"]
+    assert titles("admin") == ["Alpha Work", "Beta Work"]
+
+    # Moving the Beta member into Alpha brings their task into the Alpha Unit Head's scope
+    client.put(f"/users/{other['id']}", json={"team_id": alpha["id"]}, headers=headers)
+    assert titles("alpha_head") == ["Alpha Work", "Beta Work"]
+
+    db = TestingSessionLocal()
+    try:
+        assert visibility.check(db) == (set(), set())
+    finally:
+        db.close()
+
+def test_read_tasks_filters_and_sort(client):
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    specs = [
+        ("Overdue High", "high", "ongoing", "2020-01-01T00:00:00"),
+        ("Future High", "high", "ongoing", "2099-01-01T00:00:00"),
+        ("Past Low Done", "low", "completed", "2020-06-01T00:00:00"),
+        ("No Deadline", "medium", "blocked", None),
+    ]
+    for title, criticality, task_status, deadline in specs:
+        client.post(
+            "/tasks/",
+            json={"title": title, "criticality": criticality, "status": task_status, "deadline": deadline},
+            headers=headers
+        )
+
+    def titles(**params):
+        response = client.get("/tasks/", params=params, headers=headers)
+        assert response.status_code == 200
+        return [task["title"] for task in response.json()]
+
+    assert sorted(titles(criticality="high")) == ["Future High", "Overdue High"]
+    assert sorted(titles(status=["completed", "blocked"])) == ["No Deadline", "Past Low Done"]
+    assert titles(overdue=True) == ["Overdue High"]
+    assert sorted(titles(overdue=False)) == ["Future High", "No Deadline", "Past Low Done"]
+    assert titles(deadline_from="2030-01-01T00:00:00") == ["Future High"]
+    assert titles(assigner_id=1, criticality="low") == ["Past Low Done"]
+
+    # Nulls sort last ascending, and the cursor walks the same order
+    expected = ["Overdue High", "Past Low Done", "Future High", "No Deadline"]
+    assert titles(sort="deadline") == expected
+    seen, cursor = [], None
+    while True:
+        params = {"sort": "deadline", "limit": 1, "view": "summary"}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/tasks/", params=params, headers=headers)
+        seen.extend(task["title"] for task in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == expected
+
+    assert client.get("/tasks/", params={"sort": "password"}, headers=headers).status_code == 400
+
+def test_search_tasks_ranked_and_visibility_scoped(client):
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    team = client.post("/teams/", json={"name": "Search Team"}, headers=headers).json()
+    member = client.post(
+        "/users/",
+        json={"username": "search_member", "password": "password", "role": "member", "team_id": team["id"]},
+        headers=headers
+    ).json()
+
+    in_title = client.post(
+        "/tasks/",
+        json={"title": "Database migration", "description": "Move tables", "assigned_to": [member["id"]]},
+        headers=headers
+    ).json()
+    in_comment = client.post("/tasks/", json={"title": "Quarterly report", "description": "Numbers"}, headers=headers).json()
+    client.post("/tasks/", json={"title": "Unrelated", "description": "Nothing here"}, headers=headers)
+    client.post(f"/tasks/{in_comment['id']}/comments/", json={"content": "Blocked on the database migration"}, headers=headers)
+
+    response = client.get("/tasks/search", params={"q": "migration"}, headers=headers)
+    assert response.status_code == 200
+    assert [t["id"] for t in response.json()] == [in_title["id"], in_comment["id"]]
+
+    # Prefix match on the last term, edits re-index the task
+    client.put(f"/tasks/{in_comment['id']}", json={"title": "Quarterly forecasting"}, headers=headers)
+    assert [t["id"] for t in client.get("/tasks/search", params={"q": "forecast"}, headers=headers).json()] == [in_comment["id"]]
+    assert client.get("/tasks/search", params={"q": "quarterly report"}, headers=headers).json() == []
+
+    member_token = client.post("/token", data={"username": "search_member", "password": "password"}).json()["access_token"]
+    member_hits = client.get(
+        "/tasks/search",
+        params={"q": "migration"},
+        headers={"Authorization": f"Bearer {member_token}"}
+    ).json()
+    assert [t["id"] for t in member_hits] == [in_title["id"]]
+
+    client.delete(f"/tasks/{in_title['id']}", headers=headers)
+    assert [t["id"] for t in client.get("/tasks/search", params={"q": "migration"}, headers=headers).json()] == [in_comment["id"]]
+    assert client.get("/tasks/search", params={"q": "!!"}, headers=headers).json() == []
+
+def test_conditional_get_with_etags(client):
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    task = client.post("/tasks/", json={"title": "Cached Task"}, headers=headers).json()
+
+    first = client.get(f"/tasks/{task['id']}", headers=headers)
+    etag = first.headers["ETag"]
+    cached = client.get(f"/tasks/{task['id']}", headers={**headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    listing = client.get("/tasks/", headers=headers)
+    list_etag = listing.headers["ETag"]
+    assert client.get("/tasks/", headers={**headers, "If-None-Match": list_etag}).status_code == 304
+
+    # A comment changes the embedded arrays, so both ETags move
+    client.post(f"/tasks/{task['id']}/comments/", json={"content": "New info"}, headers=headers)
+    refreshed = client.get(f"/tasks/{task['id']}", headers={**headers, "If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert len(refreshed.json()["comments"]) == 1
+    assert client.get("/tasks/", headers={**headers, "If-None-Match": list_etag}).status_code == 200
+
+    users_etag = client.get("/users/", headers=headers).headers["ETag"]
+    assert client.get("/users/", headers={**headers, "If-None-Match": users_etag}).status_code == 304
+    client.post("/users/", json={"username": "etag_member", "password": "password", "role": "member"}, headers=headers)
+    assert client.get("/users/", headers={**headers, "If-None-Match": users_etag}).status_code == 200
+
+    teams_etag = client.get("/teams/", headers=headers).headers["ETag"]
+    client.post("/teams/", json={"name": "ETag Team"}, headers=headers)
+    assert client.get("/teams/", headers={**headers, "If-None-Match": teams_etag}).status_code == 200
+
+def test_task_change_feed(client):
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    kept = client.post("/tasks/", json={"title": "Kept"}, headers=headers).json()
+    start = client.get("/tasks/changes", headers=headers).json()
+    assert start["tasks"] == [] and start["deleted"] == []
+
+    created = client.post("/tasks/", json={"title": "Created"}, headers=headers).json()
+    doomed = client.post("/tasks/", json={"title": "Doomed"}, headers=headers).json()
+    client.put(f"/tasks/{kept['id']}", json={"title": "Kept", "status": "blocked"}, headers=headers)
+    client.delete(f"/tasks/{doomed['id']}", headers=headers)
+
+    feed = client.get("/tasks/changes", params={"since": start["next_cursor"]}, headers=headers).json()
+    assert sorted(t["id"] for t in feed["tasks"]) == sorted([kept["id"], created["id"]])
+    assert {t["id"]: t["status"] for t in feed["tasks"]}[kept["id"]] == "blocked"
+    assert feed["deleted"] == [doomed["id"]]
+    assert feed["has_more"] is False
+
+    # Nothing new since the returned cursor
+    empty = client.get("/tasks/changes", params={"since": feed["next_cursor"]}, headers=headers).json()
+    assert empty["tasks"] == [] and empty["deleted"] == []
+    assert empty["next_cursor"] == feed["next_cursor"]
+
+    # Small pages report has_more
+    paged = client.get("/tasks/changes", params={"since": start["next_cursor"], "limit": 1}, headers=headers).json()
+    assert paged["has_more"] is True
+
+    full = client.get("/tasks/changes", params={"since": start["next_cursor"], "view": "full"}, headers=headers).json()
+    assert all("comments" in t for t in full["tasks"])
+
+def test_task_writes_hold_the_change_log_lock(client, monkeypatch):
+    from types import SimpleNamespace
+    from sqlalchemy.dialects import postgresql
+    from backend import database
+
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    # Every hook locks before it takes a seq, so writes commit in seq order
+    locked = []
+    original = database.advisory_xact_lock
+    monkeypatch.setattr(database, "advisory_xact_lock", lambda db, key: locked.append(key) or original(db, key))
+    task = client.post("/tasks/", json={"title": "Locked"}, headers=headers).json()
+    client.put(f"/tasks/{task['id']}", json={"title": "Locked", "status": "blocked"}, headers=headers)
+    client.delete(f"/tasks/{task['id']}", headers=headers)
+    assert locked == [database.TASK_WRITE_LOCK] * 3
+
+    # pg_advisory_xact_lock on PostgreSQL, nothing on SQLite
+    statements = []
+    def session(dialect):
+        bind = SimpleNamespace(dialect=SimpleNamespace(name=dialect))
+        return SimpleNamespace(get_bind=lambda: bind, execute=statements.append)
+    original(session("sqlite"), database.TASK_WRITE_LOCK)
+    assert statements == []
+    original(session("postgresql"), database.TASK_WRITE_LOCK)
+    assert "pg_advisory_xact_lock" in str(statements[0].compile(dialect=postgresql.dialect()))
+
+def test_task_event_stream_scoped_and_resumable(client):
+    import asyncio
+    from backend import events, models
+    from backend.pagination import encode_cursor
+    from .conftest import TestingSessionLocal
+
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    member = client.post(
+        "/users/",
+        json={"username": "event_member", "password": "password", "role": "member"},
+        headers=headers
+    ).json()
+    db = TestingSessionLocal()
+    try:
+        start = events.latest_id(db)
+    finally:
+        db.close()
+
+    mine = client.post("/tasks/", json={"title": "Mine", "assigned_to": [member["id"]]}, headers=headers).json()
+    gone = client.post("/tasks/", json={"title": "Gone", "assigned_to": [member["id"]]}, headers=headers).json()
+    other = client.post("/tasks/", json={"title": "Other"}, headers=headers).json()
+    client.post(f"/tasks/{mine['id']}/update", json={"progress_percentage": 50, "status": "blocked"}, headers=headers)
+    client.delete(f"/tasks/{gone['id']}", headers=headers)
+    client.put(f"/tasks/{other['id']}", json={"title": "Other", "status": "blocked"}, headers=headers)
+    client.delete(f"/tasks/{other['id']}", headers=headers)
+
+    db = TestingSessionLocal()
+    try:
+        member_user = db.query(models.User).filter(models.User.id == member["id"]).first()
+        feed, next_id = events.fetch(db, member_user, start)
+        # One event per task, latest change only, in log order; tasks the member
+        # never saw are not disclosed, not even as deletes
+        assert [(e["task_id"], e["op"]) for e in feed] == [(mine["id"], "upsert"), (gone["id"], "delete")]
+        assert feed[0]["version"] > 1
+        assert next_id == events.latest_id(db) > feed[-1]["id"]
+
+        # Resuming from an event id only returns what came after it
+        assert events.fetch(db, member_user, feed[0]["id"])[0] == feed[1:]
+        assert events.fetch(db, member_user, feed[-1]["id"]) == ([], next_id)
+        assert events.fetch(db, member_user, next_id) == ([], next_id)
+    finally:
+        db.close()
+
+    member_token = client.post("/token", data={"username": "event_member", "password": "password"}).json()["access_token"]
+    changes = client.get("/tasks/changes", params={"since": encode_cursor([start])},
+                         headers={"Authorization": f"Bearer {member_token}"}).json()
+    assert [t["id"] for t in changes["tasks"]] == [mine["id"]]
+    assert changes["deleted"] == [gone["id"]]
+
+    # Commits that write to the change log wake waiting subscribers
+    async def wait_for_commit():
+        broker = events.Broker(TestingSessionLocal)
+        events.set_broker(broker)
+        try:
+            broker.subscribe()
+            generation = broker.generation
+            assert await broker.wait(generation, 0.01) is False
+            await asyncio.get_running_loop().run_in_executor(
+                None,
+                lambda: client.post("/tasks/", json={"title": "Live"}, headers=headers)
+            )
+            assert await broker.wait(generation, 5) is True
+        finally:
+            broker.unsubscribe()
+            events.set_broker(None)
+
+    asyncio.run(wait_for_commit())
+
+    assert client.get("/events/tasks").status_code == 401
+    assert client.get("/events/tasks", params={"ticket": "bogus"}).status_code == 401
+    assert client.get("/events/tasks", headers={**headers, "Last-Event-ID": "x"}).status_code == 400
+
+def test_task_event_stream_tickets_and_reauthorization(client):
+    from backend import auth, events
+    from backend.routers import events as events_router
+    from .conftest import TestingSessionLocal
+
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    member = client.post(
+        "/users/",
+        json={"username": "ticket_member", "password": "password", "role": "member"},
+        headers=headers
+    ).json()
+    member_token = client.post("/token", data={"username": "ticket_member", "password": "password"}).json()["access_token"]
+    member_headers = {"Authorization": f"Bearer {member_token}"}
+
+    assert client.post("/events/tickets").status_code == 401
+    issued = client.post("/events/tickets", headers=member_headers).json()
+    ticket = issued["ticket"]
+    assert issued["expires_in"] == auth.STREAM_TICKET_EXPIRE_SECONDS
+    # Access tokens do not work as tickets, nor tickets as access tokens
+    assert client.get("/events/tasks", params={"ticket": member_token}).status_code == 401
+    assert client.get("/users/me", headers={"Authorization": f"Bearer {ticket}"}).status_code == 401
+    assert client.get("/events/tasks", params={"ticket": ticket}, headers={"Last-Event-ID": "x"}).status_code == 400
+
+    db = TestingSessionLocal()
+    try:
+        grant = auth.stream_grant(db, ticket=ticket)
+        assert grant.user_id == member["id"]
+        assert grant.expires_at == auth._decode_token(member_token)["exp"]
+    finally:
+        db.close()
+    broker = events.Broker(TestingSessionLocal)
+    assert events_router._fetch(broker, grant, 0) is not None
+
+    # Streams stop once the token behind them expires or the user's claims are revoked
+    expired = auth.StreamGrant(grant.user_id, grant.username, grant.token_version, 0)
+    assert events_router._fetch(broker, expired, 0) is None
+    client.put(f"/users/{member['id']}", json={"role": "unit_head"}, headers=headers)
+    assert events_router._fetch(broker, grant, 0) is None
+    assert client.get("/events/tasks", params={"ticket": ticket}).status_code == 401
+
+def test_bulk_create_and_update_tasks(client):
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    member = client.post(
+        "/users/",
+        json={"username": "bulk_member", "password": "password", "role": "member"},
+        headers=headers
+    ).json()
+
+    response = client.post("/tasks/bulk", json=[
+        {"title": "Plan Q1", "assigned_to": [member["id"], member["id"]]},
+        {"title": "Plan Q2", "criticality": "high", "assigned_to": [member["id"]]},
+        {"title": "Plan Q3"},
+    ], headers=headers)
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert all(r["ok"] for r in results)
+    ids = [r["id"] for r in results]
+
+    tasks = {t["id"]: t for t in client.get("/tasks/", headers=headers).json()}
+    assert [tasks[i]["title"] for i in ids] == ["Plan Q1", "Plan Q2", "Plan Q3"]
+    assert [u["id"] for u in tasks[ids[0]]["assignees"]] == [member["id"]]
+    assert tasks[ids[0]]["assignee_id"] == member["id"]
+    assert tasks[ids[2]]["assignees"] == []
+
+    # One invalid item rejects the whole batch
+    response = client.post("/tasks/bulk", json=[
+        {"title": "Fine"},
+        {"title": "Broken", "assigned_to": [9999]},
+    ], headers=headers)
+    assert response.status_code == 400
+    assert [r["ok"] for r in response.json()["detail"]] == [True, False]
+    assert len(client.get("/tasks/", headers=headers).json()) == 3
+
+    response = client.patch("/tasks/bulk", json=[
+        {"id": ids[0], "title": "Plan Q1", "status": "completed", "progress_percentage": 100},
+        {"id": ids[1], "title": "Plan Q2", "status": "completed"},
+    ], headers=headers)
+    assert response.status_code == 200
+    assert [r["id"] for r in response.json()["results"]] == ids[:2]
+
+    first = client.get(f"/tasks/{ids[0]}", headers=headers).json()
+    assert first["status"] == "completed" and first["completed_at"] is not None
+    assert sorted(a["activity_type"] for a in first["activities"]) == ["progress_update", "status_change"]
+
+    # Both completions count towards the same achievement row
+    stats = client.get(f"/users/{member['id']}/achievement-stats", headers=headers).json()
+    assert stats["total_completed_tasks"] == 2
+    assert stats["critical_tasks_completed"] == 1
+
+    response = client.patch("/tasks/bulk", json=[{"id": 9999, "title": "Missing"}], headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"][0]["error"] == "Task not found"
+
+def test_dashboard_bundle_cached_until_write(client):
+    from backend import rollups
+    from .conftest import TestingSessionLocal
+
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    team = client.post("/teams/", json={"name": "Dash Team"}, headers=headers).json()
+    client.post(
+        "/users/",
+        json={"username": "dash_head", "password": "password", "role": "unit_head", "team_id": team["id"]},
+        headers=headers
+    )
+    member = client.post(
+        "/users/",
+        json={"username": "dash_member", "password": "password", "role": "member", "team_id": team["id"]},
+        headers=headers
+    ).json()
+    client.post("/tasks/", json={"title": "Dash Task", "assigned_to": [member["id"]]}, headers=headers)
+
+    first = client.get("/dashboard", headers=headers)
+    assert first.status_code == 200
+    bundle = first.json()
+    assert bundle["user"]["username"] == "admin"
+    assert [t["title"] for t in bundle["tasks"]] == ["Dash Task"]
+    assert sorted(u["username"] for u in bundle["members"]) == ["dash_head", "dash_member"]
+    assert bundle["analytics"]["total_tasks"] == 1
+
+    etag = first.headers["ETag"]
+    assert client.get("/dashboard", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    # Any task write invalidates the bundle
+    client.post("/tasks/", json={"title": "Second Task"}, headers=headers)
+    refreshed = client.get("/dashboard", headers={**headers, "If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert [t["title"] for t in refreshed.json()["tasks"]] == ["Second Task", "Dash Task"]
+
+    # So does a repair job rebuilding the analytics the bundle embeds
+    etag = refreshed.headers["ETag"]
+    assert client.get("/dashboard", headers={**headers, "If-None-Match": etag}).status_code == 304
+    db = TestingSessionLocal()
+    try:
+        rollups.rebuild(db)
+        db.commit()
+    finally:
+        db.close()
+    rebuilt = client.get("/dashboard", headers={**headers, "If-None-Match": etag})
+    assert rebuilt.status_code == 200
+    assert rebuilt.json()["analytics"]["total_tasks"] == 2
+
+    login = client.post("/token", data={"username": "dash_head", "password": "password"}).json()
+    head_bundle = client.get("/dashboard", headers={"Authorization": f"Bearer {login['access_token']}"}).json()
+    assert [u["username"] for u in head_bundle["members"]] == ["dash_member"]
+    assert [t["title"] for t in head_bundle["tasks"]] == ["Dash Task"]
+    assert head_bundle["analytics"] is None
+
+def test_analytics_counts_every_assignee_team(client):
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    teams = [client.post("/teams/", json={"name": name}, headers=headers).json() for name in ["North", "South", "Empty"]]
+    def member(name, team):
+        return client.post(
+            "/users/",
+            json={"username": name, "password": "password", "role": "member", "team_id": team["id"]},
+            headers=headers
+        ).json()["id"]
+    north_a, north_b, south = member("north_a", teams[0]), member("north_b", teams[0]), member("south", teams[1])
+
+    both_north = client.post("/tasks/", json={"title": "Both North", "assigned_to": [north_a, north_b]}, headers=headers).json()
+    client.post("/tasks/", json={"title": "Cross Team", "assigned_to": [north_a, south]}, headers=headers)
+    client.post("/tasks/", json={"title": "Unassigned"}, headers=headers)
+    response = client.put(f"/tasks/{both_north['id']}", json={"title": "Both North", "status": "completed"}, headers=headers)
+    assert response.json()["status"] == "completed"
+
+    analytics = client.get("/analytics/", headers=headers).json()
+    assert (analytics["total_tasks"], analytics["completed_tasks"], analytics["pending_tasks"]) == (3, 1, 2)
+    assert analytics["team_data"] == [
+        {"name": "North", "tasks": 2, "completed": 1},
+        {"name": "South", "tasks": 1, "completed": 0},
+        {"name": "Empty", "tasks": 0, "completed": 0},
+    ]
+    assert sum(item["value"] for item in analytics["status_data"]) == 3
+
+def test_rollups_follow_task_and_team_writes(client):
+    from backend import models, rollups
+    from .conftest import TestingSessionLocal
+
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    red, blue = [client.post("/teams/", json={"name": name}, headers=headers).json() for name in ["Red", "Blue"]]
+    member = client.post(
+        "/users/",
+        json={"username": "rollup_member", "password": "password", "role": "member", "team_id": red["id"]},
+        headers=headers
+    ).json()
+
+    tasks = [
+        client.post("/tasks/", json={"title": f"Rollup {i}", "assigned_to": [member["id"]], "criticality": "high"}, headers=headers).json()
+        for i in range(3)
+    ]
+    client.post(f"/tasks/{tasks[0]['id']}/update", json={"progress_percentage": 100, "status": "pending_approval"}, headers=headers)
+    assert client.post(f"/tasks/{tasks[0]['id']}/approve", headers=headers).json()["status"] == "completed"
+    client.post(f"/tasks/{tasks[1]['id']}/update", json={"progress_percentage": 10, "status": "blocked"}, headers=headers)
+    client.delete(f"/tasks/{tasks[2]['id']}", headers=headers)
+    # Moving the assignee moves their tasks to the other team
+    client.put(f"/users/{member['id']}", json={"team_id": blue["id"]}, headers=headers)
+
+    team_data = client.get("/analytics/", headers=headers).json()["team_data"]
+    assert team_data == [
+        {"name": "Red", "tasks": 0, "completed": 0},
+        {"name": "Blue", "tasks": 2, "completed": 1},
+    ]
+
+    db = TestingSessionLocal()
+    try:
+        assert rollups.check(db) == {}
+        counts = dict(
+            ((row.dimension, row.key, row.status), row.count)
+            for row in db.query(models.TaskRollup).filter(models.TaskRollup.count != 0)
+        )
+        assert counts[(rollups.USER, str(member["id"]), "blocked")] == 1
+        assert counts[(rollups.CRITICALITY, "high", "completed")] == 1
+        daily = db.query(models.TaskDailyCount).filter(models.TaskDailyCount.dimension == rollups.ALL).one()
+        assert (daily.created, daily.completed) == (2, 1)
+
+        # Drift is reported, and a rebuild fixes it
+        db.query(models.TaskRollup).filter(models.TaskRollup.dimension == rollups.ALL).delete()
+        assert rollups.check(db)
+        rollups.rebuild(db)
+        assert rollups.check(db) == {}
+    finally:
+        db.rollback()
+        db.close()
+
+def test_achievement_counters_follow_task_transitions(client, monkeypatch):
+    from backend import achievements, database, models
+    from .conftest import TestingSessionLocal
+
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    member = client.post("/users/", json={"username": "achiever", "password": "password", "role": "member"}, headers=headers).json()
+    stats_url = f"/users/{member['id']}/achievement-stats"
+
+    def counts():
+        stats = client.get(stats_url, headers=headers).json()
+        return stats["total_completed_tasks"], stats["critical_tasks_completed"]
+
+    # Read-only for members without counters yet
+    assert counts() == (0, 0)
+    db = TestingSessionLocal()
+    assert db.query(models.MemberAchievement).count() == 0
+
+    high, low = [
+        client.post("/tasks/", json={"title": title, "assigned_to": [member["id"]], "criticality": criticality}, headers=headers).json()
+        for title, criticality in [("High", "high"), ("Low", "low")]
+    ]
+    completed = {"title": "High", "status": "completed"}
+    client.put(f"/tasks/{high['id']}", json=completed, headers=headers)
+    # Repeating a transition does not count twice
+    client.put(f"/tasks/{high['id']}", json=completed, headers=headers)
+    client.put(f"/tasks/{low['id']}", json={"title": "Low", "status": "completed"}, headers=headers)
+    assert counts() == (2, 1)
+
+    client.put(f"/tasks/{low['id']}", json={"title": "Low", "status": "ongoing"}, headers=headers)
+    assert counts() == (1, 1)
+    client.delete(f"/tasks/{high['id']}", headers=headers)
+    assert counts() == (0, 0)
+
+    # Counters changed behind the API's back are repaired by the reconcile job
+    client.put(f"/tasks/{low['id']}", json={"title": "Low", "status": "completed"}, headers=headers)
+    db.query(models.MemberAchievement).update({"total_completed_tasks": 7})
+    db.commit()
+    # A repair holds the lock task writes take, so no completion slips in between recount and rewrite
+    locked = []
+    original = database.advisory_xact_lock
+    monkeypatch.setattr(database, "advisory_xact_lock", lambda db, key: locked.append(key) or original(db, key))
+    assert achievements.reconcile(db) == 1
+    assert locked == [database.TASK_WRITE_LOCK]
+    db.commit()
+    assert achievements.reconcile(db) == 0
+    assert locked == [database.TASK_WRITE_LOCK]
+    db.close()
+    assert counts() == (1, 0)
+
+
+def test_on_time_rate_and_blocker_streak(client):
+    from backend import achievements, models
+    from .conftest import TestingSessionLocal
+
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    member = client.post("/users/", json={"username": "streaker", "password": "password", "role": "member"}, headers=headers).json()
+    stats_url = f"/users/{member['id']}/achievement-stats"
+
+    def stats():
+        body = client.get(stats_url, headers=headers).json()
+        return body["on_time_completion_rate"], body["current_no_blocker_streak"]
+
+    early, late, open_ended = [
+        client.post("/tasks/", json={"title": title, "assigned_to": [member["id"]], "deadline": deadline}, headers=headers).json()
+        for title, deadline in [("Early", "2999-01-01T00:00:00"), ("Late", "2000-01-01T00:00:00"), ("Open", None)]
+    ]
+    client.put(f"/tasks/{early['id']}", json={"title": "Early", "status": "completed"}, headers=headers)
+    client.put(f"/tasks/{late['id']}", json={"title": "Late", "status": "completed"}, headers=headers)
+    assert stats() == (50, 2)
+
+    # Entering BLOCKED resets the streak; tasks without a deadline do not move the rate
+    client.put(f"/tasks/{open_ended['id']}", json={"title": "Open", "status": "blocked"}, headers=headers)
+    assert stats() == (50, 0)
+    client.put(f"/tasks/{open_ended['id']}", json={"title": "Open", "status": "completed"}, headers=headers)
+    assert stats() == (50, 1)
+
+    # Replaying history from scratch arrives at the same values
+    db = TestingSessionLocal()
+    db.query(models.MemberAchievement).update({"current_no_blocker_streak": 9, "on_time_completion_rate": 0})
+    db.commit()
+    achievements.replay_history(db)
+    db.commit()
+    db.close()
+    assert stats() == (50, 1)
+
+
+def test_flow_analytics_from_status_history(client, monkeypatch):
+    import asyncio
+    from datetime import datetime, timedelta
+    from backend import flow as flow_module, models
+    from .conftest import TestingSessionLocal
+
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    team = client.post("/teams/", json={"name": "Flow"}, headers=headers).json()
+    member = client.post(
+        "/users/",
+        json={"username": "flow_member", "password": "password", "role": "member", "team_id": team["id"]},
+        headers=headers
+    ).json()
+    task = client.post("/tasks/", json={"title": "Flow", "assigned_to": [member["id"]]}, headers=headers).json()
+    client.post("/tasks/", json={"title": "Still open", "assigned_to": [member["id"]]}, headers=headers)
+
+    # ONGOING 2h -> BLOCKED 3h -> ONGOING 1h -> PENDING_APPROVAL 4h -> COMPLETED
+    start = datetime(2026, 1, 5, 9, 0)
+    at = lambda hours: start + timedelta(hours=hours)
+    db = TestingSessionLocal()
+    db.query(models.Task).filter(models.Task.id == task["id"]).update({
+        "created_at": start, "status": models.TaskStatus.COMPLETED, "completed_at": at(10),
+    })
+    db.add(models.TaskUpdate(task_id=task["id"], user_id=member["id"], progress_percentage=20, status="blocked", created_at=at(2)))
+    for hours, description in [(5, "Status changed to Ongoing"), (6, "Status changed to Pending Approval"),
+                               (10, "Task approved and marked as completed by admin"), (11, "Task deleted by admin")]:
+        db.add(models.TaskActivity(task_id=task["id"], user_id=member["id"], created_at=at(hours),
+                                   activity_type=models.ActivityType.STATUS_CHANGE, description=description))
+    db.commit()
+    db.close()
+
+    # The pass over every task and event runs in the threadpool, not on the event loop
+    on_loop = []
+    collect = flow_module.collect
+    def collect_off_loop(*args):
+        try:
+            on_loop.append(asyncio.get_running_loop() is not None)
+        except RuntimeError:
+            on_loop.append(False)
+        return collect(*args)
+    monkeypatch.setattr(flow_module, "collect", collect_off_loop)
+
+    flow = client.get("/analytics/flow", headers=headers).json()
+    assert on_loop == [False]
+    assert flow["all"]["ongoing"] == {"count": 2, "median": 1.5, "p90": 1.9, "p99": 1.99}
+    assert flow["all"]["blocked"]["median"] == 3
+    assert flow["all"]["pending_approval"]["median"] == 4
+    assert flow["all"]["lead_time"]["count"] == 1
+    assert "needs_review" not in flow["all"]
+    assert flow["team_data"] == [{"team_id": team["id"], "name": "Flow", "metrics": flow["all"]}]
+    assert flow["user_data"][0]["username"] == "flow_member"
+
+    assert client.get("/analytics/flow", params={"since": "2026-01-05T16:00:00"}, headers=headers).json()["all"] == {
+        "pending_approval": {"count": 1, "median": 4.0, "p90": 4.0, "p99": 4.0},
+        "lead_time": {"count": 1, "median": 10.0, "p90": 10.0, "p99": 10.0},
+    }
+
+
+def test_analytics_timeseries_fills_gaps_and_tracks_backlog(client):
+    from datetime import datetime
+    from backend import models, rollups
+    from .conftest import TestingSessionLocal
+
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    team = client.post("/teams/", json={"name": "Series"}, headers=headers).json()
+    member = client.post(
+        "/users/",
+        json={"username": "series_member", "password": "password", "role": "member", "team_id": team["id"]},
+        headers=headers
+    ).json()
+    ids = [
+        client.post("/tasks/", json={"title": f"Task {i}", "assigned_to": [member["id"]]}, headers=headers).json()["id"]
+        for i in range(3)
+    ]
+
+    # Created in weeks 1, 1 and 3 of March; the first one completed in week 2
+    db = TestingSessionLocal()
+    for task_id, created in zip(ids, [datetime(2026, 3, 2), datetime(2026, 3, 4), datetime(2026, 3, 18)]):
+        db.query(models.Task).filter(models.Task.id == task_id).update({"created_at": created})
+    db.query(models.Task).filter(models.Task.id == ids[0]).update({
+        "status": models.TaskStatus.COMPLETED, "completed_at": datetime(2026, 3, 10),
+    })
+    rollups.sync_tasks(db, ids)
+    db.commit()
+    db.close()
+
+    params = {"interval": "week", "start": "2026-03-04", "end": "2026-03-22"}
+    body = client.get("/analytics/timeseries", params=params, headers=headers).json()
+    assert body["start"] == "2026-03-02"
+    overall, series_team = body["series"]
+    assert overall["team_id"] is None and series_team["name"] == "Series"
+    expected = [
+        {"bucket": "2026-03-02", "created": 2, "completed": 0, "backlog": 2},
+        {"bucket": "2026-03-09", "created": 0, "completed": 1, "backlog": 1},
+        {"bucket": "2026-03-16", "created": 1, "completed": 0, "backlog": 2},
+    ]
+    assert overall["points"] == expected
+    assert series_team["points"] == expected
+
+    # Backlog carries over from before the range
+    params = {"interval": "month", "start": "2026-04-01", "end": "2026-05-31", "team_id": team["id"]}
+    (series_only,) = client.get("/analytics/timeseries", params=params, headers=headers).json()["series"]
+    assert [(point["bucket"], point["backlog"]) for point in series_only["points"]] == [("2026-04-01", 2), ("2026-05-01", 2)]
+
+    assert client.get("/analytics/timeseries", params={"interval": "hour"}, headers=headers).status_code == 400
+
+
+def test_analytics_cache_follows_task_writes(client):
+    from backend import models
+    from .conftest import TestingSessionLocal
+
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    client.post("/tasks/", json={"title": "Counted"}, headers=headers)
+    assert client.get("/analytics/", headers=headers).json()["total_tasks"] == 1
+
+    # Served from the cache until the generation moves: a change made behind the API is not seen...
+    db = TestingSessionLocal()
+    db.query(models.TaskRollup).filter(models.TaskRollup.dimension == "all").update({"count": 42})
+    db.commit()
+    db.close()
+    assert client.get("/analytics/", headers=headers).json()["total_tasks"] == 1
+
+    # ...while any task write invalidates it
+    client.post("/tasks/", json={"title": "Another"}, headers=headers)
+    assert client.get("/analytics/", headers=headers).json()["total_tasks"] == 43
+
+
+def test_generation_cache_single_flight():
+    import asyncio
+    from backend.cache import GenerationCache
+
+    cache = GenerationCache("test", maxsize=8, ttl=60)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise ValueError("boom")
+
+    async def scenario():
+        # Concurrent misses share one computation
+        assert await asyncio.gather(*[cache.get_or_compute("k", 1, compute) for _ in range(5)]) == [1] * 5
+        assert await cache.get_or_compute("k", 1, compute) == 1
+        # A new generation recomputes
+        assert await cache.get_or_compute("k", 2, compute) == 2
+        # Failures reach every waiter and are not cached
+        results = await asyncio.gather(*[cache.get_or_compute("f", 1, failing) for _ in range(3)], return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert len(calls) == 3
+
+    asyncio.run(scenario())
+
+
+def test_export_achievements_streams_csv(client, monkeypatch):
+    from backend import export_utils
+
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    me = client.get("/users/me", headers=headers).json()
+    for i in range(5):
+        task = client.post("/tasks/", json={"title": f"Done {i}", "description": "x" * 120, "assigned_to": [me["id"]], "criticality": "high"}, headers=headers).json()
+        client.put(f"/tasks/{task['id']}", json={"title": f"Done {i}", "status": "completed"}, headers=headers)
+    client.post("/tasks/", json={"title": "Open", "assigned_to": [me["id"]]}, headers=headers)
+
+    # Several chunks of two rows each
+    monkeypatch.setattr(export_utils, "CSV_CHUNK_ROWS", 2)
+    response = client.get(f"/achievements/{me['id']}/export", params={"format": "csv"}, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.splitlines()
+    assert lines[0] == "Task Name,Completion Date,Criticality,Assigned By,Description"
+    assert len(lines) == 6
+    title, _, criticality, assigner, description = lines[1].split(",")
+    assert (criticality, assigner, len(description)) == ("HIGH", "admin", 100)
+    assert sorted(line.split(",")[0] for line in lines[1:]) == [f"Done {i}" for i in range(5)]
+
+    assert client.get(f"/achievements/{me['id']}/export", params={"format": "xls"}, headers=headers).status_code == 400
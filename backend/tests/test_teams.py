@@ -57,3 +57,34 @@ def test_assign_team_and_limit(client):
     )
     assert response.status_code == 400
     assert "maximum" in response.json()["detail"]
+
+def test_delete_team_invalidates_user_etags(client):
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    team_id = test_create_team(client)
+    client.post("/users/", json={"username": "m1", "password": "password", "role": "member", "team_id": team_id}, headers=headers)
+
+    users_etag = client.get("/users/", headers=headers).headers["ETag"]
+    assert client.delete(f"/teams/{team_id}", headers=headers).status_code == 200
+
+    response = client.get("/users/", headers={**headers, "If-None-Match": users_etag})
+    assert response.status_code == 200
+    assert next(user for user in response.json() if user["username"] == "m1")["team_id"] is None
+
+def test_delete_team_revokes_member_team_claims(client):
+    from backend import metrics
+
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    team_id = test_create_team(client)
+    client.post("/users/", json={"username": "team_head", "password": "password", "role": "unit_head", "team_id": team_id}, headers=headers)
+    login = client.post("/token", data={"username": "team_head", "password": "password"}).json()
+    head_headers = {"Authorization": f"Bearer {login['access_token']}"}
+    assert client.get("/tasks/", headers=head_headers).status_code == 200
+
+    client.delete(f"/teams/{team_id}", headers=headers)
+    metrics.reset()
+    # The token still names the deleted team; it is now authorized from the user row
+    assert client.get("/tasks/", headers=head_headers).status_code == 200
+    assert metrics.value("token_claims_stale_total") == 1
+    assert metrics.value("token_claims_authorized_total") == 0
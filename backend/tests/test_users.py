@@ -63,3 +63,188 @@ def test_member_cannot_create_user(client):
         headers=headers
     )
     assert response.status_code == 403
+
+def test_principal_cache_invalidated_on_role_change(client):
+    from backend import auth, metrics
+
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    unit_head = client.post(
+        "/users/",
+        json={"username": "cached_head", "password": "password", "role": "unit_head"},
+        headers=headers
+    ).json()
+    # Tokens without claims (issued before they existed) go through the principal cache
+    legacy_token = auth.create_access_token(data={"sub": "cached_head"})
+    head_headers = {"Authorization": f"Bearer {legacy_token}"}
+
+    metrics.reset()
+    assert client.get("/users/me", headers=head_headers).json()["role"] == "unit_head"
+    assert client.get("/users/me", headers=head_headers).json()["role"] == "unit_head"
+    assert metrics.value("principal_cache_misses_total") == 1
+    assert metrics.value("principal_cache_hits_total") == 1
+
+    # Demotion takes effect on the next request, not after the TTL
+    client.put(f"/users/{unit_head['id']}", json={"role": "member"}, headers=headers)
+    response = client.post("/tasks/", json={"title": "Not allowed"}, headers=head_headers)
+    assert response.status_code == 403
+    assert client.get("/metrics", headers=head_headers).status_code == 403
+
+    # Renamed users lose the old token subject
+    client.put(f"/users/{unit_head['id']}", json={"username": "renamed_head"}, headers=headers)
+    assert client.get("/users/me", headers=head_headers).status_code == 401
+
+    assert client.get("/metrics").status_code == 401
+    body = client.get("/metrics", headers=headers).text
+    assert "principal_cache_hits_total" in body
+
+def test_token_claims_authorize_until_role_change(client):
+    from backend import metrics
+
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    unit_head = client.post(
+        "/users/",
+        json={"username": "claims_head", "password": "password", "role": "unit_head"},
+        headers=headers
+    ).json()
+    login = client.post("/token", data={"username": "claims_head", "password": "password"}).json()
+    head_headers = {"Authorization": f"Bearer {login['access_token']}"}
+
+    metrics.reset()
+    assert client.get("/tasks/", headers=head_headers).status_code == 200
+    assert metrics.value("token_claims_authorized_total") == 1
+    assert metrics.value("principal_cache_misses_total") == 0
+
+    # The old token still says unit_head, but its token version is now outdated
+    client.put(f"/users/{unit_head['id']}", json={"role": "member"}, headers=headers)
+    response = client.post("/tasks/", json={"title": "Not allowed"}, headers=head_headers)
+    assert response.status_code == 403
+    assert metrics.value("token_claims_stale_total") == 1
+
+    # A fresh login carries the new claims
+    login = client.post("/token", data={"username": "claims_head", "password": "password"}).json()
+    response = client.get("/users/me", headers={"Authorization": f"Bearer {login['access_token']}"})
+    assert response.json()["role"] == "member"
+
+def test_token_of_deleted_user_never_authorizes_a_new_account(client):
+    token = test_login_group_head(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    gone = client.post("/users/", json={"username": "gone", "password": "password", "role": "unit_head"}, headers=headers).json()
+    login = client.post("/token", data={"username": "gone", "password": "password"}).json()
+    gone_headers = {"Authorization": f"Bearer {login['access_token']}"}
+    assert client.get("/users/me", headers=gone_headers).status_code == 200
+
+    assert client.delete(f"/users/{gone['id']}", headers=headers).status_code == 200
+    assert client.get("/users/me", headers=gone_headers).status_code == 401
+
+    # Neither a new account (never given the deleted id) nor one reusing the username inherits the token
+    newbie = client.post("/users/", json={"username": "newbie", "password": "password", "role": "member"}, headers=headers).json()
+    assert newbie["id"] != gone["id"]
+    assert client.get("/users/me", headers=gone_headers).status_code == 401
+    client.post("/users/", json={"username": "gone", "password": "password", "role": "member"}, headers=headers)
+    assert client.get("/users/me", headers=gone_headers).status_code == 401
+
+def test_login_rate_limited_before_hashing(client, monkeypatch):
+    from backend import auth, metrics, ratelimit
+
+    monkeypatch.setattr(ratelimit.get_limiter(), "username_limit", 3)
+    metrics.reset()
+    for _ in range(3):
+        response = client.post("/token", data={"username": "admin", "password": "wrong"})
+        assert response.status_code == 401
+
+    def fail(*args):
+        raise AssertionError("password hashed for a throttled attempt")
+    monkeypatch.setattr(auth, "verify_and_update_password_async", fail)
+    response = client.post("/token", data={"username": "admin", "password": "password"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert metrics.value("login_rate_limited_username_total") == 1
+
+    # Other usernames from the same client are only subject to the IP limit
+    response = client.post("/token", data={"username": "nobody", "password": "wrong"})
+    assert response.status_code == 401
+
+def test_only_failed_logins_use_up_login_limits(client, monkeypatch, tmp_path):
+    from backend import ratelimit
+
+    for store in [ratelimit.MemoryStore(), ratelimit.SQLiteStore(str(tmp_path / "attempts.db"))]:
+        ratelimit.set_limiter(ratelimit.LoginLimiter(store, username_limit=3, ip_limit=4))
+        try:
+            # A login rush from one address never reaches the limits
+            for _ in range(6):
+                assert client.post("/token", data={"username": "admin", "password": "password"}).status_code == 200
+
+            # Failures still count, per username and per IP
+            for _ in range(3):
+                assert client.post("/token", data={"username": "admin", "password": "wrong"}).status_code == 401
+            assert client.post("/token", data={"username": "admin", "password": "password"}).status_code == 429
+            assert client.post("/token", data={"username": "nobody", "password": "wrong"}).status_code == 401
+            assert client.post("/token", data={"username": "other", "password": "password"}).status_code == 429
+        finally:
+            ratelimit.set_limiter(None)
+
+    # Shared between workers by default when there are several of them
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    monkeypatch.setenv("LOGIN_RATE_LIMIT_DB", str(tmp_path / "shared.db"))
+    try:
+        assert isinstance(ratelimit.get_limiter().store, ratelimit.SQLiteStore)
+    finally:
+        ratelimit.set_limiter(None)
+
+def test_login_shed_when_password_hash_pool_is_full(client, monkeypatch):
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from backend import auth
+
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(auth, "_hash_pool", pool)
+    monkeypatch.setattr(auth, "PASSWORD_HASH_CONCURRENCY", 1)
+    monkeypatch.setattr(auth, "PASSWORD_HASH_QUEUE", 1)
+
+    # One job hashing, one waiting: the pool and its queue are full
+    release = threading.Event()
+    try:
+        jobs = [auth._submit_hash_job(release.wait, 5) for _ in range(2)]
+        response = client.post("/token", data={"username": "admin", "password": "password"})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+    finally:
+        release.set()
+    for job in jobs:
+        job.result(timeout=5)
+
+    # Finished jobs give their slots back
+    deadline = time.monotonic() + 5
+    while auth._hash_pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert auth._hash_pending == 0
+    assert client.post("/token", data={"username": "admin", "password": "password"}).status_code == 200
+    pool.shutdown()
+
+def test_login_rehashes_outdated_password_hash(client):
+    from passlib.hash import pbkdf2_sha256
+    from backend import auth, metrics, models
+    from .conftest import TestingSessionLocal
+
+    db = TestingSessionLocal()
+    db.add(models.User(
+        username="old_hash",
+        hashed_password=pbkdf2_sha256.using(rounds=1000).hash("password"),
+        role=models.UserRole.MEMBER,
+    ))
+    db.commit()
+
+    metrics.reset()
+    response = client.post("/token", data={"username": "old_hash", "password": "password"})
+    assert response.status_code == 200
+    assert metrics.value("password_verify_seconds") == 1
+
+    db.expire_all()
+    stored = db.query(models.User).filter(models.User.username == "old_hash").one().hashed_password
+    db.close()
+    assert pbkdf2_sha256.from_string(stored).rounds == auth.PASSWORD_HASH_ROUNDS
+    assert not auth.pwd_context.needs_update(stored)
+    assert client.post("/token", data={"username": "old_hash", "password": "password"}).status_code == 200
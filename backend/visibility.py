@@ -0,0 +1,188 @@
+"""
+Task visibility index.
+
+`task_visibility` holds one row per (task, user, relation) where relation is
+"assignee" (legacy assignee_id or a task_assignees entry) or "assigner", with
+the user's team denormalized. Role-based task listings filter on this table
+with a single indexed lookup instead of joining users and nesting IN subqueries.
+
+Write paths must keep it current:
+    - sync_tasks() after creating a task or changing its assignees
+    - forget_task() before deleting a task (after task_events.task_deleted, which
+      copies the task's rows as the audience of its tombstone)
+    - sync_users() after a user's team_id changes
+    - forget_user() before deleting a user
+"""
+
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import and_, delete, exists, insert, literal, or_, select, union, update
+from sqlalchemy.orm import Session
+
+from . import models
+
+ASSIGNEE = "assignee"
+ASSIGNER = "assigner"
+
+TV = models.TaskVisibility
+
+
+def _expected_selects(task_ids: Optional[Iterable[int]] = None):
+    """SELECTs yielding (task_id, user_id, relation, team_id) for every expected row."""
+    legacy = select(models.Task.id.label("task_id"), models.Task.assignee_id.label("user_id"))\
+        .where(models.Task.assignee_id != None)
+    multi = select(models.TaskAssignee.task_id.label("task_id"), models.TaskAssignee.user_id.label("user_id"))
+    if task_ids is not None:
+        task_ids = list(task_ids)
+        legacy = legacy.where(models.Task.id.in_(task_ids))
+        multi = multi.where(models.TaskAssignee.task_id.in_(task_ids))
+    pairs = union(legacy, multi).subquery()
+
+    assignees = select(pairs.c.task_id, pairs.c.user_id, literal(ASSIGNEE), models.User.team_id)\
+        .select_from(pairs)\
+        .join(models.User, models.User.id == pairs.c.user_id)
+    assigners = select(models.Task.id, models.Task.assigner_id, literal(ASSIGNER), models.User.team_id)\
+        .select_from(models.Task)\
+        .join(models.User, models.User.id == models.Task.assigner_id)
+    if task_ids is not None:
+        assigners = assigners.where(models.Task.id.in_(task_ids))
+    return assignees, assigners
+
+
+def _insert_expected(db: Session, task_ids: Optional[Iterable[int]] = None):
+    columns = [TV.task_id, TV.user_id, TV.relation, TV.team_id]
+    for source in _expected_selects(task_ids):
+        db.execute(insert(TV).from_select(columns, source))
+
+
+def sync_tasks(db: Session, task_ids: Iterable[int]):
+    """Recompute the visibility rows of the given tasks (flushes pending changes first)."""
+    task_ids = list(task_ids)
+    if not task_ids:
+        return
+    db.flush()
+    db.execute(delete(TV).where(TV.task_id.in_(task_ids)))
+    _insert_expected(db, task_ids)
+
+
+def snapshot(db: Session, task_id: int, seq: int):
+    """Copy the task's current rows into task_change_audience for the tombstone `seq`."""
+    db.execute(insert(models.TaskChangeAudience).from_select(
+        ["seq", "user_id", "relation", "team_id"],
+        select(literal(seq), TV.user_id, TV.relation, TV.team_id).where(TV.task_id == task_id),
+    ))
+
+
+def forget_task(db: Session, task_id: int):
+    db.execute(delete(TV).where(TV.task_id == task_id))
+
+
+def sync_users(db: Session, user_ids: Iterable[int]):
+    """Refresh the denormalized team_id of the given users' rows (flushes pending changes first)."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    db.flush()
+    team_id = select(models.User.team_id).where(models.User.id == TV.user_id).scalar_subquery()
+    db.execute(update(TV).where(TV.user_id.in_(user_ids)).values(team_id=team_id))
+
+
+def forget_user(db: Session, user_id: int):
+    db.execute(delete(TV).where(TV.user_id == user_id))
+
+
+def rebuild(db: Session):
+    """Recreate the whole index from tasks, task_assignees and users. Caller commits."""
+    db.execute(delete(TV))
+    _insert_expected(db)
+
+
+def is_empty(db: Session) -> bool:
+    return db.query(TV.task_id).first() is None
+
+
+def check(db: Session) -> Tuple[Set[tuple], Set[tuple]]:
+    """
+    Compare the index with what the source tables imply.
+
+    Returns:
+        (missing, unexpected) sets of (task_id, user_id, relation, team_id) tuples;
+        both are empty when the index is consistent
+    """
+    expected = set()
+    for source in _expected_selects():
+        expected.update(tuple(row) for row in db.execute(source))
+    actual = set(tuple(row) for row in db.execute(select(TV.task_id, TV.user_id, TV.relation, TV.team_id)))
+    return expected - actual, actual - expected
+
+
+def visibility_filter(current_user: models.User):
+    """SQL criterion on models.Task selecting the tasks `current_user` may see."""
+    if current_user.role == models.UserRole.GROUP_HEAD:
+        # All non-internal tasks with an assignee in a team, tasks they assigned, and
+        # unassigned tasks whose assigner is in a team
+        return and_(
+            models.Task.is_internal == False,
+            exists().where(
+                TV.task_id == models.Task.id,
+                or_(
+                    and_(TV.relation == ASSIGNEE, TV.team_id != None),
+                    and_(TV.relation == ASSIGNER, TV.user_id == current_user.id),
+                    and_(TV.relation == ASSIGNER, TV.team_id != None, models.Task.assignee_id == None),
+                )
+            )
+        )
+    if current_user.role in [models.UserRole.UNIT_HEAD, models.UserRole.BACKUP_UNIT_HEAD] and current_user.team_id:
+        # Tasks assigned to members of their team
+        return models.Task.id.in_(
+            select(TV.task_id).where(TV.team_id == current_user.team_id, TV.relation == ASSIGNEE)
+        )
+    # Members (and Unit Heads without a team): tasks assigned to them
+    return models.Task.id.in_(
+        select(TV.task_id).where(TV.user_id == current_user.id, TV.relation == ASSIGNEE)
+    )
+
+
+def _audience_filter(current_user: models.User, rows):
+    """
+    Criterion on task_visibility-shaped rows (user_id, relation, team_id) that would
+    have let `current_user` see their task.
+
+    Mirrors visibility_filter() without the task columns, so it errs towards the
+    group head: is_internal is ignored and any assigner in a team counts.
+    """
+    if current_user.role == models.UserRole.GROUP_HEAD:
+        return or_(
+            rows.team_id != None,
+            and_(rows.relation == ASSIGNER, rows.user_id == current_user.id),
+        )
+    if current_user.role in [models.UserRole.UNIT_HEAD, models.UserRole.BACKUP_UNIT_HEAD] and current_user.team_id:
+        return and_(rows.team_id == current_user.team_id, rows.relation == ASSIGNEE)
+    return and_(rows.user_id == current_user.id, rows.relation == ASSIGNEE)
+
+
+def former_audience(db: Session, current_user: models.User, hidden: Iterable[int],
+                    tombstones: Dict[int, int]) -> Set[int]:
+    """
+    Task ids `current_user` should be sent a delete for.
+
+    Args:
+        hidden: ids of tasks that changed but are not visible to the user now
+        tombstones: {task_id: seq} of deleted tasks
+
+    Only tasks the user could see before the change are returned, so listings of
+    deletes never disclose tasks outside the user's scope.
+    """
+    hidden = list(hidden)
+    result = set()
+    if hidden:
+        result.update(task_id for (task_id,) in db.execute(
+            select(TV.task_id).distinct().where(TV.task_id.in_(hidden), _audience_filter(current_user, TV))
+        ))
+    if tombstones:
+        audience = models.TaskChangeAudience
+        seqs = {seq: task_id for task_id, seq in tombstones.items()}
+        result.update(seqs[seq] for (seq,) in db.execute(
+            select(audience.seq).distinct().where(audience.seq.in_(seqs), _audience_filter(current_user, audience))
+        ))
+    return result